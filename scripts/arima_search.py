@@ -0,0 +1,296 @@
+"""
+Automatic ARIMA order selection for the Python path.
+
+Counterpart of autoArimaForecast in src/lib/arimaInference.ts. Instead of
+one single-threaded `auto: true` search plus sequential retries when the
+forecast collapses to zero, this module:
+
+1. looks at the series first: zero-heavy rainfall is never differenced
+   (differencing is what makes the browser forecasts collapse to ~0), and
+   a series with almost no rain goes straight to climatology;
+2. picks d with a KPSS test and D from the seasonal strength, so every
+   candidate is fitted on the same differenced data and AICs are comparable;
+3. fits all (p,q)(P,Q) candidates on a prefix of the series in a process
+   pool, giving each a partial (prefix) AIC over the same residual window;
+4. fully fits candidates in order of partial AIC, in waves of one per
+   worker, and prunes every remaining candidate whose partial AIC already
+   trails the current best candidate's partial AIC by more than PRUNE_MARGIN.
+
+Each candidate reports its timing and whether it was fitted or pruned.
+"""
+
+import atexit
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import arima_engine
+from arima_engine import ArimaOrder
+
+KPSS_CRITICAL_5PCT = 0.463
+SEASONAL_STRENGTH_THRESHOLD = 0.64
+SPARSE_ZERO_FRACTION = 0.6
+MIN_WET_DAYS = 3
+WET_THRESHOLD = 0.1
+PREFIX_FRACTION = 0.5
+PRUNE_MARGIN = 10.0
+
+DEFAULT_SEARCH = {
+    'max_p': 2,
+    'max_q': 2,
+    'max_P': 1,
+    'max_Q': 1,
+    's': 7,
+    'max_d': 2,
+}
+
+_executor = {}
+_executor_lock = threading.Lock()
+
+
+def get_executor(n_jobs):
+    """
+    Process pool kept alive between searches so warm workers are reused.
+    Workers come from a fork server (spawn where there is none), never from
+    fork(): the HTTP server creates the pool from a worker thread, and a
+    child forked there could inherit locks other threads hold.
+    """
+    with _executor_lock:
+        if n_jobs not in _executor:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            _executor[n_jobs] = ProcessPoolExecutor(max_workers=n_jobs, mp_context=context)
+        return _executor[n_jobs]
+
+
+@atexit.register
+def shutdown_executors():
+    with _executor_lock:
+        for executor in _executor.values():
+            executor.shutdown(wait=True, cancel_futures=True)
+        _executor.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    # A forked child (zygote.py worker) does not own the parent's pool; it starts its own
+    os.register_at_fork(after_in_child=_executor.clear)
+
+
+def kpss_statistic(x):
+    """Level-stationarity KPSS statistic with a Bartlett long-run variance"""
+    n = len(x)
+    e = x - x.mean()
+    partial_sums = np.cumsum(e)
+    n_lags = min(int(12 * (n / 100.0) ** 0.25), n - 1)
+    long_run = e @ e / n
+    for lag in range(1, n_lags + 1):
+        long_run += 2.0 * (1.0 - lag / (n_lags + 1.0)) * (e[lag:] @ e[:-lag]) / n
+    if long_run <= 0:
+        return 0.0
+    return float(partial_sums @ partial_sums / (n * n * long_run))
+
+
+def seasonal_strength(x, s):
+    """1 - Var(remainder) / Var(seasonal + remainder) using per-position seasonal means"""
+    n = len(x) - len(x) % s
+    if s < 2 or n < 2 * s:
+        return 0.0
+    folded = x[len(x) - n:].reshape(-1, s)
+    detrended = folded - folded.mean()
+    remainder = detrended - detrended.mean(axis=0)
+    total = detrended.var()
+    if total <= 0:
+        return 0.0
+    return float(max(0.0, 1.0 - remainder.var() / total))
+
+
+def select_differencing(y, max_d, s):
+    """Choose (d, D): smallest d passing KPSS, then D=1 if weekly seasonality is strong"""
+    d = 0
+    x = np.asarray(y, dtype=np.float64)
+    while d < max_d and len(x) > 20 and kpss_statistic(x) > KPSS_CRITICAL_5PCT:
+        x = np.diff(x)
+        d += 1
+    D = 1 if s and seasonal_strength(x, s) > SEASONAL_STRENGTH_THRESHOLD else 0
+    return d, D
+
+
+def describe_sparsity(y):
+    zero_fraction = float(np.mean(y < WET_THRESHOLD))
+    wet_days = int(np.sum(y >= WET_THRESHOLD))
+    return {
+        'zero_fraction': zero_fraction,
+        'wet_days': wet_days,
+        'sparse': zero_fraction >= SPARSE_ZERO_FRACTION,
+        'degenerate': wet_days < MIN_WET_DAYS,
+    }
+
+
+def candidate_orders(options, d, D):
+    s = options['s'] if (options['max_P'] or options['max_Q'] or D) else 0
+    max_P = options['max_P'] if s else 0
+    max_Q = options['max_Q'] if s else 0
+    for p, q, P, Q in itertools.product(range(options['max_p'] + 1), range(options['max_q'] + 1),
+                                        range(max_P + 1), range(max_Q + 1)):
+        yield ArimaOrder(p, d, q, P, D, Q, s if (P or Q or D) else 0)
+
+
+def partial_window(orders, n_obs, prefix_fraction=PREFIX_FRACTION):
+    """
+    (prefix length, conditioning values) shared by every candidate's partial
+    fit, for a differenced series of n_obs values. Conditioning on the
+    largest p + P*s among the candidates that can be fitted at all makes
+    every partial AIC sum the same residuals, so they compare fit alone.
+    """
+    fittable = [o for o in orders if n_obs >= o.p + o.P * o.s + o.n_params + 3] or orders
+    n_cond = max(o.p + o.P * o.s for o in fittable)
+    n_prefix = max(int(n_obs * prefix_fraction), max(o.p + o.P * o.s + o.n_params + 3 for o in fittable))
+    return min(n_prefix, n_obs), n_cond
+
+
+def _partial_fit(y, order, n_prefix, n_cond):
+    """Worker: CSS fit on the first n_prefix differenced values -> partial AIC over values n_cond.."""
+    start = time.perf_counter()
+    try:
+        _, w, _ = arima_engine.prepare(y, order)
+        w = w[:n_prefix]
+        with np.errstate(all='ignore'):
+            params, _ = arima_engine.estimate_css(w, order)
+            # This order's CSS residuals start at p + P*s; score them from n_cond on
+            e = arima_engine.css_residuals(w, *arima_engine.lag_polynomials(params, order))
+        e = e[n_cond - order.p - order.P * order.s:]
+        if len(e) == 0:
+            raise ValueError(f"No residuals left for {order} after conditioning on {n_cond} values")
+        n_resid = len(e)
+        ssr = float(e @ e)
+        k = order.n_params + 1 + (1 if order.n_diff == 0 else 0)
+        partial_aic = n_resid * np.log(2 * np.pi * max(ssr, 1e-12) / n_resid) + n_resid + 2 * k
+        return {'partial_aic': float(partial_aic), 'seconds': time.perf_counter() - start}
+    except (ValueError, np.linalg.LinAlgError) as e:
+        return {'partial_aic': None, 'error': str(e), 'seconds': time.perf_counter() - start}
+
+
+def _full_fit(y, order):
+    """Worker: full fit -> AIC"""
+    start = time.perf_counter()
+    try:
+        model = arima_engine.fit(y, order)
+        aic = float(model.aic) if np.isfinite(model.aic) else None
+        return {'aic': aic, 'seconds': time.perf_counter() - start}
+    except (ValueError, np.linalg.LinAlgError) as e:
+        return {'aic': None, 'error': str(e), 'seconds': time.perf_counter() - start}
+
+
+class AutoArimaResult:
+    """Outcome of an order search: chosen model (None for climatology) and per-candidate log"""
+
+    def __init__(self, model, order, candidates, sparsity, climatology=None, seconds=0.0):
+        self.model = model
+        self.order = order
+        self.candidates = candidates
+        self.sparsity = sparsity
+        self.climatology = climatology
+        self.seconds = seconds
+
+    def forecast(self, horizon):
+        if self.model is None:
+            return np.full(horizon, self.climatology)
+        return self.model.forecast(horizon)
+
+    def summary(self):
+        return {
+            'order': self.order.as_dict() if self.order else None,
+            'aic': float(self.model.aic) if self.model is not None else None,
+            'climatology': self.climatology,
+            'sparsity': self.sparsity,
+            'seconds': self.seconds,
+            'candidates': self.candidates,
+        }
+
+
+def auto_arima(values, options=None, n_jobs=None, prune_margin=PRUNE_MARGIN):
+    """
+    Search (p,d,q)(P,D,Q,s) orders and return an AutoArimaResult.
+
+    options overrides DEFAULT_SEARCH (max_p, max_q, max_P, max_Q, s, max_d,
+    and optionally fixed 'd' / 'D'). n_jobs=1 runs in-process.
+    """
+    start = time.perf_counter()
+    opts = dict(DEFAULT_SEARCH)
+    opts.update(options or {})
+    y = np.asarray(values, dtype=np.float64)
+    if len(y) < arima_engine.MIN_OBSERVATIONS:
+        raise ValueError(f"ARIMA requires at least {arima_engine.MIN_OBSERVATIONS} historical data points")
+
+    sparsity = describe_sparsity(y)
+    if sparsity['degenerate']:
+        # Next to no rain: nothing for a model to learn, use the historical mean
+        return AutoArimaResult(None, None, [], sparsity, climatology=float(y.mean()),
+                               seconds=time.perf_counter() - start)
+
+    if sparsity['sparse']:
+        # Differencing zero-heavy data drives forecasts to ~0; model levels instead
+        d, D = 0, 0
+    else:
+        d, D = select_differencing(y, opts['max_d'], opts['s'])
+    d = int(opts.get('d', d))
+    D = int(opts.get('D', D))
+
+    orders = list(candidate_orders(opts, d, D))
+    n_jobs = n_jobs or os.cpu_count() or 1
+    if n_jobs > 1 and len(orders) > 1:
+        executor = get_executor(n_jobs)
+        run = lambda fn, args_list: list(executor.map(fn, *zip(*args_list)))
+    else:
+        n_jobs = 1
+        run = lambda fn, args_list: [fn(*args) for args in args_list]
+
+    # Stage 1: cheap prefix fits for every candidate, all scored on the same residuals
+    n_prefix, n_cond = partial_window(orders, len(y) - orders[0].n_diff)
+    partial = run(_partial_fit, [(y, o, n_prefix, n_cond) for o in orders])
+    candidates = []
+    for order, result in zip(orders, partial):
+        entry = {'order': order.as_dict(), 'label': repr(order), 'partial_aic': result['partial_aic'],
+                 'partial_seconds': result['seconds'], 'status': 'pending'}
+        if result['partial_aic'] is None:
+            entry.update(status='failed', error=result.get('error'))
+        candidates.append(entry)
+
+    # Stage 2: full fits, most promising first, pruning on the partial AIC
+    pending = sorted((i for i, c in enumerate(candidates) if c['status'] == 'pending'),
+                     key=lambda i: candidates[i]['partial_aic'])
+    best_index, best_aic = None, np.inf
+    while pending:
+        wave, pending = pending[:n_jobs], pending[n_jobs:]
+        results = run(_full_fit, [(y, orders[i]) for i in wave])
+        for i, result in zip(wave, results):
+            candidates[i]['full_seconds'] = result['seconds']
+            if result['aic'] is None:
+                candidates[i].update(status='failed', error=result.get('error'))
+                continue
+            candidates[i].update(status='fitted', aic=result['aic'])
+            if result['aic'] < best_aic:
+                best_index, best_aic = i, result['aic']
+
+        if best_index is None:
+            continue
+        cutoff = candidates[best_index]['partial_aic'] + prune_margin
+        still_pending = []
+        for i in pending:
+            if candidates[i]['partial_aic'] > cutoff:
+                candidates[i]['status'] = 'pruned'
+            else:
+                still_pending.append(i)
+        pending = still_pending
+
+    if best_index is None:
+        raise ValueError("No ARIMA candidate could be fitted")
+
+    best_order = orders[best_index]
+    model = arima_engine.fit(y, best_order)
+    return AutoArimaResult(model, best_order, candidates, sparsity, seconds=time.perf_counter() - start)
@@ -0,0 +1,272 @@
+"""
+Benchmark suite for the prediction path (predict_infer.py).
+
+Measures, per method (gbr, xgb, lstm, bilstm, hybrid, arima):
+
+- cold start: spawning a one-shot `predict_infer.py` and a `--serve` worker
+  until the first result arrives,
+- warm latency: request round trips through a warm `--serve` worker
+  (p50/p90/p99), with the result cache disabled,
+- per-step latency: time per forecast step for horizons 1..30,
+- throughput: series per second for multi-series requests of growing size.
+
+Requests use real history from the bundled dataset. The output is JSON with
+a flat `metrics` map ("warm.gbr.p50_ms", "throughput.lstm.64.series_per_s",
+...) so runs can be diffed across commits. With --baseline, metrics that got
+worse by more than --threshold are listed under `regressions` and the exit
+status is 1. Names ending in _per_s are better when higher, all others are
+times and better when lower.
+
+Usage:
+    python scripts/benchmark.py [--methods gbr,lstm] [--quick] [--output run.json]
+                                [--baseline baseline.json] [--threshold 0.15]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from dataset import open_daily_rainfall
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PREDICT_SCRIPT = os.path.join(SCRIPT_DIR, 'predict_infer.py')
+
+METHODS = ('gbr', 'xgb', 'lstm', 'bilstm', 'hybrid', 'arima')
+HORIZONS = tuple(range(1, 31))
+BATCH_SIZES = (1, 4, 16, 64, 256)
+HISTORY_DAYS = 120
+DEFAULT_THRESHOLD = 0.15
+
+# (cold start runs, warm requests, runs per horizon, runs per batch size)
+FULL_REPEATS = (5, 200, 10, 10)
+QUICK_REPEATS = (2, 50, 3, 3)
+
+
+def percentiles(samples_ms):
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    return {'p50_ms': float(np.percentile(samples, 50)), 'p90_ms': float(np.percentile(samples, 90)),
+            'p99_ms': float(np.percentile(samples, 99)), 'mean_ms': float(samples.mean())}
+
+
+def worker_env():
+    env = dict(os.environ)
+    # Every request must be computed, not served from the result cache
+    env['PREDICT_CACHE'] = '0'
+    env.setdefault('OMP_NUM_THREADS', '1')
+    return env
+
+
+class ServeWorker:
+    """A `predict_infer.py --serve` process driven one request at a time"""
+
+    def __init__(self):
+        self.process = subprocess.Popen([sys.executable, PREDICT_SCRIPT, '--serve'], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, text=True, bufsize=1, env=worker_env())
+
+    def request(self, payload):
+        """(response, round trip seconds)"""
+        line = json.dumps(payload) + '\n'
+        start = time.perf_counter()
+        self.process.stdin.write(line)
+        self.process.stdin.flush()
+        response = json.loads(self.process.stdout.readline())
+        elapsed = time.perf_counter() - start
+        if 'error' in response:
+            raise RuntimeError(f"{payload.get('method')}: {response['error']}")
+        return response, elapsed
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait(timeout=30)
+
+
+def load_history(days=3 * 365):
+    """The last `days` values of the bundled dataset; requests take windows from it"""
+    dates, values = open_daily_rainfall().window(None, days)
+    return np.asarray(values, dtype=np.float64), dates
+
+
+def make_request(method, values, dates, horizon=1, batch=None, offset=0):
+    """Request for `method`; a 'series' request with `batch` shifted windows when batch is given"""
+    def window(k):
+        end = len(values) - k
+        return values[end - HISTORY_DAYS:end], dates[end - 1]
+
+    if batch is None:
+        history, last = window(offset)
+        request = {'method': method, 'features': history.round(2).tolist(), 'last_date': str(last)}
+    else:
+        series = []
+        for k in range(batch):
+            history, last = window((offset + k) % (len(values) - HISTORY_DAYS))
+            series.append({'id': k, 'values': history.round(2).tolist(), 'last_date': str(last)})
+        request = {'method': method, 'series': series}
+    request.update({'horizon': horizon, 'cache': False})
+    if method == 'arima':
+        request['order'] = [1, 0, 1]
+    return request
+
+
+def cold_start(method, values, dates, runs):
+    """Spawn-to-first-result times of one-shot runs and of --serve workers"""
+    request = make_request(method, values, dates)
+    oneshot, serve = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        done = subprocess.run([sys.executable, PREDICT_SCRIPT], input=json.dumps(request), text=True,
+                              capture_output=True, env=worker_env())
+        oneshot.append((time.perf_counter() - start) * 1000)
+        if done.returncode != 0:
+            raise RuntimeError(f"{method}: {done.stderr.strip()}")
+
+        start = time.perf_counter()
+        worker = ServeWorker()
+        worker.request(request)
+        serve.append((time.perf_counter() - start) * 1000)
+        worker.close()
+    return {'oneshot_ms': float(np.median(oneshot)), 'serve_first_ms': float(np.median(serve))}
+
+
+def warm_latency(worker, method, values, dates, requests):
+    samples = []
+    for i in range(requests):
+        _, elapsed = worker.request(make_request(method, values, dates, offset=i % 200))
+        samples.append(elapsed * 1000)
+    return percentiles(samples)
+
+
+def per_step_latency(worker, method, values, dates, horizons, runs):
+    """{horizon: {total_ms, per_step_ms}} from the median of `runs` requests"""
+    result = {}
+    for horizon in horizons:
+        samples = [worker.request(make_request(method, values, dates, horizon, offset=i))[1] * 1000
+                   for i in range(runs)]
+        total = float(np.median(samples))
+        result[str(horizon)] = {'total_ms': total, 'per_step_ms': total / horizon}
+    return result
+
+
+def throughput(worker, method, values, dates, batch_sizes, runs):
+    """{batch size: {series_per_s, request_ms}} for one-step multi-series requests"""
+    result = {}
+    for batch in batch_sizes:
+        samples = [worker.request(make_request(method, values, dates, batch=batch, offset=i))[1]
+                   for i in range(runs)]
+        seconds = float(np.median(samples))
+        result[str(batch)] = {'series_per_s': batch / seconds, 'request_ms': seconds * 1000}
+    return result
+
+
+def flatten(tree, prefix=''):
+    """{"a": {"b": 1}} -> {"a.b": 1}"""
+    flat = {}
+    for key, value in tree.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        else:
+            flat[name] = value
+    return flat
+
+
+def compare(metrics, baseline, threshold):
+    """Metrics that are worse than the baseline by more than `threshold` (relative)"""
+    regressions = []
+    for name, value in sorted(metrics.items()):
+        before = baseline.get(name)
+        if before is None or before <= 0:
+            continue
+        change = (value - before) / before
+        worse = -change if name.endswith('_per_s') else change
+        if worse > threshold:
+            regressions.append({'metric': name, 'baseline': before, 'current': value, 'change': change})
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    import onnxruntime
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'onnxruntime': onnxruntime.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def run(methods, quick=False):
+    cold_runs, warm_requests, horizon_runs, batch_runs = QUICK_REPEATS if quick else FULL_REPEATS
+    values, dates = load_history()
+    results = {'cold_start': {}, 'warm': {}, 'horizon': {}, 'throughput': {}}
+
+    for method in methods:
+        sys.stderr.write(f"benchmark: {method}\n")
+        results['cold_start'][method] = cold_start(method, values, dates, cold_runs)
+        worker = ServeWorker()
+        try:
+            # Load the model and fill the scaler before anything is timed
+            worker.request(make_request(method, values, dates))
+            results['warm'][method] = warm_latency(worker, method, values, dates, warm_requests)
+            results['horizon'][method] = per_step_latency(worker, method, values, dates, HORIZONS, horizon_runs)
+            results['throughput'][method] = throughput(worker, method, values, dates, BATCH_SIZES, batch_runs)
+        finally:
+            worker.close()
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark predict_infer.py")
+    parser.add_argument('--methods', default=','.join(METHODS))
+    parser.add_argument('--quick', action='store_true', help="Fewer repetitions, for a fast smoke run")
+    parser.add_argument('--output', default=None, help="Write the JSON report here as well as to stdout")
+    parser.add_argument('--baseline', default=None, help="Earlier report to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative slowdown reported as a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    methods = [m.strip() for m in args.methods.split(',') if m.strip()]
+    unknown = [m for m in methods if m not in METHODS]
+    if unknown:
+        raise SystemExit(f"Unknown methods: {', '.join(unknown)}")
+
+    results = run(methods, args.quick)
+    report = {'environment': environment(), 'quick': args.quick, 'results': results,
+              'metrics': flatten(results)}
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        report['baseline'] = baseline.get('environment', {}).get('commit')
+        report['regressions'] = compare(report['metrics'], baseline['metrics'], args.threshold)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    sys.stdout.write(text + '\n')
+    if report.get('regressions'):
+        sys.stderr.write(f"{len(report['regressions'])} metric(s) regressed beyond {args.threshold:.0%}\n")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Streaming ingestion of large rainfall CSVs into the station store.
+
+Reads `date,value[,hour][,extra columns]` files (the column names
+CsvUploader.tsx accepts, case-insensitive) in fixed-size chunks, so memory
+stays bounded whatever the file size. Each chunk is validated and coerced
+with vectorized pandas/NumPy operations; rows that cannot be used are
+counted and reported (row number and reason) instead of aborting the
+import:
+
+- invalid date or hour (hour must be 0..23),
+- missing or non-numeric value,
+- a time not after the previous accepted row (duplicate or out of order).
+
+Negative values are clipped to 0 like the browser does. Rows already in the
+store (at or before its last time) are skipped and counted separately so
+re-uploading a grown file only appends the new tail.
+
+The worker's "ingest_csv" command only reads files inside INGEST_DIR
+(PREDICT_INGEST_DIR, default data/ingest), since requests reach it over
+HTTP; the command line reads any file the operator names.
+
+Usage:
+    python scripts/csv_ingest.py FILE --station ID [--resolution auto|daily|hourly] [--chunk-rows N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from station_store import RESOLUTIONS, StationStore
+
+INGEST_DIR = os.environ.get(
+    'PREDICT_INGEST_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'ingest'))
+
+DEFAULT_CHUNK_ROWS = 200_000
+MAX_REPORTED_ERRORS = 100
+
+COLUMN_ALIASES = {
+    'date': ('date', 'tanggal', 'datetime', 'time', 'waktu'),
+    'value': ('value', 'nilai', 'curah_hujan', 'rainfall', 'hujan'),
+    'hour': ('hour', 'jam'),
+}
+
+
+def resolve_columns(columns):
+    """Map the file's header to date/value/hour; the rest are extra columns"""
+    lower = {str(c).strip().lower(): c for c in columns}
+    found = {}
+    for role, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in lower:
+                found[role] = lower[alias]
+                break
+    if 'date' not in found or 'value' not in found:
+        raise ValueError("CSV needs a date and a value column (e.g. 'date,value')")
+    used = set(found.values())
+    found['extra'] = [c for c in columns if c not in used]
+    return found
+
+
+class ChunkResult:
+    """Accepted rows of one chunk plus the rejected rows' (row, reason)"""
+
+    def __init__(self, times, values, extra, errors, skipped_existing, rows):
+        self.times = times
+        self.values = values
+        self.extra = extra
+        self.errors = errors
+        self.skipped_existing = skipped_existing
+        self.rows = rows
+
+
+class CsvIngestor:
+    """
+    Parses chunks into (datetime64 times, float32 values, extra columns).
+
+    stored_until(resolution) returns the last time already in the sink (or
+    None); it is called once, when the resolution is known. The last accepted
+    time is carried across chunks to enforce ordering.
+    """
+
+    def __init__(self, resolution='auto', stored_until=None):
+        if resolution != 'auto' and resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        self.resolution = resolution
+        self.stored_until = stored_until
+        self.columns = None
+        self.rows_seen = 0
+        self._stored_floor = None
+        self._last = None
+
+    def _detect_resolution(self, dates):
+        if 'hour' in self.columns:
+            return 'hourly'
+        # Date strings carrying a time of day mean hourly data
+        parsed = dates.dropna()
+        if len(parsed) and (parsed != parsed.dt.normalize()).any():
+            return 'hourly'
+        return 'daily'
+
+    def _start(self, dates):
+        """First chunk: settle the resolution and where the sink's data ends"""
+        if self.resolution == 'auto':
+            self.resolution = self._detect_resolution(dates)
+        unit = RESOLUTIONS[self.resolution][0]
+        stored = self.stored_until(self.resolution) if self.stored_until else None
+        self._stored_floor = np.iinfo(np.int64).min if stored is None else \
+            np.datetime64(stored).astype(f'datetime64[{unit}]').astype(np.int64)
+        self._last = self._stored_floor
+
+    def parse(self, frame):
+        import pandas as pd
+
+        if self.columns is None:
+            self.columns = resolve_columns(list(frame.columns))
+        first_row = self.rows_seen + 1
+        self.rows_seen += len(frame)
+        row_numbers = np.arange(first_row, first_row + len(frame))
+
+        dates = pd.to_datetime(frame[self.columns['date']].str.strip(), errors='coerce')
+        values = pd.to_numeric(frame[self.columns['value']].str.strip(), errors='coerce').to_numpy(np.float64)
+        if self._last is None:
+            self._start(dates)
+        unit = RESOLUTIONS[self.resolution][0]
+
+        reasons = np.full(len(frame), '', dtype=object)
+        reasons[dates.isna().to_numpy()] = 'invalid date'
+        if 'hour' in self.columns and self.resolution == 'hourly':
+            hours = pd.to_numeric(frame[self.columns['hour']].str.strip(), errors='coerce').to_numpy(np.float64)
+            bad_hour = ~np.isfinite(hours) | (hours < 0) | (hours > 23) | (hours != np.floor(hours))
+            reasons[(reasons == '') & bad_hour] = 'invalid hour'
+            dates = dates.dt.normalize() + pd.to_timedelta(np.where(bad_hour, 0, hours), unit='h')
+        reasons[(reasons == '') & ~np.isfinite(values)] = 'invalid value'
+
+        valid = reasons == ''
+        times = np.full(len(frame), np.iinfo(np.int64).min, dtype=np.int64)
+        times[valid] = dates[valid].to_numpy().astype(f'datetime64[{unit}]').astype(np.int64)
+
+        # Keep only rows strictly after everything accepted before them
+        running = np.maximum.accumulate(np.where(valid, times, self._last))
+        previous = np.concatenate([[self._last], running[:-1]])
+        existing = valid & (times <= self._stored_floor)
+        out_of_order = valid & ~existing & (times <= previous)
+        reasons[out_of_order] = 'not after previous row'
+        keep = valid & ~existing & ~out_of_order
+        if len(running):
+            self._last = int(running[-1])
+
+        extra = {}
+        for column in self.columns['extra']:
+            extra[column] = pd.to_numeric(frame[column].str.strip(), errors='coerce').to_numpy(np.float32)[keep]
+
+        bad = np.flatnonzero(reasons != '')
+        errors = [(int(row_numbers[i]), reasons[i]) for i in bad]
+        return ChunkResult(times[keep].astype(f'datetime64[{unit}]'),
+                           np.maximum(values[keep], 0.0).astype(np.float32),
+                           extra, errors, int(existing.sum()), len(frame))
+
+
+def iter_chunks(source, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """DataFrames of at most chunk_rows rows, every column as string"""
+    import pandas as pd
+
+    return pd.read_csv(source, chunksize=chunk_rows, dtype=str, keep_default_na=False,
+                       skipinitialspace=True)
+
+
+def ingest_path(path, root=None):
+    """
+    Real path of a requested file, relative paths taken from `root`
+    (INGEST_DIR); raises ValueError for anything resolving outside it.
+    """
+    root = os.path.realpath(root or INGEST_DIR)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"CSV path must be inside the ingest directory {root}")
+    return resolved
+
+
+def ingest_csv(source, station, store=None, resolution='auto', chunk_rows=DEFAULT_CHUNK_ROWS,
+               max_reported_errors=MAX_REPORTED_ERRORS):
+    """
+    Stream a CSV (path or file object) into `station`. Returns a report with
+    row counts and the first max_reported_errors rejected rows.
+    """
+    store = store or StationStore()
+    start = time.perf_counter()
+
+    def stored_until(chosen):
+        try:
+            return store.series(station, chosen).last_time()
+        except KeyError:
+            return None
+
+    ingestor = CsvIngestor(resolution, stored_until)
+    report = {'station': station, 'rows': 0, 'written': 0, 'skipped_existing': 0, 'rejected': 0,
+              'errors': [], 'chunks': 0}
+    for frame in iter_chunks(source, chunk_rows):
+        chunk = ingestor.parse(frame)
+        report['written'] += store.append(station, chunk.times, chunk.values, ingestor.resolution)
+        report['rows'] += chunk.rows
+        report['skipped_existing'] += chunk.skipped_existing
+        report['rejected'] += len(chunk.errors)
+        room = max_reported_errors - len(report['errors'])
+        if room > 0:
+            report['errors'].extend({'row': row, 'reason': reason} for row, reason in chunk.errors[:room])
+        report['chunks'] += 1
+
+    report['resolution'] = ingestor.resolution if ingestor.resolution != 'auto' else None
+    # Parsed per chunk (ChunkResult.extra) but the station store only keeps rainfall
+    report['extra_columns'] = ingestor.columns['extra'] if ingestor.columns else []
+    report['seconds'] = time.perf_counter() - start
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Stream a rainfall CSV into the station store")
+    parser.add_argument('file', help="CSV path, or - for stdin")
+    parser.add_argument('--station', required=True)
+    parser.add_argument('--resolution', default='auto', choices=['auto'] + list(RESOLUTIONS))
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--root', default=None, help="Station store directory (default PREDICT_STORE_DIR)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    store = StationStore(args.root) if args.root else StationStore()
+    source = sys.stdin if args.file == '-' else args.file
+    report = ingest_csv(source, args.station, store, args.resolution, args.chunk_rows)
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Loading the daily rainfall dataset used to train the models.
+
+dataset/Regresi-Hujan.xlsx, sheet 'Data Hjan Harian', has one row per
+calendar day (Tanggal, Bulan with Indonesian month names) and one column per
+year. This turns it into a single date-sorted daily series, dropping the
+29 Februari rows of non-leap years, as the training notebook does.
+
+Parsing the workbook takes pandas, openpyxl and most of a second, so it is
+done once per workbook version: ingest() stores the series as two columns,
+values.npy (float32 mm) and days.npy (int32 days since 1970-01-01), in a
+directory named after the workbook's SHA-256. open_daily_rainfall()
+memory-maps those columns, which takes milliseconds and only pages in the
+days that are read.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+DATASET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dataset', 'Regresi-Hujan.xlsx')
+DAILY_SHEET = 'Data Hjan Harian'
+CACHE_DIR = os.environ.get(
+    'RAINFALL_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dataset', '.cache'))
+COLUMNAR_VERSION = 1
+
+MONTHS = {
+    'januari': 1, 'februari': 2, 'maret': 3, 'april': 4, 'mei': 5, 'juni': 6,
+    'juli': 7, 'agustus': 8, 'september': 9, 'oktober': 10, 'november': 11, 'desember': 12,
+}
+
+
+def parse_month(value):
+    """Month number from an Indonesian month name or a number"""
+    if isinstance(value, str):
+        key = value.strip().lower()
+        if key in MONTHS:
+            return MONTHS[key]
+        value = key
+    return int(float(value))
+
+
+def load_daily_rainfall(path=DATASET_PATH, sheet=DAILY_SHEET):
+    """
+    Read the wide day x year sheet. Returns (dates datetime64[D], values float64)
+    sorted by date, with negative readings clipped to 0 and blanks dropped.
+    """
+    import pandas as pd
+
+    raw = pd.read_excel(path, sheet_name=sheet, header=None)
+    header_row = raw.index[raw.iloc[:, 0].astype(str).str.strip() == 'Tanggal'][0]
+    header = raw.iloc[header_row].tolist()
+    body = raw.iloc[header_row + 1:]
+
+    day = pd.to_numeric(body.iloc[:, 0], errors='coerce')
+    month = body.iloc[:, 1].map(lambda m: parse_month(m) if pd.notna(m) else np.nan)
+
+    all_dates = []
+    all_values = []
+    for column, year in enumerate(header[2:], start=2):
+        if pd.isna(year):
+            continue
+        dates = pd.to_datetime({'year': int(year), 'month': month, 'day': day}, errors='coerce')
+        values = pd.to_numeric(body.iloc[:, column], errors='coerce')
+        keep = dates.notna() & values.notna()
+        all_dates.append(dates[keep].to_numpy(dtype='datetime64[D]'))
+        all_values.append(values[keep].to_numpy(dtype=np.float64))
+
+    dates = np.concatenate(all_dates)
+    values = np.maximum(np.concatenate(all_values), 0.0)
+    order = np.argsort(dates, kind='stable')
+    return dates[order], values[order]
+
+
+def workbook_digest(path, cache_dir=CACHE_DIR):
+    """
+    SHA-256 of a workbook. Remembered per (path, size, mtime) in
+    cache_dir/digests.json so unchanged files are not re-hashed on every open.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    index_path = os.path.join(cache_dir, 'digests.json')
+    try:
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+
+    entry = index.get(path)
+    if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+        return entry['sha256']
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    index[path] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': digest.hexdigest()}
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, index_path)
+    return index[path]['sha256']
+
+
+def columnar_dir(digest, sheet=DAILY_SHEET, cache_dir=CACHE_DIR):
+    sheet_key = hashlib.sha256(sheet.encode('utf-8')).hexdigest()[:8]
+    return os.path.join(cache_dir, f"rainfall-v{COLUMNAR_VERSION}-{digest[:16]}-{sheet_key}")
+
+
+def ingest(path=DATASET_PATH, sheet=DAILY_SHEET, cache_dir=CACHE_DIR, force=False):
+    """Convert a workbook to its columnar form once; returns the column directory"""
+    directory = columnar_dir(workbook_digest(path, cache_dir), sheet, cache_dir)
+    if not force and os.path.exists(os.path.join(directory, 'meta.json')):
+        return directory
+
+    dates, values = load_daily_rainfall(path, sheet)
+    # Written to a private directory and renamed, so readers never see half a cache
+    tmp_dir = f"{directory}.{os.getpid()}.tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+    np.save(os.path.join(tmp_dir, 'values.npy'), values.astype(np.float32))
+    np.save(os.path.join(tmp_dir, 'days.npy'), dates.astype(np.int64).astype(np.int32))
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump({
+            'source': os.path.abspath(path),
+            'sheet': sheet,
+            'rows': int(len(values)),
+            'first_date': str(dates[0]) if len(dates) else None,
+            'last_date': str(dates[-1]) if len(dates) else None,
+        }, f)
+    try:
+        os.rename(tmp_dir, directory)
+    except OSError:
+        # Another process finished first; its copy is identical
+        import shutil
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return directory
+
+
+class DailySeries:
+    """Memory-mapped daily series: `days` int32 (days since epoch) and `values` float32"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.days = np.load(os.path.join(directory, 'days.npy'), mmap_mode='r')
+        self.values = np.load(os.path.join(directory, 'values.npy'), mmap_mode='r')
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def dates(self):
+        return self.days.astype('datetime64[D]')
+
+    def window(self, until=None, days=None):
+        """
+        (dates, values) of the last `days` observations on or before `until`
+        (a date string or datetime64), found by binary search on the day index.
+        """
+        end = len(self.days)
+        if until is not None:
+            day = np.datetime64(str(until)[:10], 'D').astype(np.int64)
+            end = int(np.searchsorted(self.days, day, side='right'))
+        start = 0 if days is None else max(0, end - int(days))
+        return self.days[start:end].astype('datetime64[D]'), self.values[start:end]
+
+
+def open_daily_rainfall(path=DATASET_PATH, sheet=DAILY_SHEET, cache_dir=CACHE_DIR):
+    """DailySeries for a workbook, ingesting it first if its columns are not cached yet"""
+    return DailySeries(ingest(path, sheet, cache_dir))
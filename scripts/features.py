@@ -0,0 +1,164 @@
+"""
+Vectorized feature engineering for the tabular and sequence models.
+
+Python counterpart of prepareTabularFeatures / calculateRollingStats in
+src/lib/onnxWebInference.ts. A whole series (or a batch of series) is turned
+into its feature matrix in one pass over float32 sliding windows instead of
+building rows one at a time.
+
+Feature order (must match training and scaler_params.json):
+[lag_1, lag_3, lag_7, roll_mean_3, roll_mean_7, roll_max_7, roll_std_7, bulan_idx, day_of_week]
+
+The features for target day t only look at the 7 values before it, as in the
+browser. roll_std_7 is the sample std (ddof=1) like pandas .rolling().std()
+used when the models were trained.
+"""
+
+import json
+import os
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'public', 'models')
+
+FEATURE_NAMES = [
+    'lag_1', 'lag_3', 'lag_7',
+    'roll_mean_3', 'roll_mean_7', 'roll_max_7', 'roll_std_7',
+    'bulan_idx', 'day_of_week',
+]
+WINDOW_SIZE = 7
+N_FEATURES = len(FEATURE_NAMES)
+
+
+class Scaler:
+    """StandardScaler constants from scaler_params.json as float32 arrays"""
+
+    def __init__(self, params):
+        self.feature_mean = np.asarray(params['feature_scaler']['mean'], dtype=np.float32)
+        self.feature_scale = np.asarray(params['feature_scaler']['scale'], dtype=np.float32)
+        self.target_mean = np.float32(params['target_scaler']['mean'])
+        self.target_scale = np.float32(params['target_scaler']['scale'])
+        if self.feature_mean.shape != (N_FEATURES,) or self.feature_scale.shape != (N_FEATURES,):
+            raise ValueError(f"feature_scaler must have {N_FEATURES} columns")
+
+    @classmethod
+    def load(cls, path=None):
+        path = path or os.path.join(MODELS_DIR, 'scaler_params.json')
+        with open(path, 'r') as f:
+            return cls(json.load(f))
+
+    def transform_features(self, features):
+        return (features - self.feature_mean) / self.feature_scale
+
+    def transform_target(self, values):
+        return (values - self.target_mean) / self.target_scale
+
+    def inverse_target(self, scaled):
+        return scaled * self.target_scale + self.target_mean
+
+
+def calendar_features(dates):
+    """(bulan_idx, day_of_week) for an array of datetime64[D]; Monday is 0"""
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    month = dates.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    # 1970-01-01 was a Thursday
+    day_of_week = (dates.astype(np.int64) + 3) % 7
+    return month.astype(np.float32), day_of_week.astype(np.float32)
+
+
+def assemble_features(rainfall_columns, target_dates, scaler=None):
+    """
+    Stack the 7 rainfall-derived columns (lag_1 .. roll_std_7, each [N]) with
+    the calendar columns of target_dates into an [N, 9] float32 matrix,
+    scaled when a Scaler is given.
+    """
+    month, day_of_week = calendar_features(target_dates)
+    out = np.empty((len(month), N_FEATURES), dtype=np.float32)
+    for i, column in enumerate(rainfall_columns):
+        out[:, i] = column
+    out[:, 7] = month
+    out[:, 8] = day_of_week
+
+    if scaler is not None:
+        out = scaler.transform_features(out)
+    return out
+
+
+def window_features(windows, target_dates, scaler=None):
+    """
+    Feature rows for an [N, 7] array of trailing windows.
+    target_dates holds the date being predicted by each row.
+    Returns [N, 9] float32, scaled when a Scaler is given.
+    """
+    windows = np.asarray(windows, dtype=np.float32)
+    if windows.ndim != 2 or windows.shape[1] != WINDOW_SIZE:
+        raise ValueError(f"Expected windows of shape [N, {WINDOW_SIZE}], got {windows.shape}")
+
+    return assemble_features([
+        windows[:, -1],
+        windows[:, -3],
+        windows[:, 0],
+        windows[:, -3:].mean(axis=1),
+        windows.mean(axis=1),
+        windows.max(axis=1),
+        windows.std(axis=1, ddof=1),
+    ], target_dates, scaler)
+
+
+def feature_matrix(values, dates, scaler=None):
+    """
+    Feature matrix for a whole daily series.
+
+    Row k describes the target that follows values[k:k+7], dated the day after
+    dates[k+6]. There are len(values) - 6 rows; all but the last line up with
+    targets values[7:], the last one is the next-step forecast input.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    if len(values) < WINDOW_SIZE:
+        raise ValueError(f"At least {WINDOW_SIZE} values are required, got {len(values)}")
+    if dates.shape != values.shape:
+        raise ValueError("dates and values must have the same length")
+
+    windows = sliding_window_view(values, WINDOW_SIZE)
+    return window_features(windows, dates[WINDOW_SIZE - 1:] + 1, scaler)
+
+
+def batch_feature_matrix(series_values, series_dates, scaler=None):
+    """
+    Feature matrices for several series in one vectorized pass.
+
+    The series are concatenated, windowed once, and windows that straddle two
+    series are dropped. Returns (features, offsets) where rows
+    offsets[i]:offsets[i+1] belong to series i.
+    """
+    lengths = np.array([len(v) for v in series_values], dtype=np.int64)
+    if np.any(lengths < WINDOW_SIZE):
+        raise ValueError(f"Every series needs at least {WINDOW_SIZE} values")
+
+    values = np.concatenate([np.asarray(v, dtype=np.float32) for v in series_values])
+    dates = np.concatenate([np.asarray(d, dtype='datetime64[D]') for d in series_dates])
+    if dates.shape != values.shape:
+        raise ValueError("dates and values must have the same length")
+
+    windows = sliding_window_view(values, WINDOW_SIZE)
+    target_dates = dates[WINDOW_SIZE - 1:] + 1
+
+    # A window is valid when it ends inside the same series it starts in
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    series_of_start = np.repeat(np.arange(len(lengths)), lengths)[:len(windows)]
+    window_end = np.arange(len(windows)) + WINDOW_SIZE
+    valid = window_end <= (starts + lengths)[series_of_start]
+
+    rows_per_series = lengths - WINDOW_SIZE + 1
+    offsets = np.concatenate([[0], np.cumsum(rows_per_series)])
+    return window_features(windows[valid], target_dates[valid], scaler), offsets
+
+
+def sequence_windows(values, scaler=None):
+    """[N, 7, 1] float32 LSTM inputs for every 7-value window of a series"""
+    values = np.asarray(values, dtype=np.float32)
+    if scaler is not None:
+        values = scaler.transform_target(values)
+    return np.ascontiguousarray(sliding_window_view(values, WINDOW_SIZE)[:, :, np.newaxis])
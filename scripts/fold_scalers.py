@@ -0,0 +1,221 @@
+"""
+Fold the StandardScaler pre/post-processing into the ONNX model graphs.
+
+The exported models work in scaled units: gbr/xgb take the 9 features scaled
+with feature_scaler, lstm/bilstm take and return target_scaler-scaled values.
+Every runtime (onnxWebInference.ts, forecasting.py) therefore repeats the
+same per-value arithmetic with its own copy of the constants. This rewrites
+a model so that the graph does it:
+
+    tabular:   raw_input -> Sub(mean) -> Div(scale) -> model -> Relu
+    sequence:  raw_input -> Sub(mean) -> Div(scale) -> model -> Mul(scale) -> Add(mean) -> Relu
+
+(Relu is the max(0, x) clamp.) The new input is named 'raw_input' and takes
+unscaled millimetres/features; the output keeps its name and is in mm.
+Runtimes recognise folded models by that input name and skip their own
+scaling, so folded and unfolded files both keep working. The scaler the
+constants came from is recorded in the model metadata.
+
+Usage:
+    python scripts/fold_scalers.py [--models gbr,xgb,lstm,bilstm] [--models-dir DIR] [--output-dir DIR]
+
+Models are rewritten in place unless --output-dir is given; already folded
+models are left alone. train_models.py folds what it exports.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+
+from onnx_models import FOLDED_INPUT, MODEL_REGISTRY, MODELS_DIR
+
+FOLDABLE_MODELS = ('gbr', 'xgb', 'lstm', 'bilstm')
+# Default-domain opset added to graphs that only import ai.onnx.ml (xgb);
+# 12 keeps them loadable by ONNX Runtime Web
+DEFAULT_OPSET = 12
+
+
+def scaler_digest(scaler_params):
+    return hashlib.sha256(json.dumps(scaler_params, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def is_folded_model(model):
+    return any(i.name == FOLDED_INPUT for i in model.graph.input)
+
+
+def _rename_tensor(graph, old, new):
+    for node in graph.node:
+        node.input[:] = [new if name == old else name for name in node.input]
+        node.output[:] = [new if name == old else name for name in node.output]
+    for info in graph.value_info:
+        if info.name == old:
+            info.name = new
+
+
+def fold_model(model, kind, scaler_params):
+    """Copy of an onnx.ModelProto with the scaling and clamp as graph nodes"""
+    import onnx
+    from onnx import helper, numpy_helper
+
+    if is_folded_model(model):
+        raise ValueError("Model is already folded")
+    if kind not in ('tabular', 'sequence'):
+        raise ValueError(f"Cannot fold a '{kind}' model")
+
+    folded = onnx.ModelProto()
+    folded.CopyFrom(model)
+    graph = folded.graph
+    initializers = {init.name for init in graph.initializer}
+    inputs = [i for i in graph.input if i.name not in initializers]
+    if len(inputs) != 1 or len(graph.output) != 1:
+        raise ValueError("Only single-input, single-output models can be folded")
+    model_input, model_output = inputs[0], graph.output[0]
+    if model_output.type.tensor_type.elem_type != onnx.TensorProto.FLOAT:
+        raise ValueError("Model output must be float32")
+
+    if kind == 'tabular':
+        mean = np.asarray(scaler_params['feature_scaler']['mean'], dtype=np.float32)
+        scale = np.asarray(scaler_params['feature_scaler']['scale'], dtype=np.float32)
+    else:
+        mean = np.asarray([scaler_params['target_scaler']['mean']], dtype=np.float32)
+        scale = np.asarray([scaler_params['target_scaler']['scale']], dtype=np.float32)
+    target_mean = np.asarray([scaler_params['target_scaler']['mean']], dtype=np.float32)
+    target_scale = np.asarray([scaler_params['target_scaler']['scale']], dtype=np.float32)
+
+    # The original graph keeps its tensors; a new input feeds it and a new tail produces the output
+    output_name = model_output.name
+    raw_output = f"{output_name}/scaled"
+    _rename_tensor(graph, output_name, raw_output)
+
+    graph.initializer.extend([
+        numpy_helper.from_array(mean, 'fold/input_mean'),
+        numpy_helper.from_array(scale, 'fold/input_scale'),
+    ])
+    head = [
+        helper.make_node('Sub', [FOLDED_INPUT, 'fold/input_mean'], ['fold/centered'], name='fold/sub'),
+        helper.make_node('Div', ['fold/centered', 'fold/input_scale'], [model_input.name], name='fold/div'),
+    ]
+    tail = []
+    last = raw_output
+    if kind == 'sequence':
+        graph.initializer.extend([
+            numpy_helper.from_array(target_mean, 'fold/target_mean'),
+            numpy_helper.from_array(target_scale, 'fold/target_scale'),
+        ])
+        tail += [
+            helper.make_node('Mul', [last, 'fold/target_scale'], ['fold/unscaled'], name='fold/mul'),
+            helper.make_node('Add', ['fold/unscaled', 'fold/target_mean'], ['fold/mm'], name='fold/add'),
+        ]
+        last = 'fold/mm'
+    tail.append(helper.make_node('Relu', [last], [output_name], name='fold/clamp'))
+
+    nodes = head + list(graph.node) + tail
+    del graph.node[:]
+    graph.node.extend(nodes)
+
+    new_input = onnx.ValueInfoProto()
+    new_input.CopyFrom(model_input)
+    new_input.name = FOLDED_INPUT
+    position = list(graph.input).index(model_input)
+    graph.input.remove(model_input)
+    graph.input.insert(position, new_input)
+
+    if not any(op.domain in ('', 'ai.onnx') for op in folded.opset_import):
+        folded.opset_import.append(helper.make_opsetid('', DEFAULT_OPSET))
+
+    metadata = {p.key: p.value for p in folded.metadata_props}
+    metadata.update({'scaling': 'folded', 'scaler_sha256': scaler_digest(scaler_params)})
+    helper.set_model_props(folded, metadata)
+    onnx.checker.check_model(folded)
+    return folded
+
+
+def check_fold(original, folded, kind, scaler_params, rows=256, seed=0):
+    """Max abs difference between the folded model and scaling around the original"""
+    import onnxruntime as ort
+    from features import Scaler
+
+    scaler = Scaler(scaler_params)
+    rng = np.random.default_rng(seed)
+    shape = (rows, 9) if kind == 'tabular' else (rows, 7, 1)
+    raw = rng.gamma(0.6, 3.0, size=shape).astype(np.float32)
+    if kind == 'tabular':
+        # Calendar columns: month index 1..12, day of week 0..6
+        raw[:, 7] = rng.integers(1, 13, rows)
+        raw[:, 8] = rng.integers(0, 7, rows)
+
+    def session(model):
+        return ort.InferenceSession(model.SerializeToString(), providers=['CPUExecutionProvider'])
+
+    before = session(original)
+    input_name = before.get_inputs()[0].name
+    if kind == 'tabular':
+        expected = before.run(None, {input_name: scaler.transform_features(raw).astype(np.float32)})[0]
+    else:
+        scaled = scaler.transform_target(raw).astype(np.float32)
+        expected = scaler.inverse_target(before.run(None, {input_name: scaled})[0])
+    expected = np.maximum(expected.reshape(rows), 0.0)
+    got = session(folded).run(None, {FOLDED_INPUT: raw})[0].reshape(rows)
+    return float(np.max(np.abs(got - expected)))
+
+
+def fold_bytes(name, model_bytes, scaler_params):
+    """Serialized folded model of a registry model, or the input if it is already folded"""
+    import onnx
+
+    model = onnx.load_from_string(model_bytes)
+    if is_folded_model(model):
+        return model_bytes
+    return fold_model(model, MODEL_REGISTRY[name]['kind'], scaler_params).SerializeToString()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Embed StandardScaler constants into the ONNX models")
+    parser.add_argument('--models', default=','.join(FOLDABLE_MODELS))
+    parser.add_argument('--models-dir', default=MODELS_DIR)
+    parser.add_argument('--output-dir', default=None, help="Write here instead of rewriting in place")
+    parser.add_argument('--scaler', default=None, help="scaler_params.json (default: in --models-dir)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    import onnx
+
+    args = parse_args(argv)
+    models = [m.strip() for m in args.models.split(',') if m.strip()]
+    unknown = [m for m in models if m not in FOLDABLE_MODELS]
+    if unknown:
+        raise SystemExit(f"Cannot fold: {', '.join(unknown)} (foldable: {', '.join(FOLDABLE_MODELS)})")
+    with open(args.scaler or os.path.join(args.models_dir, 'scaler_params.json'), 'r') as f:
+        scaler_params = json.load(f)
+    output_dir = args.output_dir or args.models_dir
+    os.makedirs(output_dir, exist_ok=True)
+
+    report = {}
+    for name in models:
+        filename = MODEL_REGISTRY[name]['file']
+        original = onnx.load(os.path.join(args.models_dir, filename))
+        if is_folded_model(original):
+            report[name] = {'file': filename, 'status': 'already folded'}
+            continue
+        kind = MODEL_REGISTRY[name]['kind']
+        folded = fold_model(original, kind, scaler_params)
+        diff = check_fold(original, folded, kind, scaler_params)
+        if diff > 1e-3:
+            raise SystemExit(f"{name}: folded model differs from the scaled original by {diff:.3g}")
+        path = os.path.join(output_dir, filename)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        onnx.save(folded, tmp_path)
+        os.replace(tmp_path, path)
+        report[name] = {'file': filename, 'status': 'folded', 'max_abs_diff': diff}
+
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Content-addressed cache for forecast results.
+
+Dashboards ask for the same forecast over and over (same station, same
+recent values, same method and horizon). Results are keyed by a hash of
+everything that determines them and kept in:
+
+- an in-memory LRU tier bounded by entry count,
+- an optional on-disk tier (one JSON file per key) bounded by total bytes,
+
+both with a TTL. Concurrent requests for a key that is already being
+computed wait for that computation instead of repeating it (single-flight).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get('PREDICT_CACHE_ENTRIES', '2048'))
+DEFAULT_TTL = float(os.environ.get('PREDICT_CACHE_TTL', '900'))
+DEFAULT_MAX_DISK_BYTES = int(os.environ.get('PREDICT_CACHE_DISK_BYTES', str(256 * 1024 * 1024)))
+
+
+def cache_key(method, model_version, horizon, tail, last_date=None, extra=None):
+    """
+    SHA-256 over the inputs that determine a forecast. `tail` is the part of
+    the history the method actually reads (last 7 values for the ONNX models,
+    the full history for ARIMA), hashed as raw float64 bytes.
+    """
+    header = json.dumps({
+        'method': method,
+        'version': model_version,
+        'horizon': int(horizon),
+        'last_date': None if last_date is None else str(last_date),
+        'extra': extra,
+    }, sort_keys=True, separators=(',', ':'))
+    digest = hashlib.sha256(header.encode('utf-8'))
+    digest.update(np.ascontiguousarray(tail, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+class _Flight:
+    """An in-progress computation other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class DiskTier:
+    """One JSON file per key under `directory`, evicted oldest-first past max_bytes"""
+
+    def __init__(self, directory, ttl, max_bytes=DEFAULT_MAX_DISK_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        # Guards _size and the files it counts: puts come from every pool thread
+        self._lock = threading.Lock()
+        self._size = sum(entry[2] for entry in self._entries())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.json')
+
+    def _entries(self):
+        """(path, mtime, size) of every cached file"""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.json'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - record.get('created', 0) > self.ttl:
+            self._remove(path)
+            return None
+        return record.get('value')
+
+    def put(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps({'created': time.time(), 'value': value}).encode('utf-8')
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        with self._lock:
+            # Overwriting a key replaces its old file's bytes instead of adding to them
+            self._size += len(data) - self._file_size(path)
+            os.replace(tmp_path, path)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    @staticmethod
+    def _file_size(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def _remove(self, path):
+        with self._lock:
+            self._unlink(path)
+
+    def _unlink(self, path):
+        """Delete a cached file and take its bytes off the total; the caller holds the lock"""
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            self._size -= size
+        except OSError:
+            pass
+
+    def clear(self):
+        """Remove every cached file"""
+        with self._lock:
+            for path, _, _ in self._entries():
+                self._unlink(path)
+            self._size = 0
+
+    def _evict(self):
+        """Delete the oldest files down to 90% of max_bytes; the caller holds the lock"""
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        self._size = sum(entry[2] for entry in entries)
+        target = self.max_bytes * 0.9
+        for path, _, size in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+                self._size -= size
+            except OSError:
+                pass
+
+
+class ForecastCache:
+    """
+    Two-tier LRU/TTL cache with single-flight coalescing.
+
+    get_many() is the main entry point: it resolves a batch of keys, calls
+    `compute` once for the keys nobody has or is computing, and waits for
+    keys other threads are already computing.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, disk_dir=None,
+                 max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk = DiskTier(disk_dir, ttl, max_disk_bytes) if disk_dir else None
+        self._memory = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            'hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'evictions': 0,
+            'expired': 0,
+        }
+
+    def _memory_get(self, key, now):
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        created, value = entry
+        if now - created > self.ttl:
+            del self._memory[key]
+            self._counters['expired'] += 1
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _memory_put(self, key, value, now):
+        self._memory[key] = (now, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._counters['evictions'] += 1
+
+    def get_many(self, keys, compute):
+        """
+        Return values for `keys` (a list). `compute(indices)` receives the
+        positions that must be computed and returns their values in order.
+        """
+        values = [None] * len(keys)
+        owned = []
+        waiting = []
+        now = time.time()
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                value = self._memory_get(key, now)
+                if value is not None:
+                    values[i] = value
+                    self._counters['hits'] += 1
+                elif key in self._flights:
+                    waiting.append((i, self._flights[key]))
+                    self._counters['coalesced'] += 1
+                else:
+                    flight = _Flight()
+                    self._flights[key] = flight
+                    owned.append((i, flight))
+
+        try:
+            to_compute = []
+            for i, flight in owned:
+                value = self.disk.get(keys[i]) if self.disk else None
+                if value is not None:
+                    values[i] = value
+                    with self._lock:
+                        self._counters['disk_hits'] += 1
+                        self._memory_put(keys[i], value, time.time())
+                else:
+                    to_compute.append(i)
+
+            if to_compute:
+                with self._lock:
+                    self._counters['misses'] += len(to_compute)
+                computed = compute(to_compute)
+                now = time.time()
+                for i, value in zip(to_compute, computed):
+                    values[i] = value
+                    if self.disk:
+                        self.disk.put(keys[i], value)
+                with self._lock:
+                    for i in to_compute:
+                        self._memory_put(keys[i], values[i], now)
+
+            for i, flight in owned:
+                flight.value = values[i]
+        except BaseException as e:
+            for _, flight in owned:
+                flight.error = e
+            raise
+        finally:
+            with self._lock:
+                for i, flight in owned:
+                    self._flights.pop(keys[i], None)
+                    flight.done.set()
+
+        for i, flight in waiting:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            values[i] = flight.value
+
+        return values
+
+    def get_or_compute(self, key, compute):
+        """Single-key convenience wrapper; compute() takes no arguments"""
+        return self.get_many([key], lambda _: [compute()])[0]
+
+    def clear(self):
+        """Drop every cached result, in memory and on disk"""
+        with self._lock:
+            self._memory.clear()
+        if self.disk:
+            self.disk.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._memory)
+            stats['in_flight'] = len(self._flights)
+        lookups = stats['hits'] + stats['disk_hits'] + stats['misses'] + stats['coalesced']
+        stats['hit_rate'] = (lookups - stats['misses']) / lookups if lookups else 0.0
+        if self.disk:
+            stats['disk_bytes'] = self.disk._size
+        return stats
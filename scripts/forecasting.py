@@ -0,0 +1,236 @@
+"""
+Batched recursive forecasting.
+
+Every series in a request is advanced together: at each horizon step the
+windows of all N series are stacked into one tensor ([N, 9] for GBR/XGB,
+[N, 7, 1] for LSTM/BiLSTM) and the model is called once, so the number of
+model calls depends on the horizon only, not on the number of stations.
+With strategy "direct" the multi-output model predicts the whole horizon
+(up to its trained H days) in a single call instead.
+
+The hybrid method runs its XGBoost and LSTM halves of each step at the same
+time on separate sessions; onnxruntime releases the GIL during run(), so a
+hybrid step costs about max(xgb, lstm) rather than their sum.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from features import WINDOW_SIZE
+from onnx_models import MODEL_REGISTRY, is_folded, model_horizon, resolve_model_name, run_model
+from telemetry import stage
+from window_state import WindowState
+
+
+HYBRID_MODELS = ('xgb', 'lstm')
+DEFAULT_HYBRID_WEIGHT = 0.6
+
+_hybrid_executor = []
+
+
+def get_hybrid_executor():
+    """Single helper thread that runs the tabular half of hybrid steps"""
+    if not _hybrid_executor:
+        _hybrid_executor.append(ThreadPoolExecutor(max_workers=1, thread_name_prefix='hybrid'))
+    return _hybrid_executor[0]
+
+
+if hasattr(os, 'register_at_fork'):
+    # The helper thread does not exist in a forked child (zygote.py); start a new one there
+    os.register_at_fork(after_in_child=_hybrid_executor.clear)
+
+
+def parse_hybrid_weight(weight):
+    """XGBoost share of the hybrid blend (LSTM gets the rest), 0.6 like runHybridInference"""
+    if weight is None:
+        return DEFAULT_HYBRID_WEIGHT
+    weight = float(weight)
+    if not 0.0 <= weight <= 1.0:
+        raise ValueError("xgb_weight must be between 0 and 1")
+    return weight
+
+
+def run_model_step(session, kind, state, target_dates, scaler):
+    """One batched model call for every series in `state`; returns [N] predictions in mm"""
+    folded = is_folded(session)
+    if kind == 'tabular':
+        if target_dates is None:
+            raise ValueError("Tabular models need 'last_date' or 'dates' to build calendar features")
+        with stage('features'):
+            features = state.tabular_features(target_dates)
+        if not folded:
+            with stage('scaling'):
+                features = scaler.transform_features(features)
+        with stage('model'):
+            return run_model(session, features)
+
+    with stage('features'):
+        window = state.window()[:, :, np.newaxis]
+    if folded:
+        with stage('model'):
+            return run_model(session, np.ascontiguousarray(window, dtype=np.float32))
+    # Sequence models work on target-scaled values in and out
+    with stage('scaling'):
+        scaled = np.ascontiguousarray(scaler.transform_target(window), dtype=np.float32)
+    with stage('model'):
+        output = run_model(session, scaled)
+    with stage('scaling'):
+        return scaler.inverse_target(output)
+
+
+def run_hybrid_step(tabular_session, sequence_session, state, target_dates, scaler, weight):
+    """Weighted XGBoost + LSTM step, both models running concurrently"""
+    if target_dates is None:
+        raise ValueError("Tabular models need 'last_date' or 'dates' to build calendar features")
+    tabular = get_hybrid_executor().submit(run_model_step, tabular_session, 'tabular', state, target_dates, scaler)
+    sequence_pred = run_model_step(sequence_session, 'sequence', state, target_dates, scaler)
+    # The helper thread records no stages; whatever of its half outlasts the LSTM is model time
+    with stage('model'):
+        tabular_pred = tabular.result()
+    return weight * tabular_pred + (1.0 - weight) * sequence_pred
+
+
+def forecast_direct(session, state, last_dates, horizon, scaler, predictions):
+    """
+    Fill predictions [N, horizon] from a direct model. One call covers the
+    model's H days; longer horizons chain blocks, each starting from the
+    window that ends with the previous block's predictions.
+    """
+    if last_dates is None:
+        raise ValueError("Tabular models need 'last_date' or 'dates' to build calendar features")
+    block = model_horizon(session)
+    input_name = session.get_inputs()[0].name
+    step = 0
+    while step < horizon:
+        with stage('features'):
+            features = state.tabular_features(last_dates + (step + 1))
+        with stage('scaling'):
+            features = scaler.transform_features(features)
+        with stage('model'):
+            output = session.run(None, {input_name: features})[0].reshape(len(state), block)
+        take = min(block, horizon - step)
+        predictions[:, step:step + take] = np.maximum(output[:, :take], 0.0)
+        step += take
+        if step < horizon:
+            for k in range(max(0, take - WINDOW_SIZE), take):
+                state.push(predictions[:, step - take + k])
+
+
+def is_auto_order(order):
+    """'auto' (like ARIMA_PRESETS.auto) or {"auto": true, ...search options}"""
+    return order == 'auto' or (isinstance(order, dict) and order.get('auto'))
+
+
+def forecast_batch(method, histories, last_dates, horizon, sessions, scaler, order=None, details=None,
+                   xgb_weight=None, perturb=None):
+    """
+    Recursive forecast for N series at once.
+
+    histories: list of 1-D value sequences (may differ in length)
+    last_dates: datetime64[D] array of each series' last date, or None
+    scaler: features.Scaler
+    order: ARIMA order for method 'arima' (preset name, dict or list, or 'auto')
+    details: optional list that receives one dict per series describing the
+             fitted ARIMA order (and the search log for 'auto')
+    xgb_weight: XGBoost share for method 'hybrid' (default 0.6)
+    perturb: optional perturb(step, values) -> values, applied to each step's
+             predictions before they are clamped and fed back (sample paths,
+             see probabilistic.py); recursive ONNX and hybrid methods only
+    Returns an [N, horizon] float64 array of non-negative predictions.
+    """
+    n_series = len(histories)
+    model_name = resolve_model_name(method)
+
+    for history in histories:
+        if len(history) == 0:
+            raise ValueError("Every series needs at least one value")
+        if (model_name is not None or method == 'hybrid') and len(history) < WINDOW_SIZE:
+            raise ValueError(f"Model '{model_name or method}' requires at least {WINDOW_SIZE} historical data points")
+
+    predictions = np.empty((n_series, horizon), dtype=np.float64)
+
+    if model_name is not None:
+        kind = MODEL_REGISTRY[model_name]['kind']
+        if kind == 'multivariate':
+            raise ValueError(f"Model '{model_name}' takes columnar input; use method 'multivariate'")
+        with stage('load'):
+            session = sessions.get(model_name)
+        # Only the trailing window is kept; each step updates it in O(1)
+        state = WindowState(np.stack([np.asarray(h[-WINDOW_SIZE:], dtype=np.float32) for h in histories]))
+        if kind == 'direct':
+            if perturb is not None:
+                raise ValueError(f"Model '{model_name}' predicts the whole horizon at once and cannot be perturbed")
+            forecast_direct(session, state, last_dates, horizon, scaler, predictions)
+            return predictions
+        for step in range(horizon):
+            target_dates = last_dates + (step + 1) if last_dates is not None else None
+            next_vals = run_model_step(session, kind, state, target_dates, scaler)
+            if perturb is not None:
+                next_vals = perturb(step, next_vals)
+            next_vals = np.maximum(next_vals, 0.0)
+            predictions[:, step] = next_vals
+            state.push(next_vals)
+        return predictions
+
+    if method == 'hybrid':
+        weight = parse_hybrid_weight(xgb_weight)
+        with stage('load'):
+            tabular_session, sequence_session = (sessions.get(name) for name in HYBRID_MODELS)
+        state = WindowState(np.stack([np.asarray(h[-WINDOW_SIZE:], dtype=np.float32) for h in histories]))
+        for step in range(horizon):
+            target_dates = last_dates + (step + 1) if last_dates is not None else None
+            next_vals = run_hybrid_step(tabular_session, sequence_session, state, target_dates, scaler, weight)
+            if perturb is not None:
+                next_vals = perturb(step, next_vals)
+            next_vals = np.maximum(next_vals, 0.0)
+            predictions[:, step] = next_vals
+            state.push(next_vals)
+        return predictions
+
+    if perturb is not None:
+        raise ValueError(f"Method '{method}' has no recursive model loop to perturb")
+
+    if method == 'arima':
+        # Imported here so ONNX-only requests do not pay for scipy
+        with stage('load'):
+            import arima_engine
+
+        if any(len(h) < arima_engine.MIN_OBSERVATIONS for h in histories):
+            raise ValueError(f"ARIMA requires at least {arima_engine.MIN_OBSERVATIONS} historical data points")
+
+        if is_auto_order(order):
+            with stage('load'):
+                import arima_search
+
+            options = {k: v for k, v in order.items() if k != 'auto'} if isinstance(order, dict) else None
+            for i, history in enumerate(histories):
+                with stage('model'):
+                    result = arima_search.auto_arima(history, options)
+                predictions[i] = np.maximum(result.forecast(horizon), 0.0)
+                if details is not None:
+                    details.append(result.summary())
+            return predictions
+
+        order = arima_engine.ArimaOrder.parse(order)
+        for i, history in enumerate(histories):
+            with stage('model'):
+                predictions[i] = np.maximum(arima_engine.forecast(history, horizon, order), 0.0)
+            if details is not None:
+                details.append({'order': order.as_dict()})
+        return predictions
+
+    # Default fallback: persistence
+    last_vals = np.array([h[-1] for h in histories], dtype=np.float64)
+    predictions[:] = np.maximum(last_vals, 0.0)[:, np.newaxis]
+    return predictions
+
+
+def forecast_dates(last_dates, horizon):
+    """[N, horizon] ISO date (or hour, for datetime64[h] input) strings following each series' last one"""
+    last_dates = np.asarray(last_dates)
+    if last_dates.dtype.kind != 'M':
+        last_dates = last_dates.astype('datetime64[D]')
+    steps = np.arange(1, horizon + 1)
+    return (last_dates[:, np.newaxis] + steps).astype(str)
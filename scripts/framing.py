@@ -0,0 +1,134 @@
+"""
+Length-prefixed binary frames for predict_infer.py --binary.
+
+A frame is
+
+    uint32 LE  header length in bytes
+    uint32 LE  body length in bytes
+    header     UTF-8 JSON: the same request/response object as the JSON protocol
+    body       raw array data
+
+Any array in the object may travel in the body instead of as a JSON list.
+The header then holds, in its place,
+
+    {"$array": {"dtype": "f4", "offset": 64, "shape": [N, T]}}
+
+with dtype "f4" or "f8" (little-endian float32/float64) and offset in bytes
+from the start of the body. The reader hands such arrays to the request code
+as read-only np.frombuffer views of the body: no text is parsed and nothing is
+copied. Responses carry their predictions the same way, as float32 unless the
+request asks for "dtype": "f8". Arrays are written 8-byte aligned so clients
+can map them onto typed arrays directly.
+"""
+
+import json
+import math
+import struct
+
+import numpy as np
+
+PREFIX = struct.Struct('<II')
+DTYPES = {'f4': np.dtype('<f4'), 'f8': np.dtype('<f8')}
+DEFAULT_DTYPE = 'f4'
+ALIGNMENT = 8
+# A prefix beyond these is taken as a client speaking another protocol
+MAX_HEADER_BYTES = 64 * 1024 * 1024
+MAX_BODY_BYTES = 2 * 1024 * 1024 * 1024
+
+
+class FramingError(Exception):
+    """The stream is truncated or not framed; no further frame can be read from it"""
+
+
+def _read_exactly(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        raise FramingError(f"Stream ended inside a frame ({len(data)} of {size} bytes)")
+    return data
+
+
+def read_frame(stream):
+    """
+    Next object from a binary stream, its arrays decoded as views of the
+    frame body, or None at the end of the stream. A frame whose header is
+    not valid raises ValueError after it has been consumed, so the caller
+    can report it and go on with the next one.
+    """
+    prefix = stream.read(PREFIX.size)
+    if not prefix:
+        return None
+    if len(prefix) != PREFIX.size:
+        raise FramingError("Stream ended inside a frame prefix")
+    header_size, body_size = PREFIX.unpack(prefix)
+    if header_size > MAX_HEADER_BYTES or body_size > MAX_BODY_BYTES:
+        raise FramingError(f"Frame of {header_size} + {body_size} bytes is too large; is the client using --binary?")
+    header = _read_exactly(stream, header_size)
+    body = _read_exactly(stream, body_size)
+    return decode(header, body)
+
+
+def decode(header, body):
+    """Object of a frame's header with every {"$array": ...} replaced by a view of `body`"""
+    def array(obj):
+        if len(obj) != 1 or '$array' not in obj:
+            return obj
+        spec = obj['$array']
+        if not isinstance(spec, dict) or not isinstance(spec.get('shape'), list):
+            raise ValueError(f"Array spec {spec!r} must be an object with a \"shape\" list")
+        dtype_name = spec.get('dtype', DEFAULT_DTYPE)
+        dtype = DTYPES.get(dtype_name) if isinstance(dtype_name, str) else None
+        if dtype is None:
+            raise ValueError(f"Unsupported array dtype: {spec.get('dtype')} (use {', '.join(DTYPES)})")
+        try:
+            shape = tuple(int(n) for n in spec['shape'])
+            offset = int(spec.get('offset', 0))
+        except (TypeError, ValueError):
+            raise ValueError(f"Array spec {spec} needs integer shape and offset") from None
+        count = math.prod(shape)
+        if min(shape, default=0) < 0 or offset < 0 or offset + count * dtype.itemsize > len(body):
+            raise ValueError(f"Array {spec} lies outside the {len(body)}-byte frame body")
+        return np.frombuffer(body, dtype, count, offset).reshape(shape)
+
+    return json.loads(header, object_hook=array)
+
+
+def encode(payload, dtype=DEFAULT_DTYPE):
+    """Frame bytes of `payload`; its ndarrays go to the body as `dtype`"""
+    target = DTYPES[dtype]
+    chunks = []
+    size = 0
+
+    def array(obj):
+        nonlocal size
+        if isinstance(obj, np.ndarray):
+            data = np.ascontiguousarray(obj, dtype=target)
+            padding = -size % ALIGNMENT
+            if padding:
+                chunks.append(b'\0' * padding)
+            spec = {'dtype': dtype, 'offset': size + padding, 'shape': list(data.shape)}
+            chunks.append(data.tobytes())
+            size += padding + data.nbytes
+            return {'$array': spec}
+        if isinstance(obj, np.generic):
+            return obj.item()
+        raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+    header = json.dumps(payload, default=array).encode('utf-8')
+    return b''.join([PREFIX.pack(len(header), size), header] + chunks)
+
+
+def add_fields(frame, fields):
+    """`frame` with `fields` added to its header object; the body is kept as is"""
+    header_size, body_size = PREFIX.unpack_from(frame)
+    header = json.loads(frame[PREFIX.size:PREFIX.size + header_size])
+    header.update(fields)
+    encoded = json.dumps(header).encode('utf-8')
+    return PREFIX.pack(len(encoded), body_size) + encoded + frame[PREFIX.size + header_size:]
+
+
+def output_dtype(request):
+    """Body dtype a request wants its predictions in"""
+    dtype = request.get('dtype', DEFAULT_DTYPE) if isinstance(request, dict) else DEFAULT_DTYPE
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported dtype: {dtype} (use {', '.join(DTYPES)})")
+    return dtype
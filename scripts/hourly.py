@@ -0,0 +1,136 @@
+"""
+Hourly rainfall: daily aggregation and hourly features.
+
+The ONNX models are daily, so hourly input for them is first reduced to
+daily totals. The reduction is one pass over the sorted hours
+(np.add/maximum.reduceat on day boundaries), not a per-day loop.
+
+hourly_feature_matrix() is the hourly counterpart of
+features.feature_matrix(), for training and evaluating hourly models: lags,
+rolling statistics over the previous 24 hours and calendar columns for
+every hour of a series, computed on one sliding-window view, so a year
+(8,760 hours) is featurized in a single NumPy pass. Windows that span a
+missing hour are left out rather than read as consecutive hours.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from features import calendar_features
+
+HOURS_PER_DAY = 24
+WET_THRESHOLD = 0.1
+HOURLY_WINDOW = 24
+
+HOURLY_FEATURE_NAMES = [
+    'lag_1', 'lag_3', 'lag_6', 'lag_24',
+    'roll_mean_3', 'roll_mean_6', 'roll_mean_24', 'roll_max_24', 'roll_std_24', 'wet_hours_24',
+    'hour_of_day', 'bulan_idx', 'day_of_week',
+]
+
+
+def hourly_times(last_time, count):
+    """Timestamps of `count` consecutive hours ending at last_time"""
+    last = np.datetime64(last_time, 'h')
+    return last - np.arange(count - 1, -1, -1)
+
+
+def hourly_to_daily(times, values, wet_threshold=WET_THRESHOLD):
+    """
+    Aggregate hourly observations (times sorted ascending) per calendar day.
+    Returns a dict of equal-length arrays: dates, sum, max, wet_hours, hours
+    (number of observed hours that day).
+    """
+    hours = np.asarray(times, dtype='datetime64[h]')
+    values = np.asarray(values, dtype=np.float64)
+    if hours.shape != values.shape:
+        raise ValueError("times and values must have the same length")
+    if len(hours) == 0:
+        empty = np.empty(0)
+        return {'dates': np.empty(0, dtype='datetime64[D]'), 'sum': empty, 'max': empty,
+                'wet_hours': empty.astype(np.int64), 'hours': empty.astype(np.int64)}
+
+    days = hours.astype('datetime64[D]')
+    starts = np.flatnonzero(np.concatenate([[True], days[1:] != days[:-1]]))
+    counts = np.diff(np.append(starts, len(days)))
+    return {
+        'dates': days[starts],
+        'sum': np.add.reduceat(values, starts),
+        'max': np.maximum.reduceat(values, starts),
+        'wet_hours': np.add.reduceat((values >= wet_threshold).astype(np.int64), starts),
+        'hours': counts,
+    }
+
+
+def daily_totals(values, last_time, complete_only=True, times=None):
+    """
+    Daily rainfall totals of an hourly series ending at last_time, grouped by
+    the observations' `times` (default: consecutive hours up to last_time).
+    With complete_only, a first or last day the series only partly covers is
+    dropped, since its partial total would look like a dry day to the daily
+    models, and a partial or missing day in between raises ValueError, since
+    the daily models read the totals as consecutive days.
+    Returns (totals, date of the last total).
+    """
+    times = hourly_times(last_time, len(values)) if times is None else np.asarray(times, dtype='datetime64[h]')
+    daily = hourly_to_daily(times, values)
+    totals, dates, hours = daily['sum'], daily['dates'], daily['hours']
+    if complete_only and len(totals):
+        lo = 0 if hours[0] == HOURS_PER_DAY else 1
+        hi = len(totals) if hours[-1] == HOURS_PER_DAY else len(totals) - 1
+        totals, dates, hours = totals[lo:hi], dates[lo:hi], hours[lo:hi]
+        partial = np.flatnonzero(hours != HOURS_PER_DAY)
+        if len(partial):
+            day = partial[-1]
+            raise ValueError(f"Hourly history has only {hours[day]} of {HOURS_PER_DAY} hours on {dates[day]}; "
+                             f"request a window without it")
+        missing = np.flatnonzero(np.diff(dates.astype(np.int64)) != 1)
+        if len(missing):
+            day = missing[-1]
+            raise ValueError(f"Hourly history has no data between {dates[day]} and {dates[day + 1]}; "
+                             f"request a window without the gap")
+    if len(totals) == 0:
+        raise ValueError("Hourly history does not cover a complete day")
+    return totals, dates[-1]
+
+
+def hourly_feature_matrix(values, times, wet_threshold=WET_THRESHOLD):
+    """
+    Features of every hour that follows 24 consecutive observed hours.
+    Returns ([R, 13] float32 rows in HOURLY_FEATURE_NAMES order, [R] target
+    hours): row r describes the hour after values[k:k+24] using only those
+    24 hours, for each k whose window has no missing hour.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    times = np.asarray(times, dtype='datetime64[h]')
+    if times.shape != values.shape:
+        raise ValueError("times and values must have the same length")
+    if len(values) < HOURLY_WINDOW:
+        raise ValueError(f"At least {HOURLY_WINDOW} hourly values are required, got {len(values)}")
+    if np.any(np.diff(times.astype(np.int64)) <= 0):
+        raise ValueError("Hourly times must be strictly increasing")
+
+    # Strictly increasing hours span exactly 23 hours only when none is missing
+    stamps = times.astype(np.int64)
+    complete = stamps[HOURLY_WINDOW - 1:] - stamps[:len(stamps) - HOURLY_WINDOW + 1] == HOURLY_WINDOW - 1
+    windows = sliding_window_view(values, HOURLY_WINDOW)[complete]
+    target_times = times[HOURLY_WINDOW - 1:][complete] + 1
+    month, day_of_week = calendar_features(target_times.astype('datetime64[D]'))
+    hour_of_day = target_times.astype(np.int64) % HOURS_PER_DAY
+
+    features = np.column_stack([
+        windows[:, -1],
+        windows[:, -3],
+        windows[:, -6],
+        windows[:, 0],
+        windows[:, -3:].mean(axis=1),
+        windows[:, -6:].mean(axis=1),
+        windows.mean(axis=1),
+        windows.max(axis=1),
+        windows.std(axis=1, ddof=1),
+        (windows >= wet_threshold).sum(axis=1),
+        hour_of_day,
+        month,
+        day_of_week,
+    ]).astype(np.float32)
+    return features, target_times
@@ -0,0 +1,397 @@
+"""
+Asyncio HTTP front end for predict_infer.py.
+
+Endpoints:
+
+- POST /predict  same JSON body as a one-shot stdin request
+- POST /batch    {"requests": [...]} -> {"responses": [...]}, errors per item
+- GET  /health   liveness plus queue, batching and cache counters
+- GET  /metrics  request counters and latency histograms, Prometheus text
+
+Forecast requests are not run one by one. They are queued and a collector
+drains the queue into micro-batches (up to max_batch_size series, waiting at
+most max_wait_ms for more to arrive). Jobs in a micro-batch that share method,
+horizon and order are concatenated into one run_forecast call, so the ONNX
+models see one [N, ...] input per horizon step instead of N small ones. Model
+execution, request decoding and commands such as CSV ingests run in a thread
+pool so the event loop keeps accepting requests.
+
+Only the standard library is used; the HTTP handling covers what the Next.js
+API routes and curl send (HTTP/1.1, Content-Length bodies, keep-alive).
+"""
+
+import asyncio
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import predict_infer
+from predict_infer import (decode_job, encode_response, enable_metrics, finish_timings, handle_command,
+                           metrics_text, run_forecast, run_job, start_timings, warm_up)
+from telemetry import Timings, activate, timed
+
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_WAIT_MS = 5.0
+MAX_BODY_BYTES = 32 * 1024 * 1024
+
+STATUS_TEXT = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+}
+
+
+class MicroBatcher:
+    """
+    Collects ForecastJobs into micro-batches and runs them on a thread pool.
+
+    submit() returns the job's response payload once its batch has run. A
+    batch is closed when it holds max_batch_size series or max_wait_ms has
+    passed since its first job arrived, whichever comes first.
+    """
+
+    def __init__(self, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS, workers=None):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='forecast')
+        self._queue = None
+        self._collector = None
+        # The event loop holds only weak references to tasks, so running groups are kept here
+        self._tasks = set()
+        # group_runs: run_group calls on the pool (a failed group's per-job retries included)
+        self._counters = {'requests': 0, 'batches': 0, 'group_runs': 0, 'series': 0, 'errors': 0}
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._collector = asyncio.get_running_loop().create_task(self._collect())
+
+    async def stop(self):
+        if self._collector is not None:
+            self._collector.cancel()
+            try:
+                await self._collector
+            except asyncio.CancelledError:
+                pass
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.executor.shutdown(wait=True)
+
+    async def submit(self, job):
+        future = asyncio.get_running_loop().create_future()
+        self._counters['requests'] += 1
+        if job.timings is not None:
+            job.timings.enqueued = time.perf_counter()
+        await self._queue.put((job, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0].histories)
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0].histories)
+
+            self._counters['batches'] += 1
+            self._counters['series'] += size
+            # Groups run concurrently on the pool; the collector goes straight
+            # back to filling the next batch.
+            for group in self._group(batch):
+                task = loop.create_task(self._run_group(group))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    def _group(batch):
+        groups = {}
+        for job, future in batch:
+            groups.setdefault(job.group_key(), []).append((job, future))
+        return groups.values()
+
+    async def _run_group(self, group):
+        jobs = [job for job, _ in group]
+        loop = asyncio.get_running_loop()
+        self._counters['group_runs'] += 1
+        try:
+            responses = await loop.run_in_executor(self.executor, run_group, jobs)
+        except Exception as e:
+            if len(group) > 1:
+                # One bad series must not fail the requests it was batched with
+                await asyncio.gather(*(self._run_group([item]) for item in group))
+                return
+            self._counters['errors'] += 1
+            for _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), response in zip(group, responses):
+            if not future.done():
+                future.set_result(response)
+
+    def stats(self):
+        stats = dict(self._counters)
+        stats['queued'] = self._queue.qsize() if self._queue is not None else 0
+        stats['running_groups'] = len(self._tasks)
+        stats['mean_batch_series'] = stats['series'] / stats['batches'] if stats['batches'] else 0.0
+        stats['max_batch_size'] = self.max_batch_size
+        stats['max_wait_ms'] = self.max_wait * 1000.0
+        return stats
+
+
+def run_group(jobs):
+    """
+    Forecast jobs with the same group_key in one call and split the results per job.
+    Timed jobs each get the whole batch's stage times, plus their own queue wait.
+    """
+    first = jobs[0]
+    if first.sampling is not None:
+        # Probabilistic jobs are never grouped with others (see ForecastJob.group_key)
+        job, = jobs
+        if job.timings is not None:
+            job.timings.add('queue', time.perf_counter() - job.timings.enqueued)
+        return [run_job(job)]
+
+    batch_timings = Timings() if any(job.timings is not None for job in jobs) else None
+    histories = [h for job in jobs for h in job.histories]
+    last_dates = None
+    if first.has_dates:
+        last_dates = np.concatenate([job.dates_array() for job in jobs])
+
+    futures = [f for job in jobs for f in job.futures] if first.futures is not None else None
+
+    with activate(batch_timings):
+        predictions, details = run_forecast(first.method, histories, last_dates, first.horizon,
+                                            first.order, first.use_cache, first.xgb_weight, first.schema, futures)
+
+    responses = []
+    offset = 0
+    for job in jobs:
+        n = len(job.histories)
+        if job.timings is not None:
+            job.timings.add('queue', batch_timings.start - job.timings.enqueued)
+            job.timings.merge(batch_timings)
+        with timed(job.timings, 'postprocess'):
+            responses.append(job.response(predictions[offset:offset + n], details[offset:offset + n]))
+        offset += n
+    return responses
+
+
+class TextBody(str):
+    """Response body sent as text/plain (the Prometheus exposition format)"""
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class InferenceServer:
+    """HTTP/1.1 server routing requests to a MicroBatcher"""
+
+    def __init__(self, batcher, host='127.0.0.1', port=8765):
+        self.batcher = batcher
+        self.host = host
+        self.port = port
+        self.started = None
+        self._server = None
+
+    async def start(self):
+        warm_up()
+        enable_metrics()
+        self.batcher.start()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.started = time.time()
+        return self._server
+
+    async def serve_forever(self):
+        server = await self.start()
+        sys.stderr.write(f"inference server listening on http://{self.host}:{self.port}\n")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HttpError as e:
+                    await write_response(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+
+                start = time.perf_counter()
+                try:
+                    status, payload = 200, await self.route(method, path, body, start)
+                except HttpError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    status, payload = 500, {"error": str(e)}
+                await write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body, start=None):
+        """Response payload: a dict, JSON text already encoded (str) or a TextBody"""
+        path = path.split('?', 1)[0].rstrip('/') or '/'
+        if path == '/health':
+            if method != 'GET':
+                raise HttpError(405, "Use GET for /health")
+            return self.health()
+        if path == '/metrics':
+            if method != 'GET':
+                raise HttpError(405, "Use GET for /metrics")
+            try:
+                return TextBody(metrics_text())
+            except ValueError as e:
+                raise HttpError(404, str(e))
+        if path not in ('/predict', '/batch'):
+            raise HttpError(404, f"Unknown path: {path}")
+        if method != 'POST':
+            raise HttpError(405, f"Use POST for {path}")
+
+        try:
+            data = json.loads(body or b'null')
+        except ValueError as e:
+            raise HttpError(400, f"Invalid JSON: {e}")
+
+        if path == '/predict':
+            if not isinstance(data, dict):
+                raise HttpError(400, "Request must be a JSON object")
+            timings = start_timings(data, start)
+            try:
+                return encode_response(await self.predict(data, timings), timings)
+            except Exception as e:
+                if timings is not None:
+                    finish_timings(timings, 'error')
+                if isinstance(e, ValueError):
+                    raise HttpError(400, str(e))
+                raise
+
+        requests = data.get('requests') if isinstance(data, dict) else None
+        if not isinstance(requests, list):
+            raise HttpError(400, 'Body must be {"requests": [...]}')
+        # Items are encoded one by one so each timed item gets its own serialize time
+        responses = await asyncio.gather(*(self._batch_item(item, start) for item in requests))
+        return '{"responses": [' + ', '.join(responses) + ']}'
+
+    async def predict(self, request, timings=None):
+        # Commands (a CSV ingest) and decoding (station history reads) block on
+        # I/O, so they run on the pool while the loop keeps serving requests
+        loop = asyncio.get_running_loop()
+        if 'command' in request:
+            return await loop.run_in_executor(self.batcher.executor, handle_command, request)
+        job = await loop.run_in_executor(self.batcher.executor, decode_job, request, timings)
+        return await self.batcher.submit(job)
+
+    async def _batch_item(self, request, start):
+        """Encoded response of one /batch item"""
+        request_id = request.get('id') if isinstance(request, dict) else None
+        timings = None
+        try:
+            if not isinstance(request, dict):
+                raise ValueError("Request must be a JSON object")
+            timings = start_timings(request, start)
+            response = await self.predict(request, timings)
+        except Exception as e:
+            response = {"error": str(e)}
+        response['id'] = request_id
+        return encode_response(response, timings)
+
+    def health(self):
+        cache = predict_infer.get_forecast_cache()
+        return {
+            "status": "ok",
+            "uptime": time.time() - self.started if self.started else 0.0,
+            "batching": self.batcher.stats(),
+            "cache": cache.stats() if cache else None,
+            "sessions": predict_infer.get_session_cache().loaded(),
+        }
+
+
+async def read_request(reader):
+    """Parse one request; returns (method, path, headers, body) or None at EOF"""
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError as e:
+        if not e.partial.strip():
+            return None
+        raise HttpError(400, "Incomplete request head")
+    except asyncio.LimitOverrunError:
+        raise HttpError(413, "Request head too large")
+
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, path, _ = lines[0].split(' ', 2)
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        raise HttpError(400, "Chunked request bodies are not supported; send Content-Length")
+    try:
+        length = int(headers.get('content-length', '0'))
+    except ValueError:
+        raise HttpError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, "Request body too large")
+    body = await reader.readexactly(length) if length else b''
+    return method.upper(), path, headers, body
+
+
+async def write_response(writer, status, payload, keep_alive=True):
+    """Write a dict as JSON; str payloads (encoded JSON, TextBody) are sent as they are"""
+    body = (payload if isinstance(payload, str) else json.dumps(payload)).encode('utf-8')
+    content_type = ('text/plain; version=0.0.4; charset=utf-8' if isinstance(payload, TextBody)
+                    else 'application/json')
+    head = (
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        "\r\n"
+    )
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+
+
+def run(host='127.0.0.1', port=8765, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+        max_wait_ms=DEFAULT_MAX_WAIT_MS, workers=None):
+    batcher = MicroBatcher(max_batch_size, max_wait_ms, workers)
+    server = InferenceServer(batcher, host, port)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,271 @@
+"""
+Forecast evaluation metrics: RMSE, MAE, R², rain/no-rain ROC-AUC and CRPS.
+
+The functions score in-memory arrays in one vectorized pass. The
+accumulators score data that arrives in chunks (a multi-million-point
+backtest, or one share per worker): update() them chunk by chunk, merge()
+accumulators built elsewhere (they pickle, so workers can send them back),
+and read result() at the end. Merging is exact except for ROC-AUC, whose
+accumulator counts scores in fixed bins so that counts from different
+chunks simply add up.
+
+Regression metrics and CRPS reduce over the first axis only: [N, H] inputs
+give one value per lead time. ROC-AUC pools every value.
+
+    evaluation = Evaluation()
+    for actual, predicted, paths in chunks:        # paths: [N, M, H] sample paths
+        evaluation.update(actual, predicted, samples=paths, axis=1)
+    evaluation.result()   # {'rmse', 'mae', 'r2', 'roc_auc', 'crps', 'count'}
+"""
+
+import numpy as np
+
+from hourly import WET_THRESHOLD
+
+# Observations of at least this many mm are the "rain" class of ROC-AUC
+RAIN_THRESHOLD = WET_THRESHOLD
+# Bin edges of RocAccumulator: zero, then log-spaced from 0.001 to 1000 (mm or probabilities)
+DEFAULT_SCORE_EDGES = np.concatenate([[0.0], np.geomspace(1e-3, 1e3, 2048)])
+
+
+def _pair(actual, predicted):
+    actual = np.asarray(actual, dtype=np.float64)
+    predicted = np.asarray(predicted, dtype=np.float64)
+    if actual.shape != predicted.shape:
+        raise ValueError(f"Actual {actual.shape} and predicted {predicted.shape} shapes differ")
+    return actual, predicted
+
+
+def _value(x):
+    """Python float for scalars, ndarray for per-lead results"""
+    return float(x) if np.ndim(x) == 0 else np.asarray(x)
+
+
+class RegressionAccumulator:
+    """Streaming RMSE, MAE and R²: error sums plus a mergeable mean/M2 of the actuals"""
+
+    def __init__(self):
+        self.count = 0
+        self.abs_error = 0.0
+        self.squared_error = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, actual, predicted):
+        actual, predicted = _pair(actual, predicted)
+        if len(actual) == 0:
+            return self
+        chunk = RegressionAccumulator()
+        errors = predicted - actual
+        chunk.count = len(actual)
+        chunk.abs_error = np.abs(errors).sum(axis=0)
+        chunk.squared_error = np.square(errors).sum(axis=0)
+        chunk.mean = actual.mean(axis=0)
+        chunk.m2 = np.square(actual - chunk.mean).sum(axis=0)
+        return self.merge(chunk)
+
+    def merge(self, other):
+        """Add another accumulator's observations (Chan et al. for the mean/M2)"""
+        if other.count == 0:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 = self.m2 + other.m2 + np.square(delta) * self.count * other.count / total
+        self.mean = self.mean + delta * other.count / total
+        self.abs_error = self.abs_error + other.abs_error
+        self.squared_error = self.squared_error + other.squared_error
+        self.count = total
+        return self
+
+    def result(self):
+        if self.count == 0:
+            raise ValueError("No observations to score")
+        # Constant actuals: 1 for a perfect fit, else 0 (as scikit-learn's r2_score)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r2 = np.where(self.m2 > 0, 1.0 - self.squared_error / self.m2,
+                          np.where(self.squared_error == 0, 1.0, 0.0))
+        return {
+            'rmse': _value(np.sqrt(self.squared_error / self.count)),
+            'mae': _value(self.abs_error / self.count),
+            'r2': _value(r2),
+        }
+
+
+def regression_metrics(actual, predicted):
+    """{'rmse', 'mae', 'r2'} of predictions against actual values"""
+    return RegressionAccumulator().update(actual, predicted).result()
+
+
+def rain_labels(actual, threshold=RAIN_THRESHOLD):
+    return np.asarray(actual, dtype=np.float64).ravel() >= threshold
+
+
+def roc_auc(actual, scores, threshold=RAIN_THRESHOLD):
+    """
+    Exact ROC-AUC of `scores` (predicted mm or rain probabilities) for telling
+    rainy observations (>= threshold mm) from dry ones: the Mann-Whitney
+    statistic from one sort, ties counted as half.
+    """
+    labels = rain_labels(actual, threshold)
+    scores = np.asarray(scores, dtype=np.float64).ravel()
+    if len(labels) != len(scores):
+        raise ValueError(f"{len(labels)} observations but {len(scores)} scores")
+    n_rainy = int(labels.sum())
+    n_dry = len(labels) - n_rainy
+    if n_rainy == 0 or n_dry == 0:
+        raise ValueError("ROC-AUC needs both rainy and dry observations")
+    _, inverse, counts = np.unique(scores, return_inverse=True, return_counts=True)
+    # 1-based rank of each distinct score, averaged over its ties
+    ranks = (np.cumsum(counts) - (counts - 1) / 2.0)[inverse]
+    return float((ranks[labels].sum() - n_rainy * (n_rainy + 1) / 2.0) / (n_rainy * n_dry))
+
+
+class RocAccumulator:
+    """
+    Streaming ROC-AUC from per-bin counts of rainy and dry observations'
+    scores. Scores sharing a bin count as ties, so the result is within
+    about a bin width of roc_auc() on all the data.
+    """
+
+    def __init__(self, edges=None, threshold=RAIN_THRESHOLD):
+        self.edges = DEFAULT_SCORE_EDGES if edges is None else np.asarray(edges, dtype=np.float64)
+        self.threshold = threshold
+        self.rainy = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.dry = np.zeros(len(self.edges) + 1, dtype=np.int64)
+
+    def update(self, actual, scores):
+        labels = rain_labels(actual, self.threshold)
+        bins = np.searchsorted(self.edges, np.asarray(scores, dtype=np.float64).ravel(), side='right')
+        if len(labels) != len(bins):
+            raise ValueError(f"{len(labels)} observations but {len(bins)} scores")
+        self.rainy += np.bincount(bins[labels], minlength=len(self.rainy))
+        self.dry += np.bincount(bins[~labels], minlength=len(self.dry))
+        return self
+
+    def merge(self, other):
+        if self.threshold != other.threshold or not np.array_equal(self.edges, other.edges):
+            raise ValueError("Cannot merge ROC accumulators with different thresholds or bins")
+        self.rainy += other.rainy
+        self.dry += other.dry
+        return self
+
+    def result(self):
+        n_rainy, n_dry = int(self.rainy.sum()), int(self.dry.sum())
+        if n_rainy == 0 or n_dry == 0:
+            raise ValueError("ROC-AUC needs both rainy and dry observations")
+        dry_below = np.cumsum(self.dry) - self.dry
+        return float((self.rainy * (dry_below + 0.5 * self.dry)).sum() / (n_rainy * n_dry))
+
+
+def crps_samples(actual, samples, axis=-1):
+    """
+    CRPS of each observation under the ensemble `samples` (members along
+    `axis`, e.g. axis=1 for [N, M, H] sample paths): E|X - y| - E|X - X'| / 2,
+    the second term from the sorted members in O(M log M).
+    """
+    actual = np.asarray(actual, dtype=np.float64)
+    samples = np.moveaxis(np.asarray(samples, dtype=np.float64), axis, -1)
+    if samples.shape[:-1] != actual.shape:
+        raise ValueError(f"Samples {samples.shape} do not match actual {actual.shape} with members last")
+    m = samples.shape[-1]
+    # sum_ij |x_i - x_j| = 2 sum_i (2i - m - 1) x_(i) for the sorted members
+    weights = (2.0 * np.arange(1, m + 1) - m - 1) / (m * m)
+    spread = np.sort(samples, axis=-1) @ weights
+    return np.abs(samples - actual[..., np.newaxis]).mean(axis=-1) - spread
+
+
+def crps_quantiles(actual, quantiles, levels, axis=-1):
+    """
+    CRPS of each observation from forecast quantiles at `levels` (along
+    `axis`): twice the mean pinball loss, which approaches the CRPS as the
+    levels fill (0, 1) evenly.
+    """
+    actual = np.asarray(actual, dtype=np.float64)
+    quantiles = np.moveaxis(np.asarray(quantiles, dtype=np.float64), axis, -1)
+    levels = np.asarray(levels, dtype=np.float64)
+    if quantiles.shape[:-1] != actual.shape or quantiles.shape[-1] != len(levels):
+        raise ValueError(f"Quantiles {quantiles.shape} do not match actual {actual.shape} and {len(levels)} levels")
+    if np.any((levels <= 0) | (levels >= 1)):
+        raise ValueError("Quantile levels must lie strictly between 0 and 1")
+    diff = actual[..., np.newaxis] - quantiles
+    pinball = np.maximum(levels * diff, (levels - 1.0) * diff)
+    return 2.0 * pinball.mean(axis=-1)
+
+
+class CrpsAccumulator:
+    """Streaming mean CRPS over observations, from samples or quantiles"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, scores):
+        scores = np.asarray(scores, dtype=np.float64)
+        self.count += len(scores)
+        self.total = self.total + scores.sum(axis=0)
+        return self
+
+    def update_samples(self, actual, samples, axis=-1):
+        return self.add(crps_samples(actual, samples, axis))
+
+    def update_quantiles(self, actual, quantiles, levels, axis=-1):
+        return self.add(crps_quantiles(actual, quantiles, levels, axis))
+
+    def merge(self, other):
+        self.count += other.count
+        self.total = self.total + other.total
+        return self
+
+    def result(self):
+        if self.count == 0:
+            raise ValueError("No probabilistic forecasts to score")
+        return _value(self.total / self.count)
+
+
+class Evaluation:
+    """Every metric of a backtest, accumulated chunk by chunk and mergeable across workers"""
+
+    def __init__(self, threshold=RAIN_THRESHOLD, edges=None):
+        self.regression = RegressionAccumulator()
+        self.roc = RocAccumulator(edges, threshold)
+        self.crps = CrpsAccumulator()
+
+    def update(self, actual, predicted, samples=None, quantiles=None, levels=None, axis=-1):
+        """
+        Score one chunk of point forecasts, plus its sample paths or forecast
+        quantiles (at `levels`) when given; `axis` is their member axis.
+        """
+        self.regression.update(actual, predicted)
+        self.roc.update(actual, predicted)
+        if samples is not None:
+            self.crps.update_samples(actual, samples, axis)
+        elif quantiles is not None:
+            self.crps.update_quantiles(actual, quantiles, levels, axis)
+        return self
+
+    def merge(self, other):
+        self.regression.merge(other.regression)
+        self.roc.merge(other.roc)
+        self.crps.merge(other.crps)
+        return self
+
+    def result(self):
+        """Regression metrics plus 'roc_auc' and 'crps' (None when not defined for the data)"""
+        out = self.regression.result()
+        try:
+            out['roc_auc'] = self.roc.result()
+        except ValueError:
+            out['roc_auc'] = None
+        out['crps'] = self.crps.result() if self.crps.count else None
+        out['count'] = self.regression.count
+        return out
+
+
+def evaluate(actual, predicted, samples=None, quantiles=None, levels=None, axis=-1, threshold=RAIN_THRESHOLD):
+    """Evaluation.result() for in-memory arrays, with the exact ROC-AUC"""
+    out = Evaluation(threshold).update(actual, predicted, samples, quantiles, levels, axis).result()
+    try:
+        out['roc_auc'] = roc_auc(actual, predicted, threshold)
+    except ValueError:
+        out['roc_auc'] = None
+    return out
@@ -0,0 +1,207 @@
+"""
+Multivariate (multi-column) sequence model input.
+
+Requests carry their inputs column by column, e.g.
+
+    {"method": "multivariate", "columns": {"rainfall": [...], "suhu": [...],
+     "kelembaban": [...], "tekanan": [...], "enso": [...]}, "horizon": 7}
+
+and are matched against the input schemas in public/models/input_schemas.json.
+A schema names the model file, the window length, the ordered input columns
+(with accepted aliases) and the target column the model predicts. Each
+column's "scaler" names its StandardScaler entry ({"mean": m, "scale": s}) in
+the schema's "scaler_file" (default scaler_params.json, next to the schema
+file), so the constants live only where training wrote them. The schema
+using the most of the provided columns is chosen unless the request names
+one with "schema".
+
+Columns are stacked once into a [T, C] float32 matrix per series. The
+recursive loop keeps every series in one [N, W + horizon, C] buffer that is
+scaled once up front, so each step is a slice, one model call and one row
+write, with no per-value Python work. Exogenous columns for future steps come
+from "future": {"suhu": [...], ...} when given, otherwise their last observed
+value is carried forward.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from onnx_models import MODEL_REGISTRY, MODELS_DIR, is_folded
+from telemetry import stage
+
+SCHEMAS_PATH = os.path.join(MODELS_DIR, 'input_schemas.json')
+DEFAULT_SCALER_FILE = 'scaler_params.json'
+
+
+class InputSchema:
+    """One model's expected input columns, their scalers and the target column"""
+
+    def __init__(self, spec, scalers):
+        """scalers: the parsed scaler file the columns' "scaler" keys refer to"""
+        self.name = spec['name']
+        self.file = spec['model']
+        self.window = int(spec['window'])
+        self.target = spec['target']
+        self.columns = [c['name'] for c in spec['columns']]
+        self.aliases = [[c['name']] + list(c.get('aliases', [])) for c in spec['columns']]
+        constants = []
+        for c in spec['columns']:
+            entry = scalers.get(c.get('scaler'))
+            if entry is None or np.ndim(entry.get('mean')) != 0 or np.ndim(entry.get('scale')) != 0:
+                raise ValueError(f"Schema {self.name}: column {c['name']} needs a \"scaler\" naming a "
+                                 f"{{mean, scale}} entry of its scaler file")
+            constants.append((entry['mean'], entry['scale']))
+        self.mean = np.asarray([m for m, _ in constants], dtype=np.float32)
+        self.scale = np.asarray([s for _, s in constants], dtype=np.float32)
+        if self.target not in self.columns:
+            raise ValueError(f"Schema {self.name}: target {self.target} is not an input column")
+        self.target_index = self.columns.index(self.target)
+
+    @property
+    def n_columns(self):
+        return len(self.columns)
+
+    def resolve(self, provided):
+        """Request key for each schema column, or None if a column is missing"""
+        lower = {str(key).lower(): key for key in provided}
+        keys = []
+        for aliases in self.aliases:
+            key = next((lower[a.lower()] for a in aliases if a.lower() in lower), None)
+            if key is None:
+                return None
+            keys.append(key)
+        return keys
+
+    def transform(self, values):
+        return (values - self.mean) / self.scale
+
+    def transform_target(self, values):
+        return (values - self.mean[self.target_index]) / self.scale[self.target_index]
+
+    def inverse_target(self, scaled):
+        return scaled * self.scale[self.target_index] + self.mean[self.target_index]
+
+
+def load_schemas(path=SCHEMAS_PATH):
+    """
+    Schemas from the schema file, scaled from their scaler files (relative
+    to the schema file); their models are added to MODEL_REGISTRY.
+    """
+    with open(path, 'r') as f:
+        specs = json.load(f)['schemas']
+    scaler_files = {}
+    schemas = []
+    for spec in specs:
+        scaler_path = os.path.join(os.path.dirname(path), spec.get('scaler_file', DEFAULT_SCALER_FILE))
+        if scaler_path not in scaler_files:
+            with open(scaler_path, 'r') as f:
+                scaler_files[scaler_path] = json.load(f)
+        schemas.append(InputSchema(spec, scaler_files[scaler_path]))
+    for schema in schemas:
+        MODEL_REGISTRY.setdefault(schema.name, {
+            'file': schema.file,
+            'kind': 'multivariate',
+            'input_shape': [None, schema.window, schema.n_columns],
+        })
+    return schemas
+
+
+def select_schema(schemas, provided, name=None):
+    """The named schema, or the one whose columns are all provided and that uses the most of them"""
+    if name is not None:
+        for schema in schemas:
+            if schema.name == name:
+                if schema.resolve(provided) is None:
+                    raise ValueError(f"Schema {name} needs columns: {', '.join(schema.columns)}")
+                return schema
+        raise ValueError(f"Unknown input schema: {name}")
+
+    usable = [s for s in schemas if s.resolve(provided) is not None]
+    if not usable:
+        wanted = '; '.join(f"{s.name}: {', '.join(s.columns)}" for s in schemas)
+        raise ValueError(f"No input schema matches columns {', '.join(map(str, provided))} ({wanted})")
+    return max(usable, key=lambda s: s.n_columns)
+
+
+def column_matrix(columns, schema):
+    """[T, C] float32 matrix of a {name: values} mapping in schema column order"""
+    keys = schema.resolve(columns)
+    if keys is None:
+        raise ValueError(f"Schema {schema.name} needs columns: {', '.join(schema.columns)}")
+    arrays = [np.asarray(columns[key], dtype=np.float32) for key in keys]
+    lengths = {len(a) for a in arrays}
+    if len(lengths) != 1:
+        raise ValueError("All columns must have the same length")
+    matrix = np.column_stack(arrays)
+    if not np.isfinite(matrix).all():
+        raise ValueError("Columns must not contain missing values")
+    matrix[:, schema.target_index] = np.maximum(matrix[:, schema.target_index], 0.0)
+    return matrix
+
+
+def future_matrix(future, schema, horizon):
+    """
+    [horizon, C] exogenous values for the forecast steps (target column unused),
+    NaN where the request gives none; those are filled by carrying values forward.
+    """
+    out = np.full((horizon, schema.n_columns), np.nan, dtype=np.float32)
+    if not future:
+        return out
+    lower = {str(key).lower(): key for key in future}
+    for c, aliases in enumerate(schema.aliases):
+        if c == schema.target_index:
+            continue
+        key = next((lower[a.lower()] for a in aliases if a.lower() in lower), None)
+        if key is not None:
+            values = np.asarray(future[key], dtype=np.float32)[:horizon]
+            out[:len(values), c] = values
+    return out
+
+
+def forecast_multivariate(session, schema, matrices, horizon, futures=None):
+    """
+    Recursive forecast of the target column for N series.
+
+    matrices: list of [T_i, C] arrays (T_i >= window)
+    futures: optional list of [horizon, C] arrays from future_matrix()
+    Returns [N, horizon] float64 non-negative predictions.
+    """
+    n_series, window, n_columns = len(matrices), schema.window, schema.n_columns
+    for matrix in matrices:
+        if len(matrix) < window:
+            raise ValueError(f"Schema {schema.name} needs at least {window} rows per column")
+
+    with stage('features'):
+        buffer = np.empty((n_series, window + horizon, n_columns), dtype=np.float32)
+        buffer[:, :window] = np.stack([matrix[-window:] for matrix in matrices])
+        last = buffer[:, window - 1]
+        if futures is None:
+            buffer[:, window:] = last[:, None, :]
+        else:
+            # Forward-fill each column's future values, starting from the last observed row
+            future = np.stack(futures)
+            steps = np.where(np.isnan(future), -1, np.arange(horizon)[None, :, None])
+            steps = np.maximum.accumulate(steps, axis=1)
+            filled = np.take_along_axis(future, np.maximum(steps, 0), axis=1)
+            buffer[:, window:] = np.where(steps >= 0, filled, last[:, None, :])
+    # A folded model (fold_scalers.py) scales inside its graph and takes raw values
+    folded = is_folded(session)
+    if not folded:
+        with stage('scaling'):
+            buffer = schema.transform(buffer)
+
+    input_name = session.get_inputs()[0].name
+    predictions = np.empty((n_series, horizon), dtype=np.float64)
+    t = schema.target_index
+    for step in range(horizon):
+        with stage('features'):
+            inputs = np.ascontiguousarray(buffer[:, step:step + window])
+        with stage('model'):
+            output = session.run(None, {input_name: inputs})[0].reshape(n_series)
+        values = output if folded else np.maximum(schema.inverse_target(output), 0.0)
+        predictions[:, step] = values
+        # Feed the (clamped) prediction back in the buffer's units
+        buffer[:, window + step, t] = values if folded else schema.transform_target(values)
+    return predictions
@@ -0,0 +1,205 @@
+"""
+ONNX Runtime model loading for the server-side prediction path.
+
+Mirrors MODEL_REGISTRY in src/lib/onnxWebInference.ts, but sessions are
+created lazily and kept in a small LRU cache instead of being rebuilt on
+every call.
+"""
+
+import hashlib
+import os
+import platform
+import threading
+from collections import OrderedDict
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'public', 'models')
+
+# kind: 'tabular' models take the 9 scaled engineered features and predict in
+# original units; 'sequence' models take 7 target-scaled values and predict a
+# target-scaled value; 'direct' models take the tabular features of the first
+# target day and predict the next H days at once ([N, H], original units).
+# model_direct.onnx is produced by scripts/train_direct.py. 'multivariate'
+# entries are added from public/models/input_schemas.json by
+# multivariate.load_schemas(): [N, window, columns] per-column-scaled input.
+MODEL_REGISTRY = {
+    'gbr': {'file': 'model_gbr.onnx', 'kind': 'tabular', 'input_shape': [None, 9]},
+    'xgb': {'file': 'model_xgb.onnx', 'kind': 'tabular', 'input_shape': [None, 9]},
+    'lstm': {'file': 'model_lstm.onnx', 'kind': 'sequence', 'input_shape': [None, 7, 1]},
+    'bilstm': {'file': 'model_bilstm.onnx', 'kind': 'sequence', 'input_shape': [None, 7, 1]},
+    'direct': {'file': 'model_direct.onnx', 'kind': 'direct', 'input_shape': [None, 9]},
+}
+
+# Input name of models whose graph applies the StandardScaler itself (see
+# fold_scalers.py); they take unscaled values and return clamped mm.
+FOLDED_INPUT = 'raw_input'
+
+# Names used by older callers of predict_infer.py
+MODEL_ALIASES = {
+    'xgboost': 'xgb',
+}
+
+DEFAULT_CACHE_SIZE = int(os.environ.get('PREDICT_SESSION_CACHE_SIZE', '4'))
+
+# Graphs as optimized by ONNX Runtime on this machine, so later sessions skip
+# the optimization passes. Disabled with PREDICT_ORT_CACHE=0.
+ORT_CACHE_DIR = os.environ.get(
+    'PREDICT_ORT_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'ort-cache'))
+ORT_CACHE_ENABLED = os.environ.get('PREDICT_ORT_CACHE', '1') != '0'
+
+# Intra-op threads per session (0: ONNX Runtime's default). The zygote
+# launcher uses 1 so sessions own no thread pool and survive fork().
+ORT_THREADS = int(os.environ.get('PREDICT_ORT_THREADS', '0'))
+
+
+_model_versions = {}
+
+
+def model_version(name, models_dir=MODELS_DIR):
+    """Short content hash of a model file, so cached results change with the model"""
+    path = os.path.join(models_dir, MODEL_REGISTRY[name]['file'])
+    if path not in _model_versions:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        _model_versions[path] = digest.hexdigest()[:16]
+    return _model_versions[path]
+
+
+def model_installed(name, models_dir=MODELS_DIR):
+    """Whether the model file of a registry entry is present (model_direct.onnx is optional)"""
+    return os.path.exists(os.path.join(models_dir, MODEL_REGISTRY[name]['file']))
+
+
+def resolve_model_name(name):
+    """Map a request method name to a registry key, or None if it is not an ONNX model"""
+    name = MODEL_ALIASES.get(name, name)
+    return name if name in MODEL_REGISTRY else None
+
+
+class SessionCache:
+    """
+    Size-bounded LRU cache of onnxruntime InferenceSessions.
+
+    A session is created the first time its model is requested. When more
+    than max_size models are resident the least recently used one is dropped.
+    Access is guarded by a lock so worker threads can share one cache.
+    """
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE, models_dir=MODELS_DIR):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.models_dir = models_dir
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def optimized_path(self, name):
+        """Where the ORT-optimized graph of a model is cached; tied to the model, ORT version and CPU"""
+        import onnxruntime as ort
+
+        stem = os.path.splitext(MODEL_REGISTRY[name]['file'])[0]
+        tag = f"{model_version(name, self.models_dir)}-ort{ort.__version__}-{platform.machine()}"
+        return os.path.join(ORT_CACHE_DIR, f"{stem}-{tag}.onnx")
+
+    def _create_session(self, name):
+        import onnxruntime as ort
+
+        info = MODEL_REGISTRY[name]
+        path = os.path.join(self.models_dir, info['file'])
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Model file not found: {path}")
+
+        options = ort.SessionOptions()
+        if ORT_THREADS:
+            options.intra_op_num_threads = ORT_THREADS
+            options.inter_op_num_threads = 1
+        if not ORT_CACHE_ENABLED:
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            return ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+
+        cached = self.optimized_path(name)
+        if os.path.exists(cached):
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            return ort.InferenceSession(cached, sess_options=options, providers=['CPUExecutionProvider'])
+
+        # First load on this machine: optimize as usual and keep the result
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # Quiet the "hardware specific optimizations" warning; the cache is per machine
+        options.log_severity_level = 3
+        tmp_path = f"{cached}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(ORT_CACHE_DIR, exist_ok=True)
+            options.optimized_model_filepath = tmp_path
+            session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+            os.replace(tmp_path, cached)
+            return session
+        except Exception:
+            # e.g. a read-only checkout: run without the cache (a broken model fails again below)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            options.optimized_model_filepath = ''
+            return ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+
+    def get(self, name):
+        """Return the session for a model, loading it on first use"""
+        if name not in MODEL_REGISTRY:
+            raise ValueError(f"Unknown model type: {name}")
+
+        with self._lock:
+            session = self._sessions.get(name)
+            if session is not None:
+                self._sessions.move_to_end(name)
+                return session
+
+            session = self._create_session(name)
+            self._sessions[name] = session
+            while len(self._sessions) > self.max_size:
+                self._sessions.popitem(last=False)
+            return session
+
+    def evict(self, name):
+        """Drop one model's session; returns True if it was resident"""
+        with self._lock:
+            return self._sessions.pop(name, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+    def loaded(self):
+        """Names of resident models, least recently used first"""
+        with self._lock:
+            return list(self._sessions.keys())
+
+    def __contains__(self, name):
+        with self._lock:
+            return name in self._sessions
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+def model_horizon(session):
+    """Number of days a direct model predicts per call (metadata 'horizon' or output width)"""
+    metadata = session.get_modelmeta().custom_metadata_map
+    if 'horizon' in metadata:
+        return int(metadata['horizon'])
+    width = session.get_outputs()[0].shape[-1]
+    if not isinstance(width, int):
+        raise ValueError("Direct model does not declare its horizon")
+    return width
+
+
+def is_folded(session):
+    """True for models with the scaler folded into the graph"""
+    return session.get_inputs()[0].name == FOLDED_INPUT
+
+
+def run_model(session, inputs):
+    """Run a single-input, single-output model and return a flat float32 array"""
+    input_name = session.get_inputs()[0].name
+    output = session.run(None, {input_name: inputs})[0]
+    return output.reshape(-1)
@@ -0,0 +1,238 @@
+"""
+Optimized and int8-quantized variants of the ONNX models, with a report.
+
+For every model in public/models this writes, under --output-dir:
+
+- <name>.extended.onnx  ORT graph optimizations up to 'extended', saved offline
+- <name>.all.onnx       all ORT optimizations including layout ones; these may
+                        use CPU-specific kernels and are not portable to
+                        other hardware or ONNX Runtime Web
+- <name>.int8.onnx      dynamic int8 quantization of the weights (MatMul,
+                        LSTM, ...); tree ensembles have nothing to quantize
+                        and get no int8 variant
+
+and benchmarks each variant next to the original: file size, session load
+time, single-row latency (p50/p95, one thread), batch throughput, and MAE/RMSE
+on the holdout split of Regresi-Hujan.xlsx (the last --test-fraction of the
+rows, as in train_models.py) together with the drift from the original.
+The recommended variant per model is the fastest single-row one whose MAE and
+RMSE stay within --tolerance (relative) of the original; the non-portable
+'all' variant is only considered with --allow-non-portable.
+
+Usage:
+    python scripts/optimize_models.py [--models gbr,xgb,lstm,bilstm] [--output-dir DIR]
+                                      [--tolerance 0.01] [--repeats 300]
+
+Only onnxruntime is needed, not the training stack.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from features import WINDOW_SIZE, Scaler
+from onnx_models import MODEL_REGISTRY, MODELS_DIR, is_folded, model_horizon
+from metrics import regression_metrics
+from train_models import TEST_FRACTION, load_training_data
+import train_direct
+
+DEFAULT_OUTPUT_DIR = os.path.join(MODELS_DIR, 'variants')
+DEFAULT_TOLERANCE = 0.01
+DEFAULT_REPEATS = 300
+# Saved 'all'-level graphs are tied to the CPU they were optimized on
+NON_PORTABLE_VARIANTS = ('all',)
+QUANTIZABLE_OPS = ('MatMul', 'Gemm', 'LSTM', 'GRU', 'Conv', 'Attention')
+QUANTIZED_OPS = ('MatMulInteger', 'ConvInteger', 'DynamicQuantizeLSTM', 'DynamicQuantizeMatMul',
+                 'QLinearMatMul', 'QAttention')
+
+
+def make_session(path, threads=1):
+    """Session configured like SessionCache, pinned to `threads` intra-op threads"""
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    return ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+
+
+def optimized_variant(source, target, level):
+    """Let ONNX Runtime optimize `source` at `level` and save the resulting graph"""
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = level
+    options.optimized_model_filepath = target
+    ort.InferenceSession(source, sess_options=options, providers=['CPUExecutionProvider'])
+    return target
+
+
+def quantized_variant(source, target):
+    """Dynamic int8 weight quantization; None when the graph has nothing to quantize"""
+    import onnx
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    if not any(node.op_type in QUANTIZABLE_OPS for node in onnx.load(source).graph.node):
+        return None
+    quantize_dynamic(source, target, weight_type=QuantType.QInt8)
+    if not any(node.op_type in QUANTIZED_OPS for node in onnx.load(target).graph.node):
+        os.remove(target)
+        return None
+    return target
+
+
+def build_variants(name, source, output_dir):
+    """{variant: path} for one model, the original included"""
+    import onnxruntime as ort
+
+    levels = ort.GraphOptimizationLevel
+    variants = {'original': source}
+    variants['extended'] = optimized_variant(
+        source, os.path.join(output_dir, f"{name}.extended.onnx"), levels.ORT_ENABLE_EXTENDED)
+    variants['all'] = optimized_variant(
+        source, os.path.join(output_dir, f"{name}.all.onnx"), levels.ORT_ENABLE_ALL)
+    quantized = quantized_variant(source, os.path.join(output_dir, f"{name}.int8.onnx"))
+    if quantized is not None:
+        variants['int8'] = quantized
+    return variants
+
+
+def holdout_set(name, session, data, scaler, test_fraction):
+    """(model inputs, true mm) of the holdout rows, in the units `session` expects"""
+    kind = MODEL_REGISTRY[name]['kind']
+    train_end = int(len(data['features']) * (1 - test_fraction))
+    folded = is_folded(session)
+
+    if kind == 'tabular':
+        X = data['features'][train_end:]
+        X = X if folded else scaler.transform_features(X)
+        return np.ascontiguousarray(X, dtype=np.float32), data['targets'][train_end:]
+    if kind == 'sequence':
+        windows = sliding_window_view(data['values'], WINDOW_SIZE)[:-1][train_end:]
+        windows = windows if folded else scaler.transform_target(windows)
+        return (np.ascontiguousarray(windows[:, :, np.newaxis], dtype=np.float32),
+                data['targets'][train_end:])
+    if kind == 'direct':
+        X, Y = train_direct.direct_training_set(data['values'], data['dates'], scaler, model_horizon(session))
+        return np.ascontiguousarray(X[train_end:], dtype=np.float32), Y[train_end:]
+    raise ValueError(f"Cannot benchmark a '{kind}' model")
+
+
+def predict(session, name, inputs, scaler):
+    """Predictions in mm, clamped like the serving path"""
+    output = session.run(None, {session.get_inputs()[0].name: inputs})[0]
+    if MODEL_REGISTRY[name]['kind'] == 'sequence' and not is_folded(session):
+        output = scaler.inverse_target(output)
+    output = output.reshape(len(inputs), -1)
+    return np.maximum(output[:, 0] if output.shape[1] == 1 else output, 0.0)
+
+
+def benchmark(path, name, data, scaler, test_fraction, repeats, threads):
+    """Size, load time, latency, throughput and holdout metrics of one model file"""
+    start = time.perf_counter()
+    session = make_session(path, threads)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    inputs, truth = holdout_set(name, session, data, scaler, test_fraction)
+    input_name = session.get_inputs()[0].name
+    row = inputs[:1]
+    for _ in range(20):
+        session.run(None, {input_name: row})
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        session.run(None, {input_name: row})
+        timings[i] = time.perf_counter() - start
+
+    batch_seconds = np.inf
+    for _ in range(3):
+        start = time.perf_counter()
+        predictions = predict(session, name, inputs, scaler)
+        batch_seconds = min(batch_seconds, time.perf_counter() - start)
+
+    result = {
+        'path': os.path.relpath(path),
+        'size_bytes': os.path.getsize(path),
+        'load_ms': load_ms,
+        'latency_ms': {'p50': float(np.percentile(timings, 50) * 1000),
+                       'p95': float(np.percentile(timings, 95) * 1000)},
+        'batch_rows_per_s': float(len(inputs) / batch_seconds),
+        'holdout_rows': int(len(inputs)),
+    }
+    # Pooled over every lead time for the multi-output direct model
+    result.update(regression_metrics(truth.ravel(), predictions.ravel()))
+    return result, predictions
+
+
+def recommend(variants, tolerance, allow_non_portable=False):
+    """Fastest variant whose MAE and RMSE are within `tolerance` of the original"""
+    base = variants['original']
+    within = [name for name, result in variants.items()
+              if (allow_non_portable or result['portable'])
+              and result['mae'] <= base['mae'] * (1 + tolerance) and result['rmse'] <= base['rmse'] * (1 + tolerance)]
+    return min(within, key=lambda name: variants[name]['latency_ms']['p50'])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Optimize/quantize the ONNX models and report latency and accuracy")
+    available = [name for name, info in MODEL_REGISTRY.items()
+                 if os.path.exists(os.path.join(MODELS_DIR, info['file']))]
+    parser.add_argument('--models', default=','.join(available))
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative MAE/RMSE increase over the original")
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS, help="Single-row runs per variant")
+    parser.add_argument('--threads', type=int, default=1, help="Intra-op threads per session")
+    parser.add_argument('--test-fraction', type=float, default=TEST_FRACTION)
+    parser.add_argument('--allow-non-portable', action='store_true',
+                        help="Let the hardware-specific 'all' variant be recommended")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    models = [m.strip() for m in args.models.split(',') if m.strip()]
+    unknown = [m for m in models if m not in MODEL_REGISTRY]
+    if unknown:
+        raise SystemExit(f"Unknown models: {', '.join(unknown)}")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    data = load_training_data()
+    scaler = Scaler.load()
+    report = {'tolerance': args.tolerance, 'threads': args.threads, 'repeats': args.repeats,
+              'dataset_sha256': data['sha256'], 'models': {}}
+
+    for name in models:
+        source = os.path.join(MODELS_DIR, MODEL_REGISTRY[name]['file'])
+        results = {}
+        reference = None
+        for variant, path in build_variants(name, source, args.output_dir).items():
+            result, predictions = benchmark(path, name, data, scaler, args.test_fraction, args.repeats, args.threads)
+            if reference is None:
+                reference = predictions
+            result['portable'] = variant not in NON_PORTABLE_VARIANTS
+            result['max_abs_diff'] = float(np.max(np.abs(predictions - reference)))
+            result['mae_drift'] = result['mae'] - results.get('original', result)['mae']
+            result['rmse_drift'] = result['rmse'] - results.get('original', result)['rmse']
+            results[variant] = result
+        report['models'][name] = {'variants': results,
+                                  'recommended': recommend(results, args.tolerance, args.allow_non_portable)}
+
+        summary = ', '.join(f"{variant} {r['latency_ms']['p50']:.3f}ms/{r['size_bytes'] // 1024}KiB "
+                            f"mae {r['mae']:.4f}" for variant, r in results.items())
+        sys.stderr.write(f"{name}: {summary} -> {report['models'][name]['recommended']}\n")
+
+    with open(os.path.join(args.output_dir, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
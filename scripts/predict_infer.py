@@ -1,82 +1,822 @@
+import time
+
+# Import milestones for --startup-report
+_IMPORT_TIMES = {'start': time.perf_counter()}
+
 import sys
 import json
-import numpy as np
+import argparse
 import os
 
-# Mock fallbacks if libraries are missing (unlikely in user env but safe)
-try:
-    import pandas as pd
-except ImportError:
-    pd = None
+import numpy as np
+_IMPORT_TIMES['numpy'] = time.perf_counter()
+
+# Heavy dependencies load with the first method that needs them: onnxruntime
+# with the first model session, scipy with ARIMA, pandas with CSV ingestion.
+from onnx_models import (MODEL_REGISTRY, MODELS_DIR, SessionCache, model_installed, model_version,
+                         resolve_model_name)
+from features import WINDOW_SIZE, Scaler
+import framing
+from forecast_cache import ForecastCache, cache_key
+from forecasting import HYBRID_MODELS, forecast_batch, forecast_dates, is_auto_order, parse_hybrid_weight
+from hourly import HOURS_PER_DAY, daily_totals
+from multivariate import column_matrix, forecast_multivariate, future_matrix, load_schemas, select_schema
+from probabilistic import Sampling, sample_forecast
+from telemetry import MetricsRegistry, Timings, activate, stage, timed
+_IMPORT_TIMES['modules'] = time.perf_counter()
+
+# Models, scalers and anything else expensive to build are kept here for the
+# lifetime of the process. One-shot runs fill it once; --serve reuses it for
+# every request on the same warm process.
+_resources = {}
+
+# Days of context read when a request asks for dataset history without 'days'
+DATASET_CONTEXT_DAYS = 365
+
+# Spawn-to-ready budget checked by --startup-report
+STARTUP_BUDGET_MS = float(os.environ.get('PREDICT_STARTUP_BUDGET_MS', '1500'))
+STARTUP_METHODS = ('gbr', 'xgb', 'lstm', 'bilstm')
+
+# Per-method/horizon request metrics in --serve/--http workers; PREDICT_METRICS=0 turns
+# them off, leaving stage timings to requests that ask for them with "timings": true
+METRICS_ENABLED = os.environ.get('PREDICT_METRICS', '1') != '0'
+METRIC_METHODS = ('hybrid', 'arima', 'multivariate')
+
+
+def get_scaler():
+    """Load scaler_params.json once and keep it resident"""
+    if 'scaler' not in _resources:
+        _resources['scaler'] = Scaler.load(os.path.join(MODELS_DIR, 'scaler_params.json'))
+    return _resources['scaler']
+
+
+def get_session_cache():
+    """Shared ONNX session cache; models load lazily on first use"""
+    if 'sessions' not in _resources:
+        _resources['sessions'] = SessionCache()
+    return _resources['sessions']
+
+
+def parse_history(values):
+    """Historical values as a non-negative float64 array"""
+    return np.maximum(np.asarray(values, dtype=np.float64), 0.0)
+
+
+def get_dataset():
+    """Bundled historical workbook, memory-mapped from its columnar cache"""
+    if 'dataset' not in _resources:
+        import dataset
+        _resources['dataset'] = dataset.open_daily_rainfall()
+    return _resources['dataset']
+
+
+def dataset_history(spec):
+    """
+    History taken from the bundled dataset instead of the request body.
+    spec is true or {"until": "YYYY-MM-DD", "days": N}; returns (values, last_date).
+    """
+    spec = spec if isinstance(spec, dict) else {}
+    dates, values = get_dataset().window(spec.get('until'), spec.get('days', DATASET_CONTEXT_DAYS))
+    if len(values) == 0:
+        raise ValueError("No dataset history on or before the requested date")
+    return parse_history(values), dates[-1]
+
+
+def get_station_store():
+    """Per-station history store (PREDICT_STORE_DIR)"""
+    if 'stations' not in _resources:
+        from station_store import StationStore
+        _resources['stations'] = StationStore()
+    return _resources['stations']
+
+
+def station_history(entry, resolution='daily', gap_free=True):
+    """
+    History of entry['station'] from the station store: the last 'days' days
+    (default 365) on or before 'until' (default: the latest stored time).
+    Returns (values, last time, stored times). The models read a history as
+    consecutive steps, so with `gap_free` a window with missing records is
+    refused rather than silently closed up.
+    """
+    from station_store import last_gap
+
+    try:
+        series = get_station_store().series(entry['station'], resolution)
+    except KeyError as e:
+        raise ValueError(e.args[0])
+    steps_per_day = HOURS_PER_DAY if resolution == 'hourly' else 1
+    count = int(entry.get('days', DATASET_CONTEXT_DAYS)) * steps_per_day
+    dates, values = series.window(entry.get('until'), count)
+    if len(values) == 0:
+        raise ValueError(f"Station {entry['station']} has no data on or before the requested date")
+    gap = last_gap(dates) if gap_free else None
+    if gap is not None:
+        raise ValueError(f"Station {entry['station']} has no data between {dates[gap]} and {dates[gap + 1]}; "
+                         f"request a window without the gap ('until' before it, or 'days' of at most "
+                         f"{(len(dates) - gap - 1) // steps_per_day})")
+    return parse_history(values), dates[-1], dates
+
+
+def parse_last_date(entry, resolution='daily'):
+    """Date (hour for hourly data) of the last observation from 'last_date' or the tail of 'dates'"""
+    last_date = entry.get('last_date')
+    if last_date is None and entry.get('dates'):
+        last_date = entry['dates'][-1]
+    if last_date is None:
+        return None
+    if resolution == 'hourly':
+        return np.datetime64(str(last_date)).astype('datetime64[h]')
+    return np.datetime64(str(last_date)[:10], 'D')
+
+
+def get_input_schemas():
+    """Multivariate input schemas (public/models/input_schemas.json)"""
+    if 'schemas' not in _resources:
+        _resources['schemas'] = load_schemas()
+    return _resources['schemas']
+
+
+def get_metrics():
+    """Process-wide MetricsRegistry, or None when metrics are off or not yet enabled"""
+    return _resources.get('metrics')
+
+
+def enable_metrics():
+    """Start aggregating request metrics (long-lived workers only)"""
+    if METRICS_ENABLED and 'metrics' not in _resources:
+        _resources['metrics'] = MetricsRegistry()
+    return get_metrics()
+
+
+def get_forecast_cache():
+    """Shared result cache, or None when disabled with PREDICT_CACHE=0"""
+    if 'forecast_cache' not in _resources:
+        enabled = os.environ.get('PREDICT_CACHE', '1') != '0'
+        _resources['forecast_cache'] = ForecastCache(disk_dir=os.environ.get('PREDICT_CACHE_DIR')) if enabled else None
+    return _resources['forecast_cache']
+
+
+def series_cache_key(method, history, last_date, horizon, order, xgb_weight=None, schema=None, future=None):
+    """Hash of what determines one series' forecast under `method`"""
+    if schema is not None:
+        tail = np.concatenate([history[-schema.window:].ravel(), future.ravel()])
+        return cache_key(schema.name, model_version(schema.name), horizon, tail, last_date)
+    model_name = resolve_model_name(method)
+    if model_name is not None:
+        # ONNX models only ever read the trailing window
+        return cache_key(model_name, model_version(model_name), horizon, history[-WINDOW_SIZE:], last_date)
+    if method == 'hybrid':
+        version = '+'.join(model_version(name) for name in HYBRID_MODELS)
+        return cache_key(method, version, horizon, history[-WINDOW_SIZE:], last_date,
+                         extra=parse_hybrid_weight(xgb_weight))
+    if method == 'arima':
+        return cache_key(method, method, horizon, history, last_date, extra=order)
+    return cache_key(method, method, horizon, history[-1:], last_date)
+
+
+def run_forecast(method, histories, last_dates, horizon, order=None, use_cache=True, xgb_weight=None,
+                 schema=None, futures=None):
+    """
+    Forecast N series, serving repeated ones from the result cache.
+    For method 'multivariate' histories are [T, C] matrices of `schema`'s
+    columns and futures the matching [horizon, C] future_matrix() arrays.
+    Returns ([N, horizon] predictions, per-series details list; empty unless ARIMA).
+    """
+    def compute(indices):
+        details = []
+        subset_dates = last_dates[indices] if last_dates is not None else None
+        if schema is not None:
+            with stage('load'):
+                session = get_session_cache().get(schema.name)
+            predictions = forecast_multivariate(session, schema, [histories[i] for i in indices], horizon,
+                                                [futures[i] for i in indices])
+        else:
+            predictions = forecast_batch(method, [histories[i] for i in indices], subset_dates, horizon,
+                                         get_session_cache(), get_scaler(), order=order, details=details,
+                                         xgb_weight=xgb_weight)
+        return [{"predictions": predictions[k].tolist(), "details": details[k] if details else None}
+                for k in range(len(indices))]
+
+    cache = get_forecast_cache() if use_cache else None
+    if cache is None:
+        entries = compute(list(range(len(histories))))
+    else:
+        with stage('cache'):
+            keys = [series_cache_key(method, h, last_dates[i] if last_dates is not None else None, horizon, order,
+                                     xgb_weight, schema, futures[i] if futures is not None else None)
+                    for i, h in enumerate(histories)]
+        entries = cache.get_many(keys, compute)
+
+    predictions = np.array([entry["predictions"] for entry in entries], dtype=np.float64)
+    details = [entry["details"] for entry in entries if entry["details"] is not None]
+    return predictions, details
+
+
+def run_sampled_forecast(method, histories, last_dates, horizon, sampling, order=None, xgb_weight=None):
+    """
+    Point forecasts and sample-path statistics of N series (see probabilistic.py);
+    never cached, since paths are random. Returns (predictions, details, bands)
+    with bands a dict of "mean", "quantiles" and "paths" arrays.
+    """
+    details = []
+    point, paths, mean, quantiles = sample_forecast(method, histories, last_dates, horizon, get_session_cache(),
+                                                    get_scaler(), sampling, order=order, details=details,
+                                                    xgb_weight=xgb_weight)
+    return point, details, {"mean": mean, "quantiles": quantiles, "paths": paths}
+
+
+DIRECT_NOT_INSTALLED = ("Direct model not installed: public/models/model_direct.onnx is missing. "
+                        "Train it with scripts/train_direct.py, or send strategy 'auto' to fall back "
+                        "to recursive forecasting")
+
+
+def resolve_strategy(method, strategy):
+    """
+    (method, strategy) that implement `strategy`. 'recursive' feeds each
+    prediction back into the next step; 'direct' swaps a tabular model for the
+    multi-output direct model, which predicts the whole horizon in one call.
+    'auto' is 'direct' when model_direct.onnx is installed and 'recursive'
+    otherwise. The direct model is optional, so asking for it without it
+    installed is an error rather than a silent recursive forecast.
+    """
+    if strategy not in ('recursive', 'direct', 'auto'):
+        raise ValueError(f"Unknown strategy: {strategy}")
+    model_name = resolve_model_name(method)
+    if strategy == 'recursive':
+        if model_name == 'direct' and not model_installed('direct'):
+            raise ValueError(DIRECT_NOT_INSTALLED)
+        return method, strategy
+    if model_name is None or MODEL_REGISTRY[model_name]['kind'] not in ('tabular', 'direct'):
+        raise ValueError(f"Strategy '{strategy}' is only available for tabular models, not '{method}'")
+    if model_installed('direct'):
+        return 'direct', 'direct'
+    if strategy == 'direct' or model_name == 'direct':
+        raise ValueError(DIRECT_NOT_INSTALLED)
+    return method, 'recursive'
+
+
+def series_input(entry, values_key, resolution='daily', gap_free=True):
+    """
+    (history, last_date, times) of a request or series entry: its values, a
+    'station' or 'dataset'. times are the stored timestamps of station data
+    (None otherwise, the values being consecutive steps up to last_date).
+    """
+    if values_key not in entry and entry.get('station') is not None:
+        return station_history(entry, resolution, gap_free)
+    if values_key not in entry and entry.get('dataset'):
+        if resolution != 'daily':
+            raise ValueError("The bundled dataset only has daily data")
+        return dataset_history(entry['dataset']) + (None,)
+    return parse_history(entry.get(values_key, [])), parse_last_date(entry, resolution), None
+
+
+def multivariate_inputs(request, entries, horizon):
+    """
+    ([T, C] matrices, [horizon, C] futures, schema) of columnar entries. The
+    schema is request['schema'] or the best match for the first entry's columns.
+    """
+    schema = select_schema(get_input_schemas(), entries[0].get('columns') or {}, request.get('schema'))
+    matrices = [column_matrix(entry.get('columns') or {}, schema) for entry in entries]
+    futures = [future_matrix(entry.get('future'), schema, horizon) for entry in entries]
+    return matrices, futures, schema
+
+
+def uses_daily_models(method):
+    return resolve_model_name(method) is not None or method == 'hybrid'
+
+
+def adapt_resolution(method, order, resolution, inputs):
+    """
+    Fit (history, last_date, times) inputs to the method. The ONNX models are
+    daily, so hourly histories become daily totals (by their timestamps,
+    when known) for them; ARIMA and persistence
+    forecast hourly series directly, and an 'auto' ARIMA search then looks for
+    a 24-hour season. Returns (inputs, order, output resolution).
+    """
+    if resolution == 'daily':
+        return inputs, order, resolution
+    if uses_daily_models(method):
+        if any(last is None for _, last, _ in inputs):
+            raise ValueError("Hourly input needs 'last_date' or 'dates' to align days")
+        daily = []
+        for history, last, times in inputs:
+            totals, last_day = daily_totals(history, last, times=times)
+            daily.append((parse_history(totals), last_day, None))
+        return daily, order, 'daily'
+    if is_auto_order(order):
+        options = dict(order) if isinstance(order, dict) else {'auto': True}
+        options.setdefault('s', HOURS_PER_DAY)
+        order = options
+    return inputs, order, resolution
+
+
+class ForecastJob:
+    """
+    A decoded forecast request: one or more series sharing method, horizon and
+    order. A plain 'features' request becomes a job with a single series.
+    """
+
+    def __init__(self, method, horizon, order, use_cache, histories, last_dates, ids, single, xgb_weight=None,
+                 resolution='daily', echo_resolution=False, schema=None, futures=None, sampling=None,
+                 strategy=None):
+        self.method = method
+        # Strategy that ran, echoed when the request named one ('auto' may fall back)
+        self.strategy = strategy
+        self.schema = schema
+        self.futures = futures
+        self.resolution = resolution
+        self.echo_resolution = echo_resolution
+        self.horizon = horizon
+        self.order = order
+        self.xgb_weight = xgb_weight
+        self.use_cache = use_cache
+        # probabilistic.Sampling when the request asks for "samples"
+        self.sampling = sampling
+        self.histories = histories
+        self.last_dates = last_dates
+        self.ids = ids
+        self.single = single
+        # telemetry.Timings of the request, when it is being timed
+        self.timings = None
+        # Keep predictions as ndarrays for the binary transport instead of lists
+        self.arrays = False
+
+    @classmethod
+    def from_request(cls, request):
+        method = request.get('method', 'onnx')
+        horizon = int(request.get('horizon', 1))
+        if horizon < 1:
+            raise ValueError("Horizon must be at least 1")
+        order = request.get('order')
+        use_cache = request.get('cache', True)
+        # Only read by method 'hybrid': XGBoost share of the XGBoost + LSTM blend
+        xgb_weight = request.get('xgb_weight')
+        method, strategy = resolve_strategy(method, request.get('strategy', 'recursive'))
+        # 'daily' or 'hourly' input; horizon counts steps of the output resolution
+        resolution = request.get('resolution', 'daily')
+        if resolution not in ('daily', 'hourly'):
+            raise ValueError(f"Unknown resolution: {resolution}")
+
+        sampling = Sampling.from_request(request)
+
+        if method == 'multivariate':
+            if sampling is not None:
+                raise ValueError("Sample paths are not available for method 'multivariate'")
+            return cls.multivariate_request(request, horizon, use_cache)
+
+        # Hourly data for the daily models may miss hours; daily_totals checks whole days instead
+        gap_free = resolution == 'daily' or not uses_daily_models(method)
+        if 'series' in request:
+            series = request['series']
+            if not series:
+                raise ValueError("No series provided")
+            inputs = [series_input(s, 'values', resolution, gap_free) for s in series]
+            ids = [s.get('id', i) for i, s in enumerate(series)]
+            single = False
+        else:
+            # 'features' here is expected to be the historical data needed for lag generation
+            # (or the full history for ARIMA, whose order comes from 'order').
+            # Calendar features need the date of the last value: either 'last_date'
+            # or a 'dates' list aligned with 'features'. With "dataset" instead of
+            # 'features' the history comes from the bundled workbook.
+            inputs = [series_input(request, 'features', resolution, gap_free)]
+            if len(inputs[0][0]) == 0:
+                raise ValueError("No features provided")
+            ids = [None]
+            single = True
 
-# We will lazily load model libraries to avoid overhead if not needed
-# or simple try/except blocks inside handlers.
+        inputs, order, output_resolution = adapt_resolution(method, order, resolution, inputs)
+        return cls(method, horizon, order, use_cache, [history for history, _, _ in inputs],
+                   [last_date for _, last_date, _ in inputs], ids, single, xgb_weight=xgb_weight,
+                   resolution=output_resolution, echo_resolution='resolution' in request, sampling=sampling,
+                   strategy=strategy if 'strategy' in request else None)
 
-def main():
+    @classmethod
+    def multivariate_request(cls, request, horizon, use_cache):
+        """
+        Columnar input: {"columns": {"rainfall": [...], "suhu": [...], ...},
+        "future": {...}?, "last_date"?} or a "series" list of such entries.
+        """
+        if request.get('resolution', 'daily') != 'daily':
+            raise ValueError("Multivariate input is daily only")
+        single = 'series' not in request
+        entries = [request] if single else request['series']
+        if not entries:
+            raise ValueError("No series provided")
+        matrices, futures, schema = multivariate_inputs(request, entries, horizon)
+        ids = [None] if single else [s.get('id', i) for i, s in enumerate(entries)]
+        return cls('multivariate', horizon, None, use_cache, matrices,
+                   [parse_last_date(entry) for entry in entries], ids, single,
+                   echo_resolution='resolution' in request, schema=schema, futures=futures)
+
+    @property
+    def has_dates(self):
+        return all(d is not None for d in self.last_dates)
+
+    def dates_array(self):
+        unit = 'h' if self.resolution == 'hourly' else 'D'
+        return np.array(self.last_dates, dtype=f'datetime64[{unit}]') if self.has_dates else None
+
+    def group_key(self):
+        """Jobs with equal keys can be forecast together in one batch"""
+        return (self.method, self.horizon, json.dumps(self.order, sort_keys=True), self.xgb_weight,
+                bool(self.use_cache), self.has_dates, self.resolution,
+                self.schema.name if self.schema is not None else None,
+                # Sample paths are drawn per request, so a seed gives the same paths however it is batched
+                id(self) if self.sampling is not None else None)
+
+    def values(self, row):
+        return row if self.arrays else row.tolist()
+
+    def add_bands(self, result, bands, i):
+        """Sample-path mean, quantiles (and paths, if asked for) of series i"""
+        result["mean"] = self.values(bands["mean"][i])
+        result["quantiles"] = {label: self.values(bands["quantiles"][q, i])
+                               for q, label in enumerate(self.sampling.labels())}
+        if self.sampling.return_paths:
+            result["paths"] = self.values(bands["paths"][i])
+
+    def response(self, predictions, details, bands=None):
+        """Response payload from [N, horizon] predictions, per-series details and sample-path bands"""
+        if self.single:
+            response = {"predictions": self.values(predictions[0])}
+            if bands is not None:
+                self.add_bands(response, bands, 0)
+            if self.schema is not None:
+                response["schema"] = self.schema.name
+            if details:
+                response["arima"] = details[0]
+            if self.echo_resolution:
+                response["resolution"] = self.resolution
+            if self.strategy is not None:
+                response["strategy"] = self.strategy
+            if self.sampling is not None:
+                response["samples"] = self.sampling.samples
+            return response
+
+        results = []
+        dates = forecast_dates(self.dates_array(), self.horizon) if self.has_dates else None
+        for i, series_id in enumerate(self.ids):
+            result = {"id": series_id, "predictions": self.values(predictions[i])}
+            if dates is not None:
+                result["dates"] = dates[i].tolist()
+            if bands is not None:
+                self.add_bands(result, bands, i)
+            if details:
+                result["arima"] = details[i]
+            results.append(result)
+        response = {"series": results}
+        if self.schema is not None:
+            response["schema"] = self.schema.name
+        if self.echo_resolution:
+            response["resolution"] = self.resolution
+        if self.strategy is not None:
+            response["strategy"] = self.strategy
+        if self.sampling is not None:
+            response["samples"] = self.sampling.samples
+        return response
+
+
+def metric_method(method):
+    """Method label for metrics; unknown names (persistence fallback) share one label"""
+    if method in METRIC_METHODS or resolve_model_name(method) is not None:
+        return method
+    return 'persistence'
+
+
+def start_timings(request, start):
+    """
+    Timings for a forecast request, started at `start` (when it was received)
+    with its parse time, or None when neither metrics nor the request want them.
+    """
+    include = bool(request.get('timings'))
+    if 'command' in request or not (include or get_metrics() is not None):
+        return None
+    timings = Timings(start, include)
+    timings.add('parse', time.perf_counter() - start)
+    return timings
+
+
+def finish_timings(timings, status='ok'):
+    timings.finish(status)
+    metrics = get_metrics()
+    if metrics is not None:
+        metrics.observe(timings)
+
+
+def encode_response(response, timings=None, binary=False, dtype=framing.DEFAULT_DTYPE):
+    """
+    JSON text of a response payload, or with `binary` a framing.py frame
+    with its arrays as `dtype`. A timed request also records its
+    serialization, is added to the metrics, and gets its "timings" field
+    appended when it asked for it.
+    """
+    def encode():
+        return framing.encode(response, dtype) if binary else json.dumps(response)
+
+    if timings is None:
+        return encode()
+    with timings.stage('serialize'):
+        out = encode()
+    finish_timings(timings, 'error' if 'error' in response else 'ok')
+    if timings.include:
+        if binary:
+            out = framing.add_fields(out, {"timings": timings.as_dict()})
+        elif out.endswith('}'):
+            out = f'{out[:-1]}, "timings": {json.dumps(timings.as_dict())}}}'
+    return out
+
+
+def decode_job(request, timings=None, arrays=False):
+    """
+    ForecastJob of a request; with `timings` the decode is timed and the job
+    carries them. With `arrays` its response keeps predictions as ndarrays.
+    """
+    with timed(timings, 'decode'):
+        job = ForecastJob.from_request(request)
+    if timings is not None:
+        timings.describe(metric_method(job.method), job.horizon, len(job.histories))
+        job.timings = timings
+    job.arrays = arrays
+    return job
+
+
+def run_job(job):
+    """Forecast every series of a job; returns the response payload"""
+    with activate(job.timings):
+        bands = None
+        if job.sampling is not None:
+            predictions, details, bands = run_sampled_forecast(job.method, job.histories, job.dates_array(),
+                                                               job.horizon, job.sampling, job.order, job.xgb_weight)
+        else:
+            predictions, details = run_forecast(job.method, job.histories, job.dates_array(), job.horizon,
+                                                job.order, job.use_cache, job.xgb_weight, job.schema, job.futures)
+        with stage('postprocess'):
+            return job.response(predictions, details, bands)
+
+
+def handle_command(request):
+    """Control messages for long-lived workers, e.g. {"command": "stats"}"""
+    command = request['command']
+    if command == 'stats':
+        cache = get_forecast_cache()
+        return {"cache": cache.stats() if cache else None,
+                "sessions": get_session_cache().loaded()}
+    if command == 'metrics':
+        # Prometheus text exposition of this worker's request metrics
+        return {"metrics": metrics_text()}
+    if command == 'append':
+        # New observations for a station: {"station", "dates", "values", "resolution"?}
+        resolution = request.get('resolution', 'daily')
+        written = get_station_store().append(request['station'], request['dates'], request['values'], resolution)
+        return {"station": request['station'], "resolution": resolution, "appended": written}
+    if command == 'ingest_csv':
+        # Stream a CSV from the ingest directory into a station: {"path", "station", "resolution"?}
+        from csv_ingest import ingest_csv, ingest_path
+        return ingest_csv(ingest_path(request['path']), request['station'], get_station_store(),
+                          request.get('resolution', 'auto'))
+    if command == 'clear_cache':
+        cache = get_forecast_cache()
+        if cache:
+            cache.clear()
+        return {"cleared": True}
+    raise ValueError(f"Unknown command: {command}")
+
+
+def handle_request(request, timings=None, arrays=False):
+    """Build the response payload for a single decoded request"""
+    if 'command' in request:
+        return handle_command(request)
+    return run_job(decode_job(request, timings, arrays))
+
+
+def answer(request, start, arrays=False):
+    """
+    (response payload with the request's "id", timings or None) for a decoded
+    request received at `start`; errors are reported in the payload.
+    """
+    request_id = None
+    timings = None
+    try:
+        if not isinstance(request, dict):
+            raise ValueError("Request must be a JSON object")
+        request_id = request.get('id')
+        timings = start_timings(request, start)
+        response = handle_request(request, timings, arrays)
+    except Exception as e:
+        response = {"error": str(e)}
+    response['id'] = request_id
+    return response, timings
+
+
+def metrics_text():
+    """Request metrics plus cache and session gauges in the Prometheus text format"""
+    metrics = get_metrics()
+    if metrics is None:
+        raise ValueError("Metrics are disabled (PREDICT_METRICS=0) or only kept by --serve/--http workers")
+    gauges = {'predict_sessions_loaded': len(get_session_cache().loaded())}
+    cache = get_forecast_cache()
+    if cache:
+        for name, value in cache.stats().items():
+            gauges[f'predict_cache_{name}'] = value
+    return metrics.render(gauges)
+
+
+def warm_up():
+    """Load resident resources up front so the first served request is not slower"""
+    get_session_cache()
+    get_forecast_cache()
     try:
+        get_scaler()
+    except OSError as e:
+        sys.stderr.write(f"warm-up skipped: {e}\n")
+
+
+def process_age_ms():
+    """Milliseconds since this process was started (Linux /proc, 10 ms resolution), or None"""
+    try:
+        with open('/proc/self/stat', 'r') as f:
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime', 'r') as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, (uptime - start_ticks / os.sysconf('SC_CLK_TCK')) * 1000)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def startup_report(methods=STARTUP_METHODS, budget_ms=STARTUP_BUDGET_MS):
+    """
+    Load everything `methods` need and time each stage: interpreter start,
+    imports, scaler, session creation (noting ORT cache hits) and the first
+    forecast of each method. Leaves the process warm.
+    """
+    now = time.perf_counter()
+    age = process_age_ms()
+    stages = {}
+    if age is not None:
+        stages['interpreter_ms'] = max(0.0, age - (now - _IMPORT_TIMES['start']) * 1000)
+    stages['import_numpy_ms'] = (_IMPORT_TIMES['numpy'] - _IMPORT_TIMES['start']) * 1000
+    stages['import_modules_ms'] = (_IMPORT_TIMES['modules'] - _IMPORT_TIMES['numpy']) * 1000
+
+    def measure(stage, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        stages[stage] = (time.perf_counter() - start) * 1000
+        return result
+
+    measure('import_onnxruntime_ms', __import__, 'onnxruntime')
+    measure('scaler_ms', get_scaler)
+    sessions = get_session_cache()
+    cache_hits = {}
+    history = [0.0, 1.2, 0.0, 5.4, 12.0, 0.0, 2.5, 0.8, 0.0, 3.1, 0.0, 0.0, 7.6, 1.0]
+    for method in methods:
+        names = HYBRID_MODELS if method == 'hybrid' else [resolve_model_name(method)]
+        for name in names:
+            if name is None or name in sessions:
+                continue
+            cache_hits[name] = os.path.exists(sessions.optimized_path(name))
+            measure(f'session_{name}_ms', sessions.get, name)
+        request = {'method': method, 'features': history, 'last_date': '2020-01-14', 'horizon': 1, 'cache': False}
+        measure(f'first_{method}_ms', handle_request, request)
+
+    total = process_age_ms()
+    if total is None:
+        total = sum(stages.values())
+    return {'stages': stages, 'ort_cache_hits': cache_hits, 'total_ms': total, 'budget_ms': budget_ms,
+            'within_budget': total <= budget_ms}
+
+
+def serve(stdin=sys.stdin, stdout=sys.stdout):
+    """
+    Long-lived worker loop.
+
+    Reads one JSON request per line and writes one JSON response per line, in
+    the same order. Each request may carry an "id" which is echoed back so the
+    caller can match responses. Errors are reported per request and do not stop
+    the loop; the worker exits when stdin is closed.
+
+    Requests with "timings": true get their per-stage breakdown back in a
+    "timings" field; {"command": "metrics"} returns the worker's aggregated
+    metrics as Prometheus text.
+    """
+    warm_up()
+    enable_metrics()
+
+    for line in stdin:
+        start = time.perf_counter()
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            response, timings = {"error": str(e), "id": None}, None
+        else:
+            response, timings = answer(request, start)
+        stdout.write(encode_response(response, timings) + '\n')
+        stdout.flush()
+
+
+def serve_binary(stdin=None, stdout=None):
+    """
+    The --serve loop over length-prefixed binary frames (framing.py) instead
+    of JSON lines, for requests and responses with large arrays. A frame that
+    cannot be decoded gets an error response; a stream that is no longer
+    framed gets one and ends the loop.
+    """
+    stdin = stdin or sys.stdin.buffer
+    stdout = stdout or sys.stdout.buffer
+    warm_up()
+    enable_metrics()
+
+    while True:
+        start = time.perf_counter()
+        request = None
+        dtype = framing.DEFAULT_DTYPE
+        timings = None
+        try:
+            request = framing.read_frame(stdin)
+            if request is None:
+                break
+            dtype = framing.output_dtype(request)
+        except framing.FramingError as e:
+            stdout.write(framing.encode({"error": str(e), "id": None}))
+            stdout.flush()
+            break
+        except ValueError as e:
+            response = {"error": str(e), "id": request.get('id') if isinstance(request, dict) else None}
+        else:
+            response, timings = answer(request, start, arrays=True)
+        stdout.write(encode_response(response, timings, binary=True, dtype=dtype))
+        stdout.flush()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rainfall forecast inference")
+    parser.add_argument('--serve', action='store_true',
+                        help="Keep running and answer newline-delimited JSON requests on stdin")
+    parser.add_argument('--binary', action='store_true',
+                        help="Read and write length-prefixed binary frames (framing.py) instead of JSON")
+    parser.add_argument('--http', action='store_true',
+                        help="Serve /predict, /batch and /health over HTTP with micro-batching")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--max-batch-size', type=int, default=64,
+                        help="Series per micro-batch before it is closed early")
+    parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                        help="How long a micro-batch waits for more requests")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Model execution threads (default: Python's ThreadPoolExecutor default)")
+    parser.add_argument('--startup-report', action='store_true',
+                        help="Load the --methods models, print the startup time breakdown and exit "
+                             "(status 1 when over --budget-ms)")
+    parser.add_argument('--methods', default=','.join(STARTUP_METHODS))
+    parser.add_argument('--budget-ms', type=float, default=STARTUP_BUDGET_MS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.startup_report:
+        methods = [m.strip() for m in args.methods.split(',') if m.strip()]
+        report = startup_report(methods, args.budget_ms)
+        print(json.dumps(report, indent=2))
+        sys.exit(0 if report['within_budget'] else 1)
+
+    if args.http:
+        import inference_server
+        inference_server.run(args.host, args.port, args.max_batch_size, args.max_wait_ms, args.workers)
+        return
+
+    if args.serve:
+        serve_binary() if args.binary else serve()
+        return
+
+    try:
+        if args.binary:
+            start = time.perf_counter()
+            request = framing.read_frame(sys.stdin.buffer)
+            if request is None:
+                raise ValueError("No input provided")
+            dtype = framing.output_dtype(request)
+            timings = start_timings(request, start) if isinstance(request, dict) else None
+            sys.stdout.buffer.write(encode_response(handle_request(request, timings, arrays=True), timings,
+                                                    binary=True, dtype=dtype))
+            return
+
         # Read input from stdin
         input_str = sys.stdin.read()
         if not input_str:
             raise ValueError("No input provided")
-        
+
+        start = time.perf_counter()
         request = json.loads(input_str)
-        
-        method = request.get('method', 'onnx')
-        features = request.get('features', []) # List of values
-        horizon = request.get('horizon', 1)
-        
-        # 'features' here is expected to be the historical data needed for lag generation
-        # For simple autoregressive loop, we need the last window.
-        # If the frontend passes entire history, we slice it.
-        # Assuming frontend passes [v_t-7, ..., v_t] or similar.
-        
-        # Simplified Mock/Inference Logic for Rev 1 (since models aren't trained yet)
-        
-        predictions = []
-        current_window = list(features)
-        
-        # Load Model Logic (Placeholder for Rev 2 when models exist)
-        model_path = os.path.join(os.path.dirname(__file__), '..', 'models')
-        
-        # Check if real models exist, otherwise use Mock
-        # Mock logic: Simple persistence + noise or moving average trend
-        
-        for _ in range(horizon):
-            # Generate next value based on method
-            next_val = 0.0
-            
-            if method == 'xgboost':
-                # Load XGBoost model if exists
-                # For Rev 1: Mock with "Advanced" looking data (e.g. slight trend)
-                avg = sum(current_window[-7:]) / 7 if len(current_window) >= 7 else current_window[-1]
-                next_val = avg * (1 + (np.random.rand() - 0.5) * 0.1) # Random +/- 5%
-                
-            elif method == 'lstm':
-                # Load LSTM model
-                # LSTM can capture sine waves well
-                # Mock: Sine wave pattern continuation
-                last_val = current_window[-1]
-                next_val = last_val * 0.9 + 2.0 # distinct pattern
-                
-            elif method == 'arima':
-                # ARIMA
-                # Mock: Mean reversion
-                mean_val = sum(current_window) / len(current_window)
-                last_val = current_window[-1]
-                next_val = last_val + 0.5 * (mean_val - last_val)
-                
-            else:
-                # Default/ONNX fallback (should be handled by Node usually, but if routed here)
-                next_val = current_window[-1]
-            
-            # Ensure non-negative rainfall
-            next_val = max(0.0, next_val)
-            
-            predictions.append(next_val)
-            current_window.append(next_val)
-            
-        print(json.dumps({"predictions": predictions}))
-        
+        timings = start_timings(request, start) if isinstance(request, dict) else None
+
+        print(encode_response(handle_request(request, timings), timings))
+
     except Exception as e:
         # Print error details to stderr
         sys.stderr.write(str(e))
@@ -0,0 +1,229 @@
+"""
+Probabilistic forecasts from sample paths.
+
+A request with "samples": M gets, next to its point forecast, the mean and
+the requested quantiles of M simulated futures per series:
+
+    {"samples": 500, "quantiles": [0.1, 0.5, 0.9], "noise": "bootstrap",
+     "seed": 7, "return_paths": false}
+
+For the recursive ONNX models and the hybrid every series is expanded into
+M + 1 rows (row 0 stays noise-free and gives the point forecast) and all
+N * (M + 1) rows go through the usual horizon loop together, so each step is
+still one batched model call. Before a step's predictions are fed back, each
+sampled row gets a noise draw:
+
+- "bootstrap" (default): one of the series' in-sample one-step residuals,
+  drawn with replacement,
+- "gaussian": normal noise with the standard deviation of those residuals.
+
+The residuals come from one more batched call that predicts every day of the
+last RESIDUAL_DAYS of each history from its preceding window. ARIMA paths are
+simulated from the fitted model instead (ArimaModel.simulate), driven by
+resampled innovations or by normal shocks of the fitted variance; a series
+for which the order search settled on climatology resamples its recent days.
+Paths are clamped at zero like the point forecasts.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from features import WINDOW_SIZE
+from forecasting import (HYBRID_MODELS, forecast_batch, is_auto_order, parse_hybrid_weight, run_hybrid_step,
+                         run_model_step)
+from onnx_models import MODEL_REGISTRY, resolve_model_name
+from telemetry import stage
+from window_state import WindowState
+
+DEFAULT_QUANTILES = (0.1, 0.5, 0.9)
+NOISE_KINDS = ('bootstrap', 'gaussian')
+MAX_SAMPLES = 10000
+# Upper bound on series * samples, i.e. on the rows of one batched model call
+MAX_PATHS = 200000
+# Trailing days of each history used for residuals (and climatology resampling)
+RESIDUAL_DAYS = 365
+
+
+class Sampling:
+    """Sample-path options of a request"""
+
+    def __init__(self, samples, quantiles=DEFAULT_QUANTILES, noise='bootstrap', seed=None, return_paths=False):
+        self.samples = samples
+        self.quantiles = quantiles
+        self.noise = noise
+        self.seed = seed
+        self.return_paths = return_paths
+
+    @classmethod
+    def from_request(cls, request):
+        """Options of a request, or None when it does not ask for "samples\""""
+        if request.get('samples') is None:
+            return None
+        samples = int(request['samples'])
+        if not 1 <= samples <= MAX_SAMPLES:
+            raise ValueError(f"samples must be between 1 and {MAX_SAMPLES}")
+        quantiles = tuple(float(q) for q in request.get('quantiles', DEFAULT_QUANTILES))
+        if not quantiles or any(not 0.0 <= q <= 1.0 for q in quantiles):
+            raise ValueError("quantiles must be a non-empty list of numbers between 0 and 1")
+        noise = request.get('noise', 'bootstrap')
+        if noise not in NOISE_KINDS:
+            raise ValueError(f"Unknown noise: {noise} (use {', '.join(NOISE_KINDS)})")
+        seed = request.get('seed')
+        return cls(samples, quantiles, noise, None if seed is None else int(seed),
+                   bool(request.get('return_paths', False)))
+
+    def labels(self):
+        """Response keys of the quantiles, e.g. "0.1\""""
+        return [f"{q:g}" for q in self.quantiles]
+
+
+def one_step_residuals(method, histories, last_dates, sessions, scaler, xgb_weight=None):
+    """
+    Per-series arrays of actual minus predicted value for each of the last
+    RESIDUAL_DAYS days that has a full window before it, from one batched call.
+    """
+    model_name = resolve_model_name(method)
+    kind = MODEL_REGISTRY[model_name]['kind'] if model_name is not None else None
+    if kind not in ('tabular', 'sequence') and method != 'hybrid':
+        raise ValueError(f"Sample paths are available for recursive models, 'hybrid' and 'arima', not '{method}'")
+    if any(len(h) < WINDOW_SIZE for h in histories):
+        raise ValueError(f"Model '{model_name or method}' requires at least {WINDOW_SIZE} historical data points")
+
+    tails = [np.asarray(h[-(RESIDUAL_DAYS + WINDOW_SIZE):], dtype=np.float32) for h in histories]
+    counts = [len(tail) - WINDOW_SIZE for tail in tails]
+    if sum(counts) == 0:
+        return [np.zeros(0) for _ in histories]
+
+    with stage('features'):
+        state = WindowState(np.concatenate([sliding_window_view(tail, WINDOW_SIZE)[:count]
+                                            for tail, count in zip(tails, counts)]))
+        targets = np.concatenate([tail[WINDOW_SIZE:] for tail in tails]).astype(np.float64)
+        target_dates = None
+        if last_dates is not None:
+            target_dates = np.concatenate([last + np.arange(1 - count, 1) for last, count in zip(last_dates, counts)])
+
+    if method == 'hybrid':
+        with stage('load'):
+            tabular_session, sequence_session = (sessions.get(name) for name in HYBRID_MODELS)
+        fitted = run_hybrid_step(tabular_session, sequence_session, state, target_dates, scaler,
+                                 parse_hybrid_weight(xgb_weight))
+    else:
+        with stage('load'):
+            session = sessions.get(model_name)
+        fitted = run_model_step(session, kind, state, target_dates, scaler)
+
+    residuals = targets - np.maximum(fitted, 0.0)
+    return np.split(residuals, np.cumsum(counts)[:-1])
+
+
+def residual_noise(residuals, samples, noise, rng):
+    """
+    perturb(step, values) for forecast_batch over series-major blocks of
+    samples + 1 rows: the first row of each block is left as is, the others
+    get one draw of `noise` from their series' residuals per step.
+    """
+    n_series = len(residuals)
+    rows = n_series * (samples + 1)
+    sampled = np.arange(rows) % (samples + 1) != 0
+    owner = np.repeat(np.arange(n_series), samples)
+    # A series without residuals (exactly one window of history) gets no spread
+    pools = [r if len(r) else np.zeros(1) for r in residuals]
+
+    if noise == 'gaussian':
+        scale = np.array([pool.std() for pool in pools])[owner]
+
+        def draw():
+            return rng.standard_normal(len(owner)) * scale
+    else:
+        flat = np.concatenate(pools)
+        lengths = np.array([len(pool) for pool in pools])
+        starts = (np.cumsum(lengths) - lengths)[owner]
+        sizes = lengths[owner]
+
+        def draw():
+            return flat[starts + rng.integers(sizes)]
+
+    def perturb(step, values):
+        with stage('sampling'):
+            values = values.astype(np.float64)
+            values[sampled] += draw()
+        return values
+
+    return perturb
+
+
+def arima_paths(histories, horizon, order, sampling, rng, details=None):
+    """([N, horizon] point forecasts, [N, M, horizon] paths) of fitted ARIMA models"""
+    with stage('load'):
+        import arima_engine
+
+    if any(len(h) < arima_engine.MIN_OBSERVATIONS for h in histories):
+        raise ValueError(f"ARIMA requires at least {arima_engine.MIN_OBSERVATIONS} historical data points")
+
+    auto = is_auto_order(order)
+    if auto:
+        with stage('load'):
+            import arima_search
+        options = {k: v for k, v in order.items() if k != 'auto'} if isinstance(order, dict) else None
+    else:
+        order = arima_engine.ArimaOrder.parse(order)
+
+    shape = (sampling.samples, horizon)
+    point = np.empty((len(histories), horizon))
+    paths = np.empty((len(histories),) + shape)
+    for i, history in enumerate(histories):
+        history = np.asarray(history, dtype=np.float64)
+        with stage('model'):
+            if auto:
+                result = arima_search.auto_arima(history, options)
+                model = result.model
+                point[i] = result.forecast(horizon)
+            else:
+                model = arima_engine.fit(history, order)
+                point[i] = model.forecast(horizon)
+        if details is not None:
+            details.append(result.summary() if auto else {'order': order.as_dict()})
+
+        with stage('sampling'):
+            if model is None:
+                shocks = None
+                paths[i] = rng.choice(history[-RESIDUAL_DAYS:], shape)
+            elif sampling.noise == 'gaussian':
+                shocks = rng.standard_normal(shape) * np.sqrt(model.sigma2)
+            else:
+                shocks = rng.choice(model.residuals[-RESIDUAL_DAYS:], shape)
+        if shocks is not None:
+            with stage('model'):
+                paths[i] = model.simulate(shocks)
+
+    return np.maximum(point, 0.0), np.maximum(paths, 0.0)
+
+
+def sample_forecast(method, histories, last_dates, horizon, sessions, scaler, sampling, order=None, details=None,
+                    xgb_weight=None):
+    """
+    Point forecast and sample paths for N series.
+    Returns ([N, horizon] point forecasts, [N, M, horizon] paths,
+    [N, horizon] path means, [Q, N, horizon] path quantiles).
+    """
+    n_series = len(histories)
+    if n_series * sampling.samples > MAX_PATHS:
+        raise ValueError(f"{n_series} series x {sampling.samples} samples exceeds {MAX_PATHS} paths per request")
+    rng = np.random.default_rng(sampling.seed)
+
+    if method == 'arima':
+        point, paths = arima_paths(histories, horizon, order, sampling, rng, details)
+    else:
+        residuals = one_step_residuals(method, histories, last_dates, sessions, scaler, xgb_weight)
+        repeats = sampling.samples + 1
+        windows = [h[-WINDOW_SIZE:] for h in histories for _ in range(repeats)]
+        dates = np.repeat(last_dates, repeats) if last_dates is not None else None
+        flat = forecast_batch(method, windows, dates, horizon, sessions, scaler, xgb_weight=xgb_weight,
+                              perturb=residual_noise(residuals, sampling.samples, sampling.noise, rng))
+        flat = flat.reshape(n_series, repeats, horizon)
+        point, paths = flat[:, 0], flat[:, 1:]
+
+    with stage('sampling'):
+        mean = paths.mean(axis=1)
+        quantiles = np.quantile(paths, sampling.quantiles, axis=1)
+    return point, paths, mean, quantiles
@@ -0,0 +1,270 @@
+"""
+Append-only, memory-mapped rainfall history per station.
+
+Each station has one file per resolution, <root>/<station>/<resolution>.bin:
+a 16-byte header followed by fixed-width 8-byte records (int32 time, float32
+value). Time is days since 1970-01-01 for 'daily' and hours since
+1970-01-01T00 for 'hourly', and strictly increases through the file (an
+outage is simply missing records; see last_gap), so:
+
+- a date range is two binary searches on the memory-mapped time column,
+- the last N observations are a slice of the map (no copy, no parsing),
+- appending is a single write at the end of the file.
+
+Readers only ever look at whole records, so a reader racing an append (or a
+write cut short by a crash) just does not see the incomplete tail yet; the
+next append truncates it away. Appends take an exclusive flock where
+available.
+
+Usage:
+    python scripts/station_store.py import-dataset STATION   # seed from dataset/Regresi-Hujan.xlsx
+    python scripts/station_store.py info [STATION]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+STORE_DIR = os.environ.get(
+    'PREDICT_STORE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'stations'))
+
+MAGIC = b'RAINTS01'
+HEADER_SIZE = 16
+RECORD = np.dtype([('t', '<i4'), ('value', '<f4')])
+
+# resolution -> (datetime64 unit, header code)
+RESOLUTIONS = {
+    'daily': ('D', 1),
+    'hourly': ('h', 2),
+}
+
+STATION_ID = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')
+
+
+def check_station(station):
+    station = str(station)
+    if not STATION_ID.match(station) or station.startswith('.'):
+        raise ValueError(f"Invalid station id: {station!r}")
+    return station
+
+
+def check_resolution(resolution):
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Unknown resolution: {resolution} (expected one of {', '.join(RESOLUTIONS)})")
+    return RESOLUTIONS[resolution]
+
+
+def last_gap(times):
+    """
+    Index i of the latest break in `times` (times[i + 1] is more than one
+    step after times[i]), or None when they are consecutive
+    """
+    breaks = np.flatnonzero(np.diff(np.asarray(times).astype(np.int64)) != 1)
+    return int(breaks[-1]) if len(breaks) else None
+
+
+def make_header(resolution):
+    _, code = check_resolution(resolution)
+    return MAGIC + np.array([code, 0], dtype='<u4').tobytes()
+
+
+class StationSeries:
+    """
+    Read-only view of one station file. `times` (int32) and `values`
+    (float32) are strided views into the memory map.
+    """
+
+    def __init__(self, path, resolution):
+        self.path = path
+        self.resolution = resolution
+        self.unit, code = check_resolution(resolution)
+        size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE or header[:8] != MAGIC:
+            raise ValueError(f"Not a station file: {path}")
+        if int(np.frombuffer(header[8:12], dtype='<u4')[0]) != code:
+            raise ValueError(f"{path} does not hold {resolution} records")
+
+        self.size = size
+        count = (size - HEADER_SIZE) // RECORD.itemsize
+        if count:
+            self.records = np.memmap(path, dtype=RECORD, mode='r', offset=HEADER_SIZE, shape=(count,))
+        else:
+            self.records = np.empty(0, dtype=RECORD)
+        self.times = self.records['t']
+        self.values = self.records['value']
+
+    def __len__(self):
+        return len(self.records)
+
+    def to_index(self, moment):
+        """Record time of a date/datetime string or datetime64, truncated to the resolution"""
+        return np.datetime64(moment).astype(f'datetime64[{self.unit}]').astype(np.int64)
+
+    def _bound(self, moment, side):
+        if moment is None:
+            return 0 if side == 'left' else len(self.times)
+        return int(np.searchsorted(self.times, self.to_index(moment), side=side))
+
+    def range(self, start=None, end=None):
+        """(datetimes, values) with start <= time <= end; either bound may be None"""
+        lo, hi = self._bound(start, 'left'), self._bound(end, 'right')
+        return self.times[lo:hi].astype(f'datetime64[{self.unit}]'), self.values[lo:hi]
+
+    def window(self, until=None, count=None):
+        """The last `count` observations on or before `until` (all of them when None)"""
+        hi = self._bound(until, 'right')
+        lo = 0 if count is None else max(0, hi - int(count))
+        return self.times[lo:hi].astype(f'datetime64[{self.unit}]'), self.values[lo:hi]
+
+    def last_time(self):
+        return self.times[-1].astype(f'datetime64[{self.unit}]') if len(self.times) else None
+
+
+class StationStore:
+    """Directory of station files; open maps are reused until the file grows"""
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def path(self, station, resolution='daily'):
+        check_resolution(resolution)
+        return os.path.join(self.root, check_station(station), f"{resolution}.bin")
+
+    def stations(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if STATION_ID.match(name) and os.path.isdir(os.path.join(self.root, name)))
+
+    def resolutions(self, station):
+        return [r for r in RESOLUTIONS if os.path.exists(self.path(station, r))]
+
+    def series(self, station, resolution='daily'):
+        """StationSeries for a station; KeyError when it has no data at this resolution"""
+        path = self.path(station, resolution)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            raise KeyError(f"No {resolution} data for station {station}")
+        with self._lock:
+            cached = self._open.get(path)
+            if cached is not None and cached.size == size:
+                return cached
+            series = StationSeries(path, resolution)
+            self._open[path] = series
+            return series
+
+    def append(self, station, times, values, resolution='daily'):
+        """
+        Append observations, which must be strictly later than everything already
+        stored. Missing days/hours are allowed; readers that need a gap-free
+        window check it with last_gap(). Returns the number of records written.
+        """
+        unit, _ = check_resolution(resolution)
+        t = np.asarray(times, dtype=f'datetime64[{unit}]').astype(np.int64)
+        v = np.asarray(values, dtype=np.float32)
+        if t.shape != v.shape or t.ndim != 1:
+            raise ValueError("times and values must be 1-D and the same length")
+        if len(t) == 0:
+            return 0
+        if np.any(np.diff(t) <= 0):
+            raise ValueError("Timestamps must be strictly increasing")
+        if t[0] < np.iinfo(np.int32).min or t[-1] > np.iinfo(np.int32).max:
+            raise ValueError("Timestamp out of range")
+
+        path = self.path(station, resolution)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        records = np.empty(len(t), dtype=RECORD)
+        records['t'] = t
+        records['value'] = v
+
+        with open(path, 'a+b') as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                size = f.seek(0, os.SEEK_END)
+                if size == 0:
+                    f.write(make_header(resolution))
+                else:
+                    # Drop a record left half-written by an interrupted append
+                    whole = HEADER_SIZE + (size - HEADER_SIZE) // RECORD.itemsize * RECORD.itemsize
+                    if whole != size:
+                        f.truncate(whole)
+                    if whole > HEADER_SIZE:
+                        f.seek(whole - RECORD.itemsize)
+                        last = np.frombuffer(f.read(RECORD.itemsize), dtype=RECORD)['t'][0]
+                        if t[0] <= last:
+                            raise ValueError(f"Station {station} already has data up to "
+                                             f"{np.datetime64(int(last), unit)}; appends must be later")
+                    f.seek(0, os.SEEK_END)
+                f.write(records.tobytes())
+                f.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        return len(records)
+
+    def info(self, station):
+        result = {}
+        for resolution in self.resolutions(station):
+            series = self.series(station, resolution)
+            first = series.times[0].astype(f'datetime64[{series.unit}]') if len(series) else None
+            result[resolution] = {
+                'records': len(series),
+                'first': None if first is None else str(first),
+                'last': None if series.last_time() is None else str(series.last_time()),
+            }
+        return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Station time-series store")
+    parser.add_argument('--root', default=STORE_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    seed = commands.add_parser('import-dataset', help="Append the bundled workbook to a station")
+    seed.add_argument('station')
+    info = commands.add_parser('info', help="Record counts and date ranges")
+    info.add_argument('station', nargs='?')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    store = StationStore(args.root)
+
+    if args.command == 'import-dataset':
+        import dataset
+        series = dataset.open_daily_rainfall()
+        dates, values = series.dates, series.values
+        try:
+            last = store.series(args.station).last_time()
+        except KeyError:
+            last = None
+        if last is not None:
+            keep = dates > last
+            dates, values = dates[keep], values[keep]
+        written = store.append(args.station, dates, values)
+        json.dump({'station': args.station, 'appended': written}, sys.stdout)
+    else:
+        stations = [args.station] if args.station else store.stations()
+        json.dump({station: store.info(station) for station in stations}, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Per-stage timings and Prometheus metrics for the prediction path.
+
+A Timings object collects the seconds one request spends in each stage:
+
+- parse        JSON decoding of the request
+- decode       request -> ForecastJob (input validation, history lookup)
+- queue        waiting for a micro-batch (HTTP server only)
+- cache        result-cache keys
+- load         model sessions and the ARIMA engine (created/imported on first use)
+- features     windows and feature rows
+- scaling      StandardScaler transforms in and out of the models
+- model        onnxruntime / ARIMA execution
+- sampling     noise draws and quantiles of probabilistic forecasts
+- postprocess  building the response payload
+- serialize    JSON encoding of the response
+
+Code deep in the forecast loop does not get a Timings passed in; it wraps its
+work in `with stage('model'):`, which records into the Timings activated for
+the current thread and costs a thread-local lookup when none is. Work done
+on other threads (the hybrid helper) shows up as the time spent waiting for it.
+
+MetricsRegistry aggregates finished Timings into request counters and latency
+histograms per method and horizon, plus per-stage histograms per method, and
+renders them in the Prometheus text format. Horizons are bucketed ("2-7", ...)
+so labels stay bounded whatever clients send.
+"""
+
+import bisect
+import threading
+import time
+
+STAGES = ('parse', 'decode', 'queue', 'cache', 'load', 'features', 'scaling', 'model', 'sampling', 'postprocess', 'serialize')
+# Seconds; upper bounds of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+HORIZON_BUCKETS = (1, 7, 14, 30, 90)
+
+
+class _Local(threading.local):
+    # Class default: reading an unset attribute of a threading.local is slow
+    timings = None
+
+
+_local = _Local()
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ('timings', 'name', 'start')
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timings.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Timings:
+    """Seconds per stage of one request, labelled with its method and horizon once decoded"""
+
+    def __init__(self, start=None, include=False):
+        self.start = time.perf_counter() if start is None else start
+        # Return the breakdown in the response's "timings" field
+        self.include = include
+        self.stages = {}
+        self.method = 'unknown'
+        self.horizon = None
+        self.series = 0
+        self.status = 'ok'
+        self.total = None
+        self.enqueued = None
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def merge(self, other):
+        for name, seconds in other.stages.items():
+            self.add(name, seconds)
+
+    def describe(self, method, horizon, series):
+        self.method = method
+        self.horizon = horizon
+        self.series = series
+
+    def finish(self, status='ok'):
+        self.status = status
+        self.total = time.perf_counter() - self.start
+
+    def as_dict(self):
+        """{"<stage>_ms": ..., "other_ms": ..., "total_ms": ...}; other is time outside any stage"""
+        total = self.total if self.total is not None else time.perf_counter() - self.start
+        out = {f"{name}_ms": self.stages[name] * 1000 for name in STAGES if name in self.stages}
+        out['other_ms'] = max(0.0, total - sum(self.stages.values())) * 1000
+        out['total_ms'] = total * 1000
+        return out
+
+
+def timed(timings, name):
+    """Stage context for an explicit Timings, a no-op for None"""
+    return _NULL_STAGE if timings is None else _Stage(timings, name)
+
+
+def stage(name):
+    """Stage context recording into the Timings active on this thread, if any"""
+    timings = _local.timings
+    return _NULL_STAGE if timings is None else _Stage(timings, name)
+
+
+class activate:
+    """Make `timings` (or None) the target of stage() on this thread while the block runs"""
+
+    def __init__(self, timings):
+        self.timings = timings
+
+    def __enter__(self):
+        self.previous = _local.timings
+        _local.timings = self.timings
+        return self.timings
+
+    def __exit__(self, *exc):
+        _local.timings = self.previous
+        return False
+
+
+def horizon_label(horizon):
+    if horizon is None:
+        return 'unknown'
+    lower = 1
+    for upper in HORIZON_BUCKETS:
+        if horizon <= upper:
+            return str(upper) if lower == upper else f"{lower}-{upper}"
+        lower = upper + 1
+    return f"{lower}+"
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            le = bound if bound == '+Inf' else repr(float(bound))
+            yield f'{name}_bucket{{{labels},le="{le}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum!r}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+class MetricsRegistry:
+    """Request counters and latency histograms of finished Timings, rendered as Prometheus text"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.series = {}
+        self.latency = {}
+        self.stage_latency = {}
+
+    def observe(self, timings):
+        horizon = horizon_label(timings.horizon)
+        with self._lock:
+            key = (timings.method, horizon, timings.status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            if timings.status == 'ok':
+                self.series[timings.method] = self.series.get(timings.method, 0) + timings.series
+            self.latency.setdefault((timings.method, horizon), Histogram()).observe(timings.total)
+            for name, seconds in timings.stages.items():
+                self.stage_latency.setdefault((timings.method, name), Histogram()).observe(seconds)
+
+    def render(self, gauges=None):
+        """Prometheus text exposition (format 0.0.4); `gauges` adds {name: value} samples"""
+        lines = ['# HELP predict_requests_total Forecast requests handled, by outcome.',
+                 '# TYPE predict_requests_total counter']
+        with self._lock:
+            for (method, horizon, status), count in sorted(self.requests.items()):
+                lines.append(f'predict_requests_total{{{_labels(method=method, horizon=horizon, status=status)}}} '
+                             f'{count}')
+            lines += ['# HELP predict_series_total Series forecast.', '# TYPE predict_series_total counter']
+            for method, count in sorted(self.series.items()):
+                lines.append(f'predict_series_total{{{_labels(method=method)}}} {count}')
+            lines += ['# HELP predict_request_duration_seconds Request latency from receipt to serialized response.',
+                      '# TYPE predict_request_duration_seconds histogram']
+            for (method, horizon), histogram in sorted(self.latency.items()):
+                lines.extend(histogram.lines('predict_request_duration_seconds',
+                                             _labels(method=method, horizon=horizon)))
+            lines += ['# HELP predict_stage_duration_seconds Time per request spent in each stage.',
+                      '# TYPE predict_stage_duration_seconds histogram']
+            for (method, name), histogram in sorted(self.stage_latency.items()):
+                lines.extend(histogram.lines('predict_stage_duration_seconds', _labels(method=method, stage=name)))
+        for name, value in sorted((gauges or {}).items()):
+            lines += [f'# TYPE {name} gauge', f'{name} {float(value)!r}']
+        return '\n'.join(lines) + '\n'
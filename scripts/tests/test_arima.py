@@ -0,0 +1,157 @@
+import numpy as np
+import pytest
+from scipy.linalg import solve_discrete_lyapunov, toeplitz
+from scipy.signal import lfilter
+
+import arima_engine
+import arima_search
+from arima_engine import ArimaOrder
+
+
+def rainfall(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    weekly = 1.0 + 0.5 * np.sin(2 * np.pi * np.arange(n) / 7)
+    return rng.gamma(0.8, 4.0, n) * weekly
+
+
+def ar_series(lags, n=600, seed=0):
+    """AR series y_t = sum(phi * y_{t-lag}) + e_t around a level of 10"""
+    a = np.zeros(max(lags) + 1)
+    a[0] = 1.0
+    for lag, phi in lags.items():
+        a[lag] = -phi
+    rng = np.random.default_rng(seed)
+    return lfilter([1.0], a, rng.normal(size=n)) * 2.0 + 10.0
+
+
+def test_partial_aics_share_one_residual_window():
+    y = rainfall()
+    orders = [ArimaOrder(1, 0, 0), ArimaOrder(0, 0, 1), ArimaOrder(1, 0, 0, 1, 0, 0, 7)]
+    n_prefix, n_cond = arima_search.partial_window(orders, len(y))
+    assert (n_prefix, n_cond) == (200, 8)
+
+    for order in orders:
+        result = arima_search._partial_fit(y, order, n_prefix, n_cond)
+        _, w, _ = arima_engine.prepare(y, order)
+        params, _ = arima_engine.estimate_css(w[:n_prefix], order)
+        e = arima_engine.css_residuals(w[:n_prefix], *arima_engine.lag_polynomials(params, order))
+        e = e[n_cond - order.p - order.P * order.s:]
+        assert len(e) == n_prefix - n_cond
+        k = order.n_params + 2
+        expected = len(e) * np.log(2 * np.pi * (e @ e) / len(e)) + len(e) + 2 * k
+        assert result['partial_aic'] == pytest.approx(expected)
+
+
+def test_non_seasonal_truth_is_not_pruned_by_seasonal_candidates():
+    result = arima_search.auto_arima(ar_series({1: 0.6}, seed=1), {'d': 0, 'D': 0}, n_jobs=1)
+    status = {c['label']: c['status'] for c in result.candidates}
+    assert status['ARIMA(1,0,0)'] == 'fitted'
+    assert result.order == ArimaOrder(1, 0, 0)
+
+
+def test_seasonal_truth_survives_pruning():
+    result = arima_search.auto_arima(ar_series({7: 0.6}, seed=2), {'d': 0, 'D': 0}, n_jobs=1)
+    status = {c['label']: c['status'] for c in result.candidates}
+    assert status['SARIMA(0,0,0)(1,0,0)7'] == 'fitted'
+    assert result.order.P == 1 and result.order.s == 7
+
+
+def test_parallel_search_matches_the_in_process_search():
+    y = rainfall(300, seed=1)
+    options = {'max_p': 1, 'max_q': 1, 'max_P': 1, 'max_Q': 0}
+    serial = arima_search.auto_arima(y, options, n_jobs=1)
+    parallel = arima_search.auto_arima(y, options, n_jobs=2)
+    assert parallel.order == serial.order
+    executor = arima_search.get_executor(2)
+    assert executor._mp_context.get_start_method() in ('forkserver', 'spawn')
+    arima_search.shutdown_executors()
+    assert not arima_search._executor
+
+
+def exact_loglike(w, ar, ma):
+    """Concentrated Gaussian log-likelihood from the dense ARMA covariance matrix"""
+    T, R = arima_engine.state_space(ar, ma)
+    P = solve_discrete_lyapunov(T, np.outer(R, R))
+    n = len(w)
+    acvf = np.empty(n)
+    M = P
+    for k in range(n):
+        acvf[k] = M[0, 0]
+        M = T @ M
+    V = toeplitz(acvf)
+    sigma2 = w @ np.linalg.solve(V, w) / n
+    _, logdet = np.linalg.slogdet(V)
+    return -0.5 * (n * (np.log(2 * np.pi * sigma2) + 1.0) + logdet), sigma2
+
+
+@pytest.mark.parametrize('order, params', [
+    (ArimaOrder(1, 0, 0), [0.8]),
+    (ArimaOrder(1, 0, 1), [0.5, -0.7]),
+    (ArimaOrder(0, 0, 1, 1, 0, 0, 7), [0.4, 0.6]),
+])
+def test_kalman_likelihood_matches_the_dense_gaussian(order, params):
+    w = rainfall(150, seed=2) - 4.0
+    ar, ma = arima_engine.lag_polynomials(np.asarray(params), order)
+    loglike, sigma2 = arima_engine.concentrated_loglike(w, ar, ma)
+    expected_loglike, expected_sigma2 = exact_loglike(w, ar, ma)
+    assert loglike == pytest.approx(expected_loglike, rel=1e-6)
+    assert sigma2 == pytest.approx(expected_sigma2, rel=1e-6)
+
+
+def test_css_recovers_a_known_ar_process():
+    rng = np.random.default_rng(4)
+    y = lfilter([1.0], [1.0, -0.6], rng.normal(size=4000)) + 3.0
+    model = arima_engine.fit(y, ArimaOrder(1, 0, 0))
+    ar, _ = model.polynomials()
+    assert -ar[1] == pytest.approx(0.6, abs=0.03)
+    assert model.mean == pytest.approx(3.0, abs=0.15)
+    assert model.sigma2 == pytest.approx(1.0, abs=0.06)
+
+
+def test_stationarity_transform_keeps_roots_outside_the_unit_circle():
+    rng = np.random.default_rng(5)
+    for _ in range(50):
+        phi = arima_engine.constrain_stationary(rng.normal(scale=3.0, size=3))
+        roots = np.roots(np.concatenate([[1.0], -phi])[::-1])
+        assert np.all(np.abs(roots) > 1.0)
+
+
+@pytest.mark.parametrize('order, n, steady', [
+    ('arima_111', 20, False),
+    ('sarima_weekly', 30, False),
+    ('arima_111', 400, True),
+    ([2, 0, 1], 400, True),
+])
+def test_zero_shock_paths_equal_the_point_forecast(order, n, steady):
+    model = arima_engine.fit(rainfall(n, seed=3), order)
+    # Both forecast branches: the filter's own state, and the steady-state recursion
+    assert (model._state is None) == steady
+    point = model.forecast(10)
+    paths = model.simulate(np.zeros((3, 10)))
+    np.testing.assert_allclose(paths, np.tile(point, (3, 1)), rtol=1e-10, atol=1e-10)
+
+
+def test_simulated_paths_centre_on_the_point_forecast():
+    model = arima_engine.fit(rainfall(400, seed=6), 'arima_111')
+    rng = np.random.default_rng(7)
+    paths = model.simulate(rng.normal(scale=np.sqrt(model.sigma2), size=(20000, 5)))
+    np.testing.assert_allclose(paths.mean(axis=0), model.forecast(5), atol=0.15)
+    # The first step differs from the forecast by its shock alone
+    assert paths[:, 0].std() == pytest.approx(np.sqrt(model.sigma2), rel=0.02)
+
+
+def test_integrate_inverts_the_differencing():
+    order = ArimaOrder.parse('sarima_weekly')
+    y = rainfall(60, seed=8)
+    history, future = y[:50], y[50:]
+    w = arima_engine.difference(y, order)
+    np.testing.assert_allclose(arima_engine.integrate(w[-10:], history, order), future, rtol=1e-10)
+
+
+def test_orders_parse_presets_dicts_and_lists():
+    assert ArimaOrder.parse('sarima_weekly') == ArimaOrder(1, 1, 1, 1, 1, 1, 7)
+    assert ArimaOrder.parse({'p': 2, 'd': 1, 'q': 0}) == ArimaOrder(2, 1, 0)
+    assert ArimaOrder.parse([1, 0, 1]) == ArimaOrder(1, 0, 1)
+    assert ArimaOrder.parse(None) == ArimaOrder.parse(arima_engine.DEFAULT_PRESET)
+    with pytest.raises(ValueError):
+        ArimaOrder(1, 0, 0, 1, 0, 0, 0)
@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+import pytest
+
+import csv_ingest
+import predict_infer
+from station_store import StationStore
+
+CSV = "date,value\n2024-01-01,1.5\n2024-01-02,-1\n2024-01-02,3\n2024-01-03,x\n2024-01-04,2\n"
+
+
+@pytest.fixture
+def ingest_dir(tmp_path, monkeypatch):
+    root = tmp_path / 'ingest'
+    root.mkdir()
+    monkeypatch.setattr(csv_ingest, 'INGEST_DIR', str(root))
+    monkeypatch.setitem(predict_infer._resources, 'stations', StationStore(str(tmp_path / 'stations')))
+    return root
+
+
+def test_ingest_reports_rejected_rows_and_appends_the_rest(tmp_path):
+    path = tmp_path / 'rain.csv'
+    path.write_text(CSV)
+    store = StationStore(str(tmp_path / 'stations'))
+    report = csv_ingest.ingest_csv(str(path), 's1', store, chunk_rows=2)
+    assert (report['rows'], report['written'], report['rejected']) == (5, 3, 2)
+    np.testing.assert_array_equal(store.series('s1').values, [1.5, 0.0, 2.0])
+
+    # Re-ingesting the same file skips every dated row up to the stored end, the duplicate included
+    report = csv_ingest.ingest_csv(str(path), 's1', store)
+    assert report['written'] == 0 and report['skipped_existing'] == 4
+
+
+def test_ingest_command_reads_files_in_the_ingest_directory(ingest_dir):
+    (ingest_dir / 'rain.csv').write_text(CSV)
+    report = predict_infer.handle_command({'command': 'ingest_csv', 'path': 'rain.csv', 'station': 's1'})
+    assert report['written'] == 3
+    report = predict_infer.handle_command({'command': 'ingest_csv', 'path': str(ingest_dir / 'rain.csv'),
+                                           'station': 's2'})
+    assert report['written'] == 3
+
+
+def test_ingest_command_refuses_paths_outside_the_ingest_directory(ingest_dir, tmp_path):
+    outside = tmp_path / 'secret.csv'
+    outside.write_text(CSV)
+    os.symlink(outside, ingest_dir / 'link.csv')
+    for path in (str(outside), '../secret.csv', 'link.csv', '/etc/passwd'):
+        with pytest.raises(ValueError, match="inside the ingest directory"):
+            predict_infer.handle_command({'command': 'ingest_csv', 'path': path, 'station': 's1'})
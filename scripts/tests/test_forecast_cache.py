@@ -0,0 +1,178 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import predict_infer
+from forecast_cache import DiskTier, ForecastCache, cache_key
+
+
+def keys(n):
+    return [cache_key('gbr', 'v1', 7, np.arange(7) + i) for i in range(n)]
+
+
+def test_cache_key_depends_on_every_input():
+    base = cache_key('gbr', 'v1', 7, np.ones(7), '2024-01-01')
+    assert base == cache_key('gbr', 'v1', 7, np.ones(7, dtype=np.float32), '2024-01-01')
+    for other in (cache_key('xgb', 'v1', 7, np.ones(7), '2024-01-01'),
+                  cache_key('gbr', 'v2', 7, np.ones(7), '2024-01-01'),
+                  cache_key('gbr', 'v1', 8, np.ones(7), '2024-01-01'),
+                  cache_key('gbr', 'v1', 7, np.ones(7) * 2, '2024-01-01'),
+                  cache_key('gbr', 'v1', 7, np.ones(7), '2024-01-02')):
+        assert other != base
+
+
+def test_get_many_computes_only_the_missing_keys():
+    cache = ForecastCache()
+    calls = []
+
+    def compute(indices):
+        calls.append(list(indices))
+        return [{'i': i} for i in indices]
+
+    k = keys(3)
+    assert cache.get_many(k[:2], compute) == [{'i': 0}, {'i': 1}]
+    assert cache.get_many(k, compute) == [{'i': 0}, {'i': 1}, {'i': 2}]
+    assert calls == [[0, 1], [2]]
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (2, 3, 3)
+
+
+def test_memory_tier_is_lru_bounded_and_expires():
+    cache = ForecastCache(max_entries=2)
+    k = keys(3)
+    for key in k:
+        cache.get_or_compute(key, lambda: 1)
+    assert cache.stats()['evictions'] == 1
+
+    cache = ForecastCache(ttl=-1)
+    cache.get_or_compute(k[0], lambda: 1)
+    assert cache.get_or_compute(k[0], lambda: 2) == 2
+    assert cache.stats()['expired'] == 1
+
+
+def test_disk_tier_round_trips_across_instances(tmp_path):
+    k = keys(2)
+    first = ForecastCache(disk_dir=str(tmp_path))
+    first.get_many(k, lambda indices: [{'predictions': [1.5, 2.5]} for _ in indices])
+
+    second = ForecastCache(disk_dir=str(tmp_path))
+    assert second.get_many(k, lambda indices: pytest.fail("recomputed")) == [{'predictions': [1.5, 2.5]}] * 2
+    assert second.stats()['disk_hits'] == 2
+
+
+def test_disk_tier_evicts_past_its_byte_budget(tmp_path):
+    tier = DiskTier(str(tmp_path), ttl=60, max_bytes=2000)
+    for key in keys(50):
+        tier.put(key, list(range(20)))
+    assert tier._size <= 2000
+    assert tier._size == sum(size for _, _, size in tier._entries())
+
+
+def disk_bytes(disk):
+    return sum(size for _, _, size in disk._entries())
+
+
+def test_disk_tier_counts_an_overwritten_key_once(tmp_path):
+    disk = DiskTier(str(tmp_path), ttl=60)
+    key = keys(1)[0]
+    for n in (50, 10, 200):
+        disk.put(key, list(range(n)))
+        assert disk._size == disk_bytes(disk)
+    assert disk.get(key) == list(range(200))
+
+
+def test_concurrent_disk_puts_keep_the_size_exact(tmp_path):
+    disk = DiskTier(str(tmp_path), ttl=60, max_bytes=6000)
+    shared = keys(40)
+
+    def writer(seed):
+        rng = np.random.default_rng(seed)
+        for i in rng.integers(0, len(shared), 100):
+            disk.put(shared[i], list(range(rng.integers(1, 60))))
+
+    threads = [threading.Thread(target=writer, args=(seed,)) for seed in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert disk._size == disk_bytes(disk)
+    assert disk._size <= 6000
+
+
+def test_single_flight_runs_one_computation_for_concurrent_callers():
+    cache = ForecastCache()
+    key = keys(1)[0]
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'value'
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(cache.get_or_compute(key, slow)))
+    owner.start()
+    started.wait(5)
+    waiters = [threading.Thread(target=lambda: results.append(cache.get_or_compute(key, slow))) for _ in range(4)]
+    for thread in waiters:
+        thread.start()
+    while cache.stats()['coalesced'] < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in [owner] + waiters:
+        thread.join(5)
+    assert results == ['value'] * 5 and calls == [1]
+
+
+def test_single_flight_passes_errors_to_waiters_and_forgets_the_key():
+    cache = ForecastCache()
+    key = keys(1)[0]
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("model failed")
+
+    errors = []
+
+    def call():
+        try:
+            cache.get_or_compute(key, failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    owner = threading.Thread(target=call)
+    owner.start()
+    started.wait(5)
+    waiter = threading.Thread(target=call)
+    waiter.start()
+    while cache.stats()['coalesced'] < 1:
+        time.sleep(0.01)
+    release.set()
+    owner.join(5)
+    waiter.join(5)
+    assert errors == ["model failed"] * 2
+    assert cache.get_or_compute(key, lambda: 'retried') == 'retried'
+
+
+def test_clear_empties_both_tiers(tmp_path):
+    cache = ForecastCache(disk_dir=str(tmp_path))
+    k = keys(3)
+    cache.get_many(k, lambda indices: [i for i in indices])
+    cache.clear()
+    assert cache.stats()['entries'] == 0 and cache.stats()['disk_bytes'] == 0
+    assert DiskTier(str(tmp_path), ttl=60)._entries() == []
+    assert cache.get_many(k, lambda indices: [10 + i for i in indices]) == [10, 11, 12]
+
+
+def test_clear_cache_command_clears_the_disk_tier(tmp_path, monkeypatch):
+    cache = ForecastCache(disk_dir=str(tmp_path))
+    cache.get_or_compute(keys(1)[0], lambda: 1)
+    monkeypatch.setitem(predict_infer._resources, 'forecast_cache', cache)
+    assert predict_infer.handle_command({'command': 'clear_cache'}) == {'cleared': True}
+    assert cache.disk._entries() == []
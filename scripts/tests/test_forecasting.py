@@ -0,0 +1,151 @@
+import json
+import os
+
+import numpy as np
+import onnx
+import pytest
+from onnx import TensorProto, helper
+
+import fold_scalers
+import onnx_models
+import predict_infer
+from features import N_FEATURES, WINDOW_SIZE, Scaler, window_features
+from forecasting import forecast_batch, parse_hybrid_weight
+from predict_infer import handle_request, resolve_strategy
+from onnx_models import MODEL_REGISTRY, MODELS_DIR, SessionCache
+
+HORIZON = 6
+
+
+def histories(n_series=5, seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.gamma(0.6, 4.0, rng.integers(WINDOW_SIZE, 40)) for _ in range(n_series)]
+
+
+def last_dates(n_series=5):
+    return np.datetime64('2024-01-28') + np.arange(n_series) * 37
+
+
+@pytest.fixture(autouse=True)
+def no_ort_cache(monkeypatch):
+    monkeypatch.setattr(onnx_models, 'ORT_CACHE_ENABLED', False)
+
+
+def reference_forecast(session, kind, history, last_date, horizon):
+    """One series, one step at a time, features rebuilt from the window at every step"""
+    window = list(np.asarray(history[-WINDOW_SIZE:], dtype=np.float32))
+    name = session.get_inputs()[0].name
+    out = []
+    for step in range(horizon):
+        rows = np.asarray(window[-WINDOW_SIZE:], dtype=np.float32)[None]
+        if kind == 'tabular':
+            inputs = window_features(rows, np.array([last_date + step + 1]))
+        else:
+            inputs = rows[:, :, None]
+        value = max(float(session.run(None, {name: inputs})[0].ravel()[0]), 0.0)
+        out.append(value)
+        window.append(value)
+    return np.array(out)
+
+
+@pytest.mark.parametrize('method', ['gbr', 'xgb', 'lstm', 'bilstm'])
+def test_batched_forecast_matches_one_series_at_a_time(method):
+    sessions = SessionCache()
+    session = sessions.get(method)
+    assert onnx_models.is_folded(session)
+    series, dates = histories(), last_dates()
+    batched = forecast_batch(method, series, dates, HORIZON, sessions, Scaler.load())
+    kind = MODEL_REGISTRY[method]['kind']
+    for i, history in enumerate(series):
+        expected = reference_forecast(session, kind, history, dates[i], HORIZON)
+        np.testing.assert_allclose(batched[i], expected, rtol=1e-5, atol=1e-5)
+
+
+@pytest.mark.parametrize('method', ['gbr', 'xgb', 'hybrid'])
+def test_storm_recession_forecast_matches_the_per_step_reference(method):
+    sessions = SessionCache()
+    history = np.array([60, 50, 40, 30, 25, 20, 15], dtype=np.float64)
+    date = np.datetime64('2024-02-10')
+    got = forecast_batch(method, [history], np.array([date]), 30, sessions, Scaler.load())[0]
+    if method == 'hybrid':
+        weight = parse_hybrid_weight(None)
+        window = list(history)
+        expected = []
+        for step in range(30):
+            rows = np.asarray(window[-WINDOW_SIZE:], dtype=np.float32)[None]
+            tabular = reference_forecast(sessions.get('xgb'), 'tabular', rows[0], date + step, 1)[0]
+            sequence = reference_forecast(sessions.get('lstm'), 'sequence', rows[0], date + step, 1)[0]
+            expected.append(max(weight * tabular + (1 - weight) * sequence, 0.0))
+            window.append(expected[-1])
+    else:
+        expected = reference_forecast(sessions.get(method), 'tabular', history, date, 30)
+    np.testing.assert_allclose(got, expected, rtol=1e-5, atol=1e-5)
+
+
+def unfolded_model(kind, seed=0):
+    """A scaled-units model like the exported ones: linear over features, or over the window"""
+    rng = np.random.default_rng(seed)
+    if kind == 'tabular':
+        shape, flat = [None, N_FEATURES], N_FEATURES
+        nodes = [helper.make_node('MatMul', ['input', 'W'], ['output'])]
+        initializers = []
+    else:
+        shape, flat = [None, WINDOW_SIZE, 1], WINDOW_SIZE
+        nodes = [helper.make_node('Reshape', ['input', 'shape'], ['flat']),
+                 helper.make_node('MatMul', ['flat', 'W'], ['output'])]
+        initializers = [helper.make_tensor('shape', TensorProto.INT64, [2], [-1, flat])]
+    weights = rng.normal(scale=0.3, size=flat).astype(np.float32)
+    initializers.append(helper.make_tensor('W', TensorProto.FLOAT, [flat, 1], weights.tolist()))
+    graph = helper.make_graph(nodes, 'linear', [helper.make_tensor_value_info('input', TensorProto.FLOAT, shape)],
+                              [helper.make_tensor_value_info('output', TensorProto.FLOAT, [None, 1])],
+                              initializer=initializers)
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+    model.ir_version = 8
+    return model.SerializeToString()
+
+
+@pytest.mark.parametrize('kind', ['tabular', 'sequence'])
+def test_folded_model_matches_runtime_scaling(kind, tmp_path, monkeypatch):
+    with open(os.path.join(MODELS_DIR, 'scaler_params.json')) as f:
+        scaler_params = json.load(f)
+    original = unfolded_model(kind)
+    name = f"test_{kind}"
+    monkeypatch.setitem(MODEL_REGISTRY, name, {'file': f"{name}.onnx", 'kind': kind})
+    (tmp_path / 'plain').mkdir()
+    (tmp_path / 'folded').mkdir()
+    (tmp_path / 'plain' / f"{name}.onnx").write_bytes(original)
+    folded = fold_scalers.fold_bytes(name, original, scaler_params)
+    assert fold_scalers.is_folded_model(onnx.load_from_string(folded))
+    (tmp_path / 'folded' / f"{name}.onnx").write_bytes(folded)
+
+    scaler = Scaler(scaler_params)
+    plain_sessions = SessionCache(models_dir=str(tmp_path / 'plain'))
+    folded_sessions = SessionCache(models_dir=str(tmp_path / 'folded'))
+    assert not onnx_models.is_folded(plain_sessions.get(name))
+    assert onnx_models.is_folded(folded_sessions.get(name))
+
+    series, dates = histories(seed=1), last_dates()
+    plain = forecast_batch(name, series, dates, HORIZON, plain_sessions, scaler)
+    in_graph = forecast_batch(name, series, dates, HORIZON, folded_sessions, scaler)
+    np.testing.assert_allclose(in_graph, plain, rtol=1e-4, atol=1e-4)
+
+
+def test_direct_strategy_without_the_direct_model(monkeypatch):
+    monkeypatch.setattr(predict_infer, 'model_installed', lambda name: False)
+    request = {'method': 'gbr', 'features': histories(1)[0].tolist(), 'last_date': '2024-01-28', 'horizon': 4,
+               'cache': False}
+    for explicit in ({'strategy': 'direct'}, {'method': 'direct'}):
+        with pytest.raises(ValueError, match="Direct model not installed"):
+            handle_request(dict(request, **explicit))
+    # 'auto' falls back to the recursive forecast and says so
+    fallback = handle_request(dict(request, strategy='auto'))
+    assert fallback['strategy'] == 'recursive'
+    np.testing.assert_allclose(fallback['predictions'], handle_request(request)['predictions'])
+
+
+def test_auto_strategy_prefers_an_installed_direct_model(monkeypatch):
+    monkeypatch.setattr(predict_infer, 'model_installed', lambda name: True)
+    assert resolve_strategy('xgboost', 'auto') == ('direct', 'direct')
+    assert resolve_strategy('gbr', 'recursive') == ('gbr', 'recursive')
+    with pytest.raises(ValueError, match="only available for tabular models"):
+        resolve_strategy('lstm', 'auto')
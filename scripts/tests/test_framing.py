@@ -0,0 +1,118 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
+import framing
+import predict_infer
+
+
+def frame(header, body=b''):
+    data = json.dumps(header).encode('utf-8')
+    return framing.PREFIX.pack(len(data), len(body)) + data + body
+
+
+def test_arrays_round_trip_as_aligned_views_of_the_body():
+    payload = {'id': 7, 'a': np.arange(3, dtype=np.float32), 'nested': [{'b': np.ones((2, 5))}], 'n': np.int64(4)}
+    stream = io.BytesIO(framing.encode(payload, 'f8') + framing.encode({'last': True}))
+
+    decoded = framing.read_frame(stream)
+    assert decoded['id'] == 7 and decoded['n'] == 4
+    np.testing.assert_array_equal(decoded['a'], [0, 1, 2])
+    b = decoded['nested'][0]['b']
+    assert b.shape == (2, 5) and b.dtype == np.dtype('<f8') and not b.flags.writeable
+    assert framing.read_frame(stream) == {'last': True}
+    assert framing.read_frame(stream) is None
+
+
+def test_encode_pads_every_array_to_the_alignment():
+    data = framing.encode({'a': np.ones(3), 'b': np.ones(2)}, 'f4')
+    header_size, body_size = framing.PREFIX.unpack_from(data)
+    header = json.loads(data[framing.PREFIX.size:framing.PREFIX.size + header_size])
+    assert header['a']['$array']['offset'] == 0
+    assert header['b']['$array']['offset'] == 16
+    assert body_size == 24
+
+
+def test_add_fields_keeps_the_body():
+    data = framing.encode({'predictions': np.arange(4.0)})
+    decoded = framing.read_frame(io.BytesIO(framing.add_fields(data, {'timings': {'total': 1.0}})))
+    assert decoded['timings'] == {'total': 1.0}
+    np.testing.assert_array_equal(decoded['predictions'], [0, 1, 2, 3])
+
+
+def test_invalid_arrays_are_consumed_so_the_next_frame_reads():
+    outside = frame({'a': {'$array': {'dtype': 'f4', 'offset': 8, 'shape': [4]}}}, b'\0' * 16)
+    bad_dtype = frame({'a': {'$array': {'dtype': 'i8', 'shape': [1]}}}, b'\0' * 8)
+    stream = io.BytesIO(outside + bad_dtype + frame({'ok': 1}))
+    with pytest.raises(ValueError, match="outside"):
+        framing.read_frame(stream)
+    with pytest.raises(ValueError, match="Unsupported array dtype"):
+        framing.read_frame(stream)
+    assert framing.read_frame(stream) == {'ok': 1}
+
+
+def test_truncated_and_unframed_streams_raise_framing_errors():
+    data = framing.encode({'a': np.ones(4)})
+    with pytest.raises(framing.FramingError):
+        framing.read_frame(io.BytesIO(data[:-3]))
+    with pytest.raises(framing.FramingError):
+        framing.read_frame(io.BytesIO(data[:5]))
+    with pytest.raises(framing.FramingError, match="too large"):
+        framing.read_frame(io.BytesIO(b'{"method": "gbr"}\n'))
+
+
+def test_serve_binary_answers_like_the_json_protocol():
+    history = np.random.default_rng(0).gamma(0.6, 4.0, (2, 30))
+    request = {'id': 'r1', 'method': 'gbr', 'series': [{'values': h, 'last_date': '2024-03-01'} for h in history],
+               'horizon': 4, 'cache': False, 'dtype': 'f8'}
+    stdin = io.BytesIO(framing.encode(request, 'f8') + frame({'id': 'r2', 'method': 'nope'}))
+    stdout = io.BytesIO()
+    predict_infer.serve_binary(stdin, stdout)
+
+    stdout.seek(0)
+    first, second = framing.read_frame(stdout), framing.read_frame(stdout)
+    json_request = dict(request, series=[{'values': h.tolist(), 'last_date': '2024-03-01'} for h in history])
+    expected = predict_infer.handle_request(json_request)
+    assert first['id'] == 'r1'
+    for got, want in zip(first['series'], expected['series']):
+        np.testing.assert_allclose(got['predictions'], want['predictions'], rtol=1e-6)
+    assert second['id'] == 'r2' and 'error' in second
+
+
+MALFORMED_SPECS = [
+    {'dtype': 'f4', 'offset': 0},
+    'f4',
+    ['f4', [2]],
+    {'dtype': 'f4', 'shape': 3},
+    {'dtype': 'f4', 'shape': ['a']},
+    {'dtype': 'f4', 'shape': [2], 'offset': 'x'},
+    {'dtype': ['f4'], 'shape': [2]},
+    {'dtype': 'f4', 'shape': [-2, -2]},
+    {'dtype': 'f4', 'shape': [2 ** 40, 2 ** 40]},
+]
+
+
+@pytest.mark.parametrize('spec', MALFORMED_SPECS)
+def test_malformed_array_specs_raise_value_errors(spec):
+    with pytest.raises(ValueError):
+        framing.read_frame(io.BytesIO(frame({'features': {'$array': spec}}, b'\0' * 16)))
+
+
+def test_serve_binary_answers_every_frame_after_malformed_ones():
+    history = np.random.default_rng(1).gamma(0.6, 4.0, 30)
+    bad = [frame({'id': i, 'method': 'gbr', 'features': {'$array': spec}}, b'\0' * 16)
+           for i, spec in enumerate(MALFORMED_SPECS)]
+    good = framing.encode({'id': 'ok', 'method': 'gbr', 'features': history, 'last_date': '2024-03-01',
+                           'horizon': 2, 'cache': False})
+    stdout = io.BytesIO()
+    predict_infer.serve_binary(io.BytesIO(b''.join(bad) + good), stdout)
+
+    stdout.seek(0)
+    responses = []
+    while (response := framing.read_frame(stdout)) is not None:
+        responses.append(response)
+    assert len(responses) == len(MALFORMED_SPECS) + 1
+    assert all('error' in r for r in responses[:-1])
+    assert responses[-1]['id'] == 'ok' and len(responses[-1]['predictions']) == 2
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+import predict_infer
+from hourly import HOURLY_FEATURE_NAMES, HOURLY_WINDOW, daily_totals, hourly_feature_matrix
+from station_store import StationStore
+
+
+def hours(start, count):
+    return np.datetime64(start, 'h') + np.arange(count)
+
+
+def test_contiguous_series_drops_partial_edge_days():
+    times = hours('2024-01-01T06', 24 * 3)
+    totals, last = daily_totals(np.ones(len(times)), times[-1])
+    assert totals.tolist() == [24.0, 24.0] and last == np.datetime64('2024-01-03')
+
+
+def test_totals_follow_the_stored_timestamps_across_a_gap():
+    # Jan 1-2 complete, Jan 3 entirely missing, Jan 4-5 complete
+    times = np.concatenate([hours('2024-01-01T00', 48), hours('2024-01-04T00', 48)])
+    values = np.concatenate([np.full(24, 1.0), np.full(24, 2.0), np.full(24, 4.0), np.full(24, 5.0)])
+    # Without the timestamps every day before the gap would shift by one
+    totals, last = daily_totals(values[48:], times[-1], times=times[48:])
+    assert totals.tolist() == [96.0, 120.0] and last == np.datetime64('2024-01-05')
+    with pytest.raises(ValueError, match="no data between 2024-01-02 and 2024-01-04"):
+        daily_totals(values, times[-1], times=times)
+
+
+def test_partial_day_inside_the_window_is_refused():
+    times = np.concatenate([hours('2024-01-01T00', 30), hours('2024-01-02T10', 38)])
+    with pytest.raises(ValueError, match="only 20 of 24 hours on 2024-01-02"):
+        daily_totals(np.ones(len(times)), times[-1], times=times)
+
+
+def test_hourly_station_with_a_gap_feeds_the_daily_models_by_date(tmp_path, monkeypatch):
+    store = StationStore(str(tmp_path))
+    monkeypatch.setitem(predict_infer._resources, 'stations', store)
+    store.append('h1', hours('2024-01-01T00', 24 * 10), np.ones(24 * 10), resolution='hourly')
+    store.append('h1', hours('2024-01-12T00', 24 * 9), np.full(24 * 9, 0.5), resolution='hourly')
+
+    request = {'method': 'gbr', 'station': 'h1', 'resolution': 'hourly', 'horizon': 1, 'cache': False}
+    with pytest.raises(ValueError, match="no data between 2024-01-10 and 2024-01-12"):
+        predict_infer.handle_request(request)
+    job = predict_infer.ForecastJob.from_request(dict(request, days=9))
+    np.testing.assert_array_equal(job.histories[0], np.full(9, 12.0))
+    assert job.last_dates[0] == np.datetime64('2024-01-20')
+    # Hourly methods still need gap-free hours
+    with pytest.raises(ValueError, match="has no data between"):
+        predict_infer.handle_request(dict(request, method='persistence'))
+
+
+def naive_hourly_features(values, times):
+    """One Python pass per target hour, from the 24 hours before it"""
+    rows, targets = [], []
+    for k in range(len(values) - HOURLY_WINDOW + 1):
+        span = times[k:k + HOURLY_WINDOW]
+        if span[-1] - span[0] != np.timedelta64(HOURLY_WINDOW - 1, 'h'):
+            continue
+        w = [float(v) for v in values[k:k + HOURLY_WINDOW]]
+        target = span[-1] + 1
+        day = target.astype('datetime64[D]').item()
+        mean = sum(w) / len(w)
+        rows.append([w[-1], w[-3], w[-6], w[0], sum(w[-3:]) / 3, sum(w[-6:]) / 6, mean, max(w),
+                     (sum((v - mean) ** 2 for v in w) / (len(w) - 1)) ** 0.5, sum(v >= 0.1 for v in w),
+                     target.item().hour, day.month, day.weekday()])
+        targets.append(target)
+    return np.array(rows), np.array(targets, dtype='datetime64[h]')
+
+
+def test_hourly_features_match_a_per_hour_reference():
+    rng = np.random.default_rng(0)
+    times = hours('2024-02-27T05', 24 * 5)
+    values = (rng.gamma(0.3, 2.0, len(times)) * (rng.random(len(times)) < 0.4)).astype(np.float32)
+    features, targets = hourly_feature_matrix(values, times)
+    expected, expected_targets = naive_hourly_features(values, times)
+    assert features.shape == (len(times) - HOURLY_WINDOW + 1, len(HOURLY_FEATURE_NAMES))
+    np.testing.assert_array_equal(targets, expected_targets)
+    np.testing.assert_allclose(features, expected, rtol=1e-5, atol=1e-5)
+
+
+def test_hourly_feature_windows_never_span_a_missing_hour():
+    times = np.concatenate([hours('2024-01-01T00', 30), hours('2024-01-02T10', 30)])
+    values = np.arange(60, dtype=np.float32)
+    features, targets = hourly_feature_matrix(values, times)
+    expected, expected_targets = naive_hourly_features(values, times)
+    # 7 windows on each side of the 4-hour outage
+    assert len(features) == 14
+    np.testing.assert_array_equal(targets, expected_targets)
+    np.testing.assert_allclose(features, expected, rtol=1e-5)
+    with pytest.raises(ValueError, match="strictly increasing"):
+        hourly_feature_matrix(values, times[::-1])
+
+
+def test_a_year_of_hours_is_featurized_in_one_pass():
+    times = hours('2023-01-01T00', 8760)
+    features, targets = hourly_feature_matrix(np.ones(8760), times)
+    assert features.shape == (8760 - HOURLY_WINDOW + 1, 13)
+    assert targets[-1] == np.datetime64('2024-01-01T00', 'h')
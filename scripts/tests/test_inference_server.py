@@ -0,0 +1,89 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+import inference_server
+import predict_infer
+from inference_server import InferenceServer, MicroBatcher
+from predict_infer import decode_job
+
+
+def request(seed, horizon=3):
+    values = np.random.default_rng(seed).gamma(0.6, 4.0, 30).round(2).tolist()
+    return {'method': 'gbr', 'features': values, 'last_date': '2024-03-01', 'horizon': horizon, 'cache': False}
+
+
+def serve(requests, **options):
+    """Responses of `requests` submitted together, and the batcher's stats after they finish"""
+    async def main():
+        batcher = MicroBatcher(max_wait_ms=50, **options)
+        batcher.start()
+        try:
+            responses = await asyncio.gather(*(batcher.submit(decode_job(r)) for r in requests),
+                                             return_exceptions=True)
+            return responses, batcher.stats()
+        finally:
+            await batcher.stop()
+
+    return asyncio.run(main())
+
+
+def test_jobs_sharing_a_group_run_once_and_match_one_shot_answers():
+    requests = [request(seed) for seed in range(4)]
+    responses, stats = serve(requests)
+    for req, response in zip(requests, responses):
+        np.testing.assert_allclose(response['predictions'], predict_infer.handle_request(req)['predictions'],
+                                   rtol=1e-6)
+    assert (stats['batches'], stats['group_runs'], stats['series']) == (1, 1, 4)
+    assert stats['running_groups'] == 0
+
+
+def test_groups_split_by_horizon_and_finished_tasks_are_released():
+    responses, stats = serve([request(0, 3), request(1, 3), request(2, 5)])
+    assert [len(r['predictions']) for r in responses] == [3, 3, 5]
+    assert stats['batches'] == 1 and stats['group_runs'] == 2
+    assert stats['running_groups'] == 0
+
+
+def test_a_failing_job_does_not_fail_its_batch_mates():
+    bad = request(1)
+    bad['features'] = bad['features'][:3]
+    responses, stats = serve([request(0), bad])
+    assert len(responses[0]['predictions']) == 3
+    assert isinstance(responses[1], ValueError)
+    # The failed group, then each job on its own
+    assert stats['group_runs'] == 3 and stats['errors'] == 1
+
+
+def test_max_batch_size_must_be_positive():
+    with pytest.raises(ValueError):
+        MicroBatcher(max_batch_size=0)
+
+
+def test_predict_completes_while_an_ingest_command_runs(monkeypatch):
+    release = threading.Event()
+
+    def slow_ingest(command):
+        # Held until the concurrent predict has answered (or 5 s, if the loop is blocked)
+        return {'released': release.wait(5)}
+
+    monkeypatch.setattr(inference_server, 'handle_command', slow_ingest)
+
+    async def main():
+        server = InferenceServer(MicroBatcher(max_wait_ms=5))
+        server.batcher.start()
+        try:
+            ingest = asyncio.get_running_loop().create_task(server.predict({'command': 'ingest_csv'}))
+            await asyncio.sleep(0)
+            response = await asyncio.wait_for(server.predict(request(0)), 10)
+            ingest_done = ingest.done()
+            release.set()
+            return response, ingest_done, await ingest
+        finally:
+            await server.batcher.stop()
+
+    response, ingest_done, ingest_response = asyncio.run(main())
+    assert len(response['predictions']) == 3
+    assert not ingest_done and ingest_response == {'released': True}
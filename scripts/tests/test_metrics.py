@@ -0,0 +1,113 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from metrics import (RAIN_THRESHOLD, CrpsAccumulator, Evaluation, RegressionAccumulator, RocAccumulator,
+                     crps_quantiles, crps_samples, evaluate, regression_metrics, roc_auc)
+
+
+def backtest(n=600, horizon=3, members=40, seed=0):
+    rng = np.random.default_rng(seed)
+    actual = rng.gamma(0.5, 6.0, (n, horizon)) * (rng.random((n, horizon)) < 0.6)
+    predicted = np.maximum(actual + rng.normal(0, 2.0, actual.shape), 0)
+    samples = np.maximum(predicted[:, None, :] + rng.normal(0, 3.0, (n, members, horizon)), 0)
+    return actual, predicted, samples
+
+
+def chunks(n, sizes):
+    bounds = np.cumsum([0] + sizes)
+    assert bounds[-1] == n
+    return [slice(a, b) for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+def test_regression_metrics_match_their_definitions_per_lead():
+    actual, predicted, _ = backtest()
+    scores = regression_metrics(actual, predicted)
+    errors = predicted - actual
+    np.testing.assert_allclose(scores['rmse'], np.sqrt((errors ** 2).mean(axis=0)))
+    np.testing.assert_allclose(scores['mae'], np.abs(errors).mean(axis=0))
+    ss_tot = ((actual - actual.mean(axis=0)) ** 2).sum(axis=0)
+    np.testing.assert_allclose(scores['r2'], 1 - (errors ** 2).sum(axis=0) / ss_tot)
+
+    pooled = regression_metrics(actual.ravel(), predicted.ravel())
+    assert isinstance(pooled['rmse'], float)
+
+
+def test_constant_actuals_score_like_scikit_learn():
+    assert regression_metrics(np.ones(4), np.ones(4))['r2'] == 1.0
+    assert regression_metrics(np.ones(4), np.zeros(4))['r2'] == 0.0
+
+
+def test_merged_regression_accumulators_are_exact():
+    actual, predicted, _ = backtest()
+    whole = regression_metrics(actual, predicted)
+    parts = [RegressionAccumulator().update(actual[s], predicted[s]) for s in chunks(600, [1, 250, 0, 349])]
+    merged = RegressionAccumulator()
+    for part in parts:
+        merged.merge(pickle.loads(pickle.dumps(part)))
+    for name, value in merged.result().items():
+        np.testing.assert_allclose(value, whole[name], rtol=1e-12)
+
+
+def test_roc_auc_matches_the_pairwise_definition():
+    actual, predicted, _ = backtest(n=200, horizon=1)
+    rainy = actual.ravel() >= RAIN_THRESHOLD
+    pos, neg = predicted.ravel()[rainy], predicted.ravel()[~rainy]
+    pairs = (pos[:, None] > neg[None, :]).mean() + 0.5 * (pos[:, None] == neg[None, :]).mean()
+    assert roc_auc(actual, predicted) == pytest.approx(pairs, rel=1e-12)
+    with pytest.raises(ValueError, match="both rainy and dry"):
+        roc_auc(np.zeros(5), np.ones(5))
+
+
+def test_merged_roc_accumulators_add_exactly_and_stay_near_the_exact_auc():
+    actual, predicted, _ = backtest()
+    one = RocAccumulator().update(actual, predicted)
+    merged = RocAccumulator()
+    for s in chunks(600, [100, 200, 300]):
+        merged.merge(RocAccumulator().update(actual[s], predicted[s]))
+    assert merged.result() == one.result()
+    assert merged.result() == pytest.approx(roc_auc(actual, predicted), abs=2e-3)
+    with pytest.raises(ValueError, match="different thresholds"):
+        merged.merge(RocAccumulator(threshold=5.0))
+
+
+def test_crps_samples_matches_the_pairwise_formula():
+    actual, _, samples = backtest(n=20, members=15)
+    members = np.moveaxis(samples, 1, -1)
+    pairwise = np.abs(members[..., :, None] - members[..., None, :]).mean(axis=(-1, -2))
+    expected = np.abs(members - actual[..., None]).mean(axis=-1) - pairwise / 2
+    np.testing.assert_allclose(crps_samples(actual, samples, axis=1), expected, rtol=1e-12, atol=1e-12)
+
+
+def test_crps_quantiles_approaches_crps_samples():
+    rng = np.random.default_rng(3)
+    members = rng.normal(size=(50, 4000))
+    actual = rng.normal(size=50)
+    levels = np.linspace(0.005, 0.995, 199)
+    quantiles = np.quantile(members, levels, axis=1).T
+    np.testing.assert_allclose(crps_quantiles(actual, quantiles, levels), crps_samples(actual, members),
+                               atol=0.02)
+    with pytest.raises(ValueError, match="strictly between"):
+        crps_quantiles(actual, quantiles[:, :2], [0.0, 0.5])
+
+
+def test_merged_evaluations_equal_one_pass_over_all_the_data():
+    actual, predicted, samples = backtest()
+    whole = Evaluation().update(actual, predicted, samples=samples, axis=1).result()
+    merged = Evaluation()
+    for s in chunks(600, [150, 150, 300]):
+        part = Evaluation().update(actual[s], predicted[s], samples=samples[s], axis=1)
+        merged.merge(pickle.loads(pickle.dumps(part)))
+    result = merged.result()
+    assert result['count'] == whole['count'] == 600
+    for name in ('rmse', 'mae', 'r2', 'crps'):
+        np.testing.assert_allclose(result[name], whole[name], rtol=1e-12)
+    assert result['roc_auc'] == whole['roc_auc']
+
+
+def test_evaluate_reports_undefined_metrics_as_none():
+    result = evaluate(np.zeros(5), np.ones(5))
+    assert result['roc_auc'] is None and result['crps'] is None
+    with pytest.raises(ValueError):
+        CrpsAccumulator().result()
@@ -0,0 +1,107 @@
+import json
+
+import numpy as np
+import pytest
+from onnx import TensorProto, helper
+
+import predict_infer
+from features import Scaler
+from multivariate import InputSchema, load_schemas
+from onnx_models import MODEL_REGISTRY, SessionCache
+
+WINDOW = 7
+COLUMNS = ['rainfall', 'suhu', 'kelembaban']
+SCALER_KEYS = ['target_scaler', 'suhu_scaler', 'kelembaban_scaler']
+SCALERS = {
+    'target_scaler': {'mean': 1.5, 'scale': 2.0},
+    'suhu_scaler': {'mean': 27.0, 'scale': 1.5},
+    'kelembaban_scaler': {'mean': 80.0, 'scale': 8.0},
+}
+
+
+def linear_onnx(weights):
+    """[N, WINDOW, C] -> [N, 1]: a fixed linear map of the flattened scaled window"""
+    flat = WINDOW * len(COLUMNS)
+    graph = helper.make_graph(
+        [helper.make_node('Reshape', ['input', 'shape'], ['flat']),
+         helper.make_node('MatMul', ['flat', 'W'], ['output'])], 'linear',
+        [helper.make_tensor_value_info('input', TensorProto.FLOAT, [None, WINDOW, len(COLUMNS)])],
+        [helper.make_tensor_value_info('output', TensorProto.FLOAT, [None, 1])],
+        initializer=[helper.make_tensor('shape', TensorProto.INT64, [2], [-1, flat]),
+                     helper.make_tensor('W', TensorProto.FLOAT, [flat, 1], weights.ravel().tolist())])
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+    model.ir_version = 8
+    return model.SerializeToString()
+
+
+@pytest.fixture
+def weather(tmp_path, monkeypatch):
+    """A rainfall + temperature + humidity schema and model in tmp_path, served by predict_infer"""
+    weights = np.random.default_rng(0).normal(scale=0.2, size=(WINDOW, len(COLUMNS))).astype(np.float32)
+    (tmp_path / 'model_weather.onnx').write_bytes(linear_onnx(weights))
+    (tmp_path / 'weather_scalers.json').write_text(json.dumps(SCALERS))
+    (tmp_path / 'input_schemas.json').write_text(json.dumps({'schemas': [{
+        'name': 'test_weather', 'model': str(tmp_path / 'model_weather.onnx'), 'window': WINDOW,
+        'target': 'rainfall', 'scaler_file': 'weather_scalers.json',
+        'columns': [{'name': 'rainfall', 'aliases': ['hujan'], 'scaler': 'target_scaler'},
+                    {'name': 'suhu', 'scaler': 'suhu_scaler'},
+                    {'name': 'kelembaban', 'scaler': 'kelembaban_scaler'}],
+    }]}))
+    monkeypatch.setitem(predict_infer._resources, 'schemas', load_schemas(str(tmp_path / 'input_schemas.json')))
+    monkeypatch.setitem(predict_infer._resources, 'sessions', SessionCache())
+    yield weights
+    MODEL_REGISTRY.pop('test_weather', None)
+
+
+def reference_forecast(weights, matrix, future, horizon):
+    """The recursive loop written out step by step in float64"""
+    mean = np.array([SCALERS[key]['mean'] for key in SCALER_KEYS])
+    scale = np.array([SCALERS[key]['scale'] for key in SCALER_KEYS])
+    rows = [row for row in matrix[-WINDOW:].astype(np.float64)]
+    predictions = []
+    for step in range(horizon):
+        scaled = (np.array(rows[-WINDOW:]) - mean) / scale
+        value = max(float((scaled * weights).sum()) * scale[0] + mean[0], 0.0)
+        predictions.append(value)
+        rows.append(np.concatenate([[value], future[step]]))
+    return np.array(predictions)
+
+
+def test_shipped_schemas_take_their_scaling_from_the_scaler_file():
+    scaler = Scaler.load()
+    for schema in load_schemas():
+        assert schema.mean[schema.target_index] == scaler.target_mean
+        assert schema.scale[schema.target_index] == scaler.target_scale
+
+
+def test_columns_without_a_scaler_entry_are_rejected():
+    spec = {'name': 'x', 'model': 'x.onnx', 'window': 7, 'target': 'rainfall',
+            'columns': [{'name': 'rainfall', 'mean': 1.0, 'scale': 2.0}]}
+    with pytest.raises(ValueError, match="needs a \"scaler\""):
+        InputSchema(spec, SCALERS)
+    spec['columns'][0]['scaler'] = 'missing_scaler'
+    with pytest.raises(ValueError, match="needs a \"scaler\""):
+        InputSchema(spec, SCALERS)
+
+
+def test_multi_column_schema_loads_each_columns_scaler(weather):
+    schema, = predict_infer.get_input_schemas()
+    assert schema.columns == COLUMNS
+    np.testing.assert_array_equal(schema.mean, np.float32([1.5, 27.0, 80.0]))
+    np.testing.assert_array_equal(schema.scale, np.float32([2.0, 1.5, 8.0]))
+
+
+def test_multi_column_request_matches_the_reference_loop(weather):
+    rng = np.random.default_rng(1)
+    n, horizon = 30, 5
+    columns = {'hujan': rng.gamma(0.6, 4.0, n).tolist(), 'suhu': (27 + rng.normal(size=n)).tolist(),
+               'kelembaban': (80 + 5 * rng.normal(size=n)).tolist()}
+    future = {'suhu': [28.0, 29.0], 'kelembaban': [75.0] * horizon}
+    response = predict_infer.handle_request({'method': 'multivariate', 'columns': columns, 'future': future,
+                                             'horizon': horizon, 'cache': False})
+
+    matrix = np.column_stack([columns['hujan'], columns['suhu'], columns['kelembaban']]).astype(np.float32)
+    # suhu's last given future value is carried forward
+    carried = np.array([[28.0, 75.0], [29.0, 75.0], [29.0, 75.0], [29.0, 75.0], [29.0, 75.0]])
+    expected = reference_forecast(weather, matrix, carried, horizon)
+    np.testing.assert_allclose(response['predictions'], expected, rtol=1e-4, atol=1e-4)
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+import predict_infer
+from station_store import HEADER_SIZE, RECORD, StationStore, last_gap
+
+
+def days(start, count):
+    return np.datetime64(start) + np.arange(count)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = StationStore(str(tmp_path))
+    monkeypatch.setitem(predict_infer._resources, 'stations', store)
+    return store
+
+
+def test_append_round_trips_through_the_memory_map(store):
+    values = np.arange(10, dtype=np.float32)
+    assert store.append('s1', days('2024-01-01', 10), values) == 10
+    series = store.series('s1')
+    assert len(series) == 10
+    assert series.last_time() == np.datetime64('2024-01-10')
+    np.testing.assert_array_equal(series.values, values)
+
+    dates, window = series.window('2024-01-05', 3)
+    assert dates.tolist() == days('2024-01-03', 3).tolist()
+    np.testing.assert_array_equal(window, [2, 3, 4])
+    dates, _ = series.range('2024-01-08', None)
+    assert len(dates) == 3
+
+
+def test_appends_must_be_later_than_stored_data(store):
+    store.append('s1', days('2024-01-01', 5), np.ones(5))
+    with pytest.raises(ValueError, match="appends must be later"):
+        store.append('s1', days('2024-01-05', 2), np.ones(2))
+    with pytest.raises(ValueError, match="strictly increasing"):
+        store.append('s1', np.array(['2024-02-02', '2024-02-01'], dtype='datetime64[D]'), np.ones(2))
+    assert len(store.series('s1')) == 5
+
+
+def test_half_written_record_is_dropped_by_the_next_append(store):
+    store.append('s1', days('2024-01-01', 3), np.ones(3))
+    path = store.path('s1')
+    with open(path, 'ab') as f:
+        f.write(b'\x01\x02\x03')
+    assert len(store.series('s1')) == 3
+    store.append('s1', days('2024-01-04', 1), [5.0])
+    series = store.series('s1')
+    assert len(series) == 4 and series.values[-1] == 5.0
+    with open(path, 'rb') as f:
+        assert len(f.read()) == HEADER_SIZE + 4 * RECORD.itemsize
+
+
+def test_hourly_files_are_separate_from_daily(store):
+    hours = np.datetime64('2024-01-01T00', 'h') + np.arange(48)
+    store.append('s1', hours, np.ones(48), resolution='hourly')
+    assert store.resolutions('s1') == ['hourly']
+    with pytest.raises(KeyError):
+        store.series('s1', 'daily')
+    assert store.series('s1', 'hourly').last_time() == np.datetime64('2024-01-02T23', 'h')
+
+
+def test_last_gap_finds_the_latest_break():
+    assert last_gap(days('2024-01-01', 5)) is None
+    times = np.concatenate([days('2024-01-01', 3), days('2024-01-10', 2), days('2024-01-20', 2)])
+    assert last_gap(times) == 4
+
+
+def test_station_history_refuses_a_window_with_a_gap(store):
+    store.append('gappy', days('2024-01-01', 20), np.ones(20))
+    store.append('gappy', days('2024-01-31', 20), np.ones(20))
+
+    with pytest.raises(ValueError, match="no data between 2024-01-20 and 2024-01-31"):
+        predict_infer.station_history({'station': 'gappy'})
+
+    history, last, _ = predict_infer.station_history({'station': 'gappy', 'days': 20})
+    assert len(history) == 20 and last == np.datetime64('2024-02-19')
+    history, last, _ = predict_infer.station_history({'station': 'gappy', 'until': '2024-01-25'})
+    assert len(history) == 20 and last == np.datetime64('2024-01-20')
+
+
+def test_forecast_request_on_a_gapped_station_reports_the_gap(store):
+    store.append('gappy', days('2024-01-01', 20), np.ones(20))
+    store.append('gappy', days('2024-01-31', 20), np.ones(20))
+    with pytest.raises(ValueError, match="no data between"):
+        predict_infer.handle_request({'method': 'gbr', 'station': 'gappy', 'horizon': 2})
+    response = predict_infer.handle_request({'method': 'gbr', 'station': 'gappy', 'days': 20, 'horizon': 2,
+                                             'cache': False})
+    assert len(response['predictions']) == 2
+
+
+def test_append_command_forwards_the_resolution(store):
+    hours = [str(np.datetime64('2024-01-01T00', 'h') + h) for h in range(30)]
+    response = predict_infer.handle_command({'command': 'append', 'station': 's1', 'dates': hours,
+                                             'values': [0.5] * 30, 'resolution': 'hourly'})
+    assert response == {'station': 's1', 'resolution': 'hourly', 'appended': 30}
+    assert store.series('s1', 'hourly').last_time() == np.datetime64('2024-01-02T05', 'h')
@@ -0,0 +1,93 @@
+import json
+
+import numpy as np
+import onnx
+from onnx import TensorProto, helper
+
+import train_models
+from features import N_FEATURES, WINDOW_SIZE, feature_matrix
+
+HORIZON = 30
+
+
+class MeanModel:
+    """Stands in for the fitted direct forest: predicts the training mean of every lead"""
+
+    def __init__(self, Y):
+        self.mean = Y.mean(axis=0)
+
+    def predict(self, X):
+        return np.tile(self.mean, (len(X), 1))
+
+
+def zero_onnx(n_outputs):
+    weights = helper.make_tensor('W', TensorProto.FLOAT, [N_FEATURES, n_outputs], [0.0] * (N_FEATURES * n_outputs))
+    graph = helper.make_graph(
+        [helper.make_node('MatMul', ['input', 'W'], ['output'])], 'zero',
+        [helper.make_tensor_value_info('input', TensorProto.FLOAT, [None, N_FEATURES])],
+        [helper.make_tensor_value_info('output', TensorProto.FLOAT, [None, n_outputs])],
+        initializer=[weights])
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+    model.ir_version = 8
+    return model.SerializeToString()
+
+
+def direct_arrays(monkeypatch, n_rows=200):
+    rng = np.random.default_rng(0)
+    monkeypatch.setattr(train_models, '_data', {
+        'X': rng.normal(size=(n_rows, N_FEATURES)),
+        'direct_Y': rng.gamma(0.5, 6.0, size=(n_rows - HORIZON, HORIZON)),
+    })
+    monkeypatch.setattr(train_models, 'fit_model', lambda name, params, X, Y: MeanModel(Y))
+
+
+def test_holdout_metrics_pool_lead_times_into_scalars():
+    y_true = np.ones((5, HORIZON))
+    scores = train_models.holdout_metrics(y_true, np.zeros((5, HORIZON)))
+    assert scores['rmse'] == 1.0 and scores['mae'] == 1.0
+    json.dumps(scores)
+
+
+def test_direct_report_entries_are_json_serializable(monkeypatch):
+    direct_arrays(monkeypatch)
+    monkeypatch.setattr(train_models, 'export_onnx', lambda name, model: zero_onnx(HORIZON))
+
+    scored = train_models._score_candidate('direct', {}, (100, 140))
+    assert 'error' not in scored
+    fitted = train_models._fit_and_export('direct', {}, 140)
+    onnx.load_from_string(fitted.pop('onnx'))
+
+    report = {'models': {'direct': {'cv_rmse': scored['rmse'], 'test': fitted['test'],
+                                    'onnx_max_abs_diff': fitted['onnx_max_abs_diff']}}}
+    decoded = json.loads(json.dumps(report))
+    assert set(decoded['models']['direct']['test']) == {'rmse', 'mae', 'r2'}
+    assert all(isinstance(v, float) for v in decoded['models']['direct']['test'].values())
+
+
+def test_direct_training_rows_stop_before_targets_reach_the_holdout(monkeypatch):
+    import train_direct
+
+    Y = np.zeros((100, HORIZON))
+    assert train_direct.train_rows(Y, 80) == 80 - (HORIZON - 1)
+    assert train_direct.train_rows(np.zeros(100), 80) == 80
+    assert train_direct.train_rows(Y, 10) == 0
+
+    direct_arrays(monkeypatch)
+    seen = []
+    monkeypatch.setattr(train_models, 'fit_model', lambda name, params, X, Y: seen.append(len(Y)) or MeanModel(Y))
+    train_models._score_candidate('direct', {}, (100, 140))
+    assert seen == [100 - (HORIZON - 1)]
+
+
+def test_scalers_are_fit_on_the_training_rows_only():
+    rng = np.random.default_rng(1)
+    values = rng.gamma(0.5, 6.0, 300)
+    dates = np.datetime64('2020-01-01') + np.arange(300)
+    data = {'values': values, 'features': feature_matrix(values, dates)[:-1]}
+    train_end = 200
+    params = train_models.fit_scaler_params(data, train_end)
+    # The holdout could be anything without changing the scalers
+    data['values'] = np.concatenate([values[:train_end + WINDOW_SIZE], np.full(300 - train_end - WINDOW_SIZE, 1e3)])
+    assert train_models.fit_scaler_params(data, train_end) == params
+    assert params['target_scaler']['mean'] == values[:train_end + WINDOW_SIZE].mean()
+    np.testing.assert_allclose(params['feature_scaler']['mean'], data['features'][:train_end].mean(axis=0))
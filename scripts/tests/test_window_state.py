@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from features import WINDOW_SIZE, window_features
+from window_state import WindowState
+
+STEPS = 60
+
+
+def check_against_window_features(initial, pushes):
+    """Every step's incremental features against features rebuilt from the plain window"""
+    state = WindowState(initial)
+    windows = np.asarray(initial, dtype=np.float64)
+    dates = np.datetime64('2024-01-01') + np.zeros(len(windows), dtype=np.int64)
+    for step, values in enumerate(pushes):
+        got = state.tabular_features(dates + step)
+        want = window_features(windows, dates + step)
+        np.testing.assert_allclose(got, want, rtol=1e-5, atol=1e-5, err_msg=f"step {step}")
+        np.testing.assert_array_equal(state.window(), windows)
+        assert np.all(state._dq_len <= WINDOW_SIZE)
+        state.push(values)
+        windows = np.column_stack([windows[:, 1:], values])
+
+
+def test_full_deque_of_a_falling_window_expires_before_the_push():
+    state = WindowState([[7, 6, 5, 4, 3, 2, 1]])
+    state.push([0.5])
+    assert state.rolling_max()[0] == 6 and state._dq_len[0] == WINDOW_SIZE
+
+
+def test_strictly_falling_series_over_a_long_horizon():
+    # Storm recessions: every window is strictly decreasing, so the deque stays full
+    starts = np.array([[60, 50, 40, 30, 25, 20, 15], [7, 6, 5, 4, 3, 2, 1], [9, 8.5, 8, 7.5, 7, 6.5, 6]])
+    decay = 0.8 ** np.arange(1, STEPS + 1)
+    pushes = (starts[:, -1:] * decay).T
+    check_against_window_features(starts, pushes)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_random_series_with_ties_and_recessions(seed):
+    rng = np.random.default_rng(seed)
+    initial = rng.gamma(0.6, 4.0, (8, WINDOW_SIZE)).round(1)
+    pushes = rng.gamma(0.6, 4.0, (STEPS, 8)).round(1)
+    # Mix in falling stretches, repeated values and dry spells
+    pushes[10:25] = np.sort(pushes[10:25], axis=0)[::-1]
+    pushes[30:40] = pushes[30]
+    pushes[45:55] = 0.0
+    check_against_window_features(initial, pushes)
@@ -0,0 +1,143 @@
+"""
+Train and export the direct multi-horizon model (model_direct.onnx).
+
+Instead of one next-day model that is fed its own predictions H times, the
+direct model maps the features of day t+1 (same 9 features and
+scaler_params.json scaling as GBR/XGB) to all H days t+1 .. t+H at once, so
+a whole horizon is a single batched ONNX call. A multi-output random forest
+is used because scikit-learn fits it natively and skl2onnx exports it as one
+TreeEnsembleRegressor node with an [N, H] output.
+
+Usage:
+    python scripts/train_direct.py [--horizon 30] [--output public/models/model_direct.onnx]
+
+Needs scikit-learn and skl2onnx (see the training notebook), which the
+inference path does not.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from dataset import DATASET_PATH, load_daily_rainfall
+from features import MODELS_DIR, N_FEATURES, WINDOW_SIZE, Scaler, feature_matrix
+from metrics import regression_metrics
+
+DIRECT_HORIZON = 30
+DEFAULT_OUTPUT = os.path.join(MODELS_DIR, 'model_direct.onnx')
+
+
+def direct_training_set(values, dates, scaler, horizon=DIRECT_HORIZON):
+    """
+    X: [M, 9] scaled features of each target day t+1
+    Y: [M, horizon] the observed values of days t+1 .. t+horizon
+    """
+    values = np.asarray(values, dtype=np.float32)
+    n_rows = len(values) - WINDOW_SIZE - horizon + 1
+    if n_rows < 1:
+        raise ValueError(f"Need at least {WINDOW_SIZE + horizon} values for horizon {horizon}")
+    X = feature_matrix(values, dates, scaler)[:n_rows]
+    windows = np.lib.stride_tricks.sliding_window_view(values[WINDOW_SIZE:], horizon)
+    return X, np.ascontiguousarray(windows[:n_rows])
+
+
+def train_rows(Y, holdout_start):
+    """
+    Rows that may train a model scored from row `holdout_start` on. A row of
+    [N, H] targets holds days t+1 .. t+H, so the H-1 rows before the holdout
+    reach into it and are left out.
+    """
+    gap = Y.shape[1] - 1 if np.ndim(Y) == 2 else 0
+    return max(holdout_start - gap, 0)
+
+
+def fit_direct_model(X, Y, n_estimators=200, max_depth=8, n_jobs=-1, random_state=42):
+    from sklearn.ensemble import RandomForestRegressor
+
+    model = RandomForestRegressor(n_estimators=n_estimators, max_depth=max_depth, min_samples_leaf=5,
+                                  n_jobs=n_jobs, random_state=random_state)
+    model.fit(X, Y)
+    return model
+
+
+def export_onnx(model, path, horizon):
+    """Write the model with an 'input' [None, 9] float tensor, as the other tabular models"""
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+
+    onnx_model = convert_sklearn(model, initial_types=[('input', FloatTensorType([None, N_FEATURES]))],
+                                 target_opset=12)
+    entry = onnx_model.metadata_props.add()
+    entry.key = 'horizon'
+    entry.value = str(horizon)
+    with open(path, 'wb') as f:
+        f.write(onnx_model.SerializeToString())
+    return path
+
+
+def horizon_metrics(y_true, y_pred):
+    """MAE and RMSE per lead time, plus their means"""
+    scores = regression_metrics(y_true, y_pred)
+    mae, rmse = scores['mae'], scores['rmse']
+    return {
+        'mae': float(mae.mean()),
+        'rmse': float(rmse.mean()),
+        'mae_by_lead': mae.round(4).tolist(),
+        'rmse_by_lead': rmse.round(4).tolist(),
+    }
+
+
+def check_export(path, model, X):
+    """Largest absolute difference between scikit-learn and onnxruntime predictions"""
+    import onnxruntime as ort
+
+    session = ort.InferenceSession(path, providers=['CPUExecutionProvider'])
+    onnx_pred = session.run(None, {'input': X.astype(np.float32)})[0]
+    return float(np.abs(onnx_pred - model.predict(X)).max())
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train the direct multi-horizon rainfall model")
+    parser.add_argument('--dataset', default=DATASET_PATH)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--horizon', type=int, default=DIRECT_HORIZON)
+    parser.add_argument('--test-fraction', type=float, default=0.2)
+    parser.add_argument('--estimators', type=int, default=200)
+    parser.add_argument('--max-depth', type=int, default=8)
+    parser.add_argument('--jobs', type=int, default=-1)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scaler = Scaler.load()
+    dates, values = load_daily_rainfall(args.dataset)
+    X, Y = direct_training_set(values, dates, scaler, args.horizon)
+
+    # Chronological split, like the notebook's train_test_split(shuffle=False)
+    split = int(len(X) * (1 - args.test_fraction))
+    fit_end = train_rows(Y, split)
+    start = time.perf_counter()
+    model = fit_direct_model(X[:fit_end], Y[:fit_end], args.estimators, args.max_depth, args.jobs)
+    train_seconds = time.perf_counter() - start
+
+    export_onnx(model, args.output, args.horizon)
+    report = {
+        'model': os.path.basename(args.output),
+        'horizon': args.horizon,
+        'train_rows': fit_end,
+        'test_rows': len(X) - split,
+        'train_seconds': train_seconds,
+        'test': horizon_metrics(Y[split:], model.predict(X[split:])),
+        'onnx_max_abs_diff': check_export(args.output, model, X[split:]),
+    }
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
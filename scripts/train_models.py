@@ -0,0 +1,475 @@
+"""
+Scripted training pipeline that regenerates public/models.
+
+Replaces the manual notebook session (notebook/prediksi_hujan.ipynb):
+
+1. load dataset/Regresi-Hujan.xlsx and build the engineered feature matrix,
+   cached under dataset/.cache keyed by the workbook's hash;
+2. score every hyperparameter candidate of every model on chronological
+   folds of the training split, all (candidate, fold) jobs in a process pool;
+3. refit the best candidate of each model on the whole training split (again
+   in parallel), check the ONNX export against the in-memory model and write
+   model_<name>.onnx, scaler_params.json and model_metrics.json. gbr, xgb,
+   lstm and bilstm are written with the scaler folded into the graph
+   (fold_scalers.py).
+
+Usage:
+    python scripts/train_models.py [--models gbr,xgb,lstm,bilstm,direct] [--jobs N]
+                                   [--output-dir public/models] [--refit-scaler]
+
+The feature layout is the one used at inference time (features.py): the
+features of day t only look at the 7 values before it. Training needs
+scikit-learn, skl2onnx, xgboost/onnxmltools and tensorflow/tf2onnx for the
+models selected; none of them are needed to serve predictions.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from dataset import CACHE_DIR, DATASET_PATH, open_daily_rainfall, workbook_digest
+from features import FEATURE_NAMES, MODELS_DIR, N_FEATURES, WINDOW_SIZE, Scaler, feature_matrix
+from metrics import regression_metrics
+from onnx_models import MODEL_REGISTRY
+import fold_scalers
+import train_direct
+
+FEATURE_CACHE_VERSION = 1
+TEST_FRACTION = 0.2
+CV_FOLDS = 3
+SEQUENCE_EPOCHS = 50
+SEQUENCE_BATCH_SIZE = 32
+
+SEARCH_SPACES = {
+    'gbr': {
+        'n_estimators': [50, 100, 150],
+        'max_depth': [3, 5, 7],
+        'learning_rate': [0.01, 0.05, 0.1],
+    },
+    'xgb': {
+        'n_estimators': [100, 200, 400],
+        'max_depth': [3, 4, 6],
+        'learning_rate': [0.03, 0.05, 0.1],
+    },
+    'lstm': {
+        'units': [16, 32, 64],
+    },
+    'bilstm': {
+        'units': [16, 32],
+    },
+    'direct': {
+        'n_estimators': [100, 200],
+        'max_depth': [6, 8, 12],
+    },
+}
+DEFAULT_MODELS = ('gbr', 'xgb', 'lstm', 'bilstm', 'direct')
+
+# Packages each model needs for fitting and export
+REQUIREMENTS = {
+    'gbr': ('sklearn', 'skl2onnx'),
+    'xgb': ('xgboost', 'onnxmltools'),
+    'lstm': ('tensorflow', 'tf2onnx'),
+    'bilstm': ('tensorflow', 'tf2onnx'),
+    'direct': ('sklearn', 'skl2onnx'),
+}
+
+
+def missing_requirements(models):
+    from importlib.util import find_spec
+
+    needed = sorted({package for name in models for package in REQUIREMENTS[name]})
+    return [package for package in needed if find_spec(package) is None]
+
+
+def load_training_data(dataset_path=DATASET_PATH, cache_dir=CACHE_DIR, refresh=False):
+    """
+    Daily series plus its unscaled [M, 9] feature matrix and [M] targets.
+    Row k predicts values[k + 7] from the 7 values before it.
+    """
+    digest = workbook_digest(dataset_path, cache_dir)
+    path = os.path.join(cache_dir, f"features-v{FEATURE_CACHE_VERSION}-{digest[:16]}.npz")
+    if not refresh and os.path.exists(path):
+        with np.load(path) as cached:
+            data = {key: cached[key] for key in cached.files}
+        data['sha256'] = digest
+        return data
+
+    series = open_daily_rainfall(dataset_path, cache_dir=cache_dir)
+    dates, values = series.dates, np.asarray(series.values, dtype=np.float64)
+    data = {
+        'dates': dates,
+        'values': values.astype(np.float32),
+        'features': feature_matrix(values, dates)[:-1],
+        'targets': values[WINDOW_SIZE:].astype(np.float32),
+    }
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, **data)
+    os.replace(tmp_path, path)
+    data['sha256'] = digest
+    return data
+
+
+def fit_scaler_params(data, train_end):
+    """
+    StandardScaler constants (population std) in the scaler_params.json layout,
+    from the training rows [0, train_end) only. Row i predicts
+    values[WINDOW_SIZE + i], so the target scaler sees the values up to the
+    last training target and nothing of the holdout.
+    """
+    features = data['features'][:train_end]
+    values = data['values'][:train_end + WINDOW_SIZE]
+    scale = features.std(axis=0)
+    scale[scale == 0] = 1.0
+    target_scale = float(values.std()) or 1.0
+    return {
+        'feature_scaler': {'mean': features.mean(axis=0).tolist(), 'scale': scale.tolist()},
+        'target_scaler': {'mean': float(values.mean()), 'scale': target_scale},
+    }
+
+
+def cv_folds(n_rows, n_folds=CV_FOLDS):
+    """Expanding-window folds: (train_end, val_end) row bounds, like TimeSeriesSplit"""
+    bounds = [n_rows * k // (n_folds + 1) for k in range(n_folds + 2)]
+    return [(bounds[k], bounds[k + 1]) for k in range(1, n_folds + 1)]
+
+
+def candidates(name):
+    space = SEARCH_SPACES[name]
+    keys = sorted(space)
+    for values in itertools.product(*(space[k] for k in keys)):
+        yield dict(zip(keys, values))
+
+
+# ---------------------------------------------------------------------------
+# Worker side. Arrays are sent to each worker once through the pool
+# initializer; tasks only carry (model, params, fold).
+
+_data = {}
+
+
+def _init_worker(arrays):
+    _data.update(arrays)
+
+
+def model_arrays(name):
+    """(X, Y) for a model; Y is in mm except for sequence models (target-scaled)"""
+    kind = MODEL_REGISTRY[name]['kind']
+    if kind == 'tabular':
+        return _data['X'], _data['y']
+    if kind == 'sequence':
+        return _data['seq_X'], _data['seq_y']
+    return _data['X'][:len(_data['direct_Y'])], _data['direct_Y']
+
+
+def make_estimator(name, params, n_jobs=1):
+    if name == 'gbr':
+        from sklearn.ensemble import GradientBoostingRegressor
+        return GradientBoostingRegressor(random_state=42, **params)
+    if name == 'xgb':
+        from xgboost import XGBRegressor
+        # base_score fixed and gbtree booster as in the notebook, for ONNX export
+        return XGBRegressor(subsample=0.8, colsample_bytree=0.8, random_state=42, base_score=0.5,
+                            booster='gbtree', n_jobs=n_jobs, **params)
+    raise ValueError(f"No estimator for {name}")
+
+
+def build_sequence_model(name, units):
+    import tensorflow as tf
+
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(1)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    except RuntimeError:
+        pass
+    lstm = tf.keras.layers.LSTM(units, activation='tanh', recurrent_activation='sigmoid', unroll=True)
+    layer = tf.keras.layers.Bidirectional(lstm) if name == 'bilstm' else lstm
+    model = tf.keras.Sequential([tf.keras.Input((WINDOW_SIZE, 1)), layer, tf.keras.layers.Dense(1)])
+    model.compile(optimizer='adam', loss='mse')
+    return model
+
+
+def fit_model(name, params, X, Y):
+    if MODEL_REGISTRY[name]['kind'] == 'sequence':
+        import tensorflow as tf
+
+        model = build_sequence_model(name, **params)
+        callbacks = [
+            tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True),
+            tf.keras.callbacks.ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=5, min_lr=1e-6),
+        ]
+        model.fit(X, Y, validation_split=0.2, epochs=SEQUENCE_EPOCHS, batch_size=SEQUENCE_BATCH_SIZE,
+                  callbacks=callbacks, verbose=0)
+        return model
+    if name == 'direct':
+        return train_direct.fit_direct_model(X, Y, params['n_estimators'], params['max_depth'], n_jobs=1)
+    model = make_estimator(name, params)
+    model.fit(X, Y)
+    return model
+
+
+def predict_mm(name, model, X):
+    """Predictions in mm, whatever space the model works in"""
+    if MODEL_REGISTRY[name]['kind'] == 'sequence':
+        scaled = model.predict(X, verbose=0).reshape(-1)
+        return scaled * _data['target_scale'] + _data['target_mean']
+    return np.asarray(model.predict(X))
+
+
+def truth_mm(name, Y):
+    if MODEL_REGISTRY[name]['kind'] == 'sequence':
+        return Y * _data['target_scale'] + _data['target_mean']
+    return Y
+
+
+def holdout_metrics(y_true, y_pred):
+    """Scalar MAE, RMSE and R² for the report; the direct model's lead times are pooled"""
+    return regression_metrics(np.ravel(y_true), np.ravel(y_pred))
+
+
+def _score_candidate(name, params, fold):
+    """Worker: fit on rows [0, train_end), score on [train_end, val_end)"""
+    start = time.perf_counter()
+    X, Y = model_arrays(name)
+    train_end, val_end = fold
+    val_end = min(val_end, len(X))
+    # Direct targets reach horizon-1 days past their row; keep them out of validation
+    fit_end = train_direct.train_rows(Y, train_end)
+    try:
+        model = fit_model(name, params, X[:fit_end], Y[:fit_end])
+        metrics = holdout_metrics(truth_mm(name, Y[train_end:val_end]),
+                                  predict_mm(name, model, X[train_end:val_end]))
+    except Exception as e:
+        return {'error': str(e), 'seconds': time.perf_counter() - start}
+    metrics['seconds'] = time.perf_counter() - start
+    return metrics
+
+
+def export_onnx(name, model):
+    """Serialized ONNX model with an 'input' tensor, as the browser and predict_infer.py expect"""
+    if name == 'gbr':
+        from skl2onnx import convert_sklearn
+        from skl2onnx.common.data_types import FloatTensorType
+        onnx_model = convert_sklearn(model, initial_types=[('input', FloatTensorType([None, N_FEATURES]))])
+        return onnx_model.SerializeToString()
+    if name == 'xgb':
+        from onnxmltools import convert_xgboost
+        from onnxmltools.convert.common.data_types import FloatTensorType
+        # opset 12 keeps the model loadable by ONNX Runtime Web
+        onnx_model = convert_xgboost(model, initial_types=[('input', FloatTensorType([None, N_FEATURES]))],
+                                     target_opset=12)
+        return onnx_model.SerializeToString()
+    if name == 'direct':
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            path = train_direct.export_onnx(model, os.path.join(tmp, 'model.onnx'), model.n_outputs_)
+            with open(path, 'rb') as f:
+                return f.read()
+
+    import tensorflow as tf
+    import tf2onnx
+
+    signature = [tf.TensorSpec((None, WINDOW_SIZE, 1), tf.float32, name='input')]
+    onnx_model, _ = tf2onnx.convert.from_function(tf.function(lambda x: model(x)), input_signature=signature)
+    return onnx_model.SerializeToString()
+
+
+def _fit_and_export(name, params, train_end):
+    """Worker: refit on the whole training split, score the test split, export"""
+    import onnxruntime as ort
+
+    start = time.perf_counter()
+    X, Y = model_arrays(name)
+    fit_end = train_direct.train_rows(Y, train_end)
+    model = fit_model(name, params, X[:fit_end], Y[:fit_end])
+    train_seconds = time.perf_counter() - start
+
+    X_test = X[train_end:]
+    test_pred = predict_mm(name, model, X_test)
+    payload = export_onnx(name, model)
+
+    session = ort.InferenceSession(payload, providers=['CPUExecutionProvider'])
+    onnx_pred = session.run(None, {session.get_inputs()[0].name: X_test.astype(np.float32)})[0]
+    if MODEL_REGISTRY[name]['kind'] == 'sequence':
+        onnx_pred = onnx_pred.reshape(-1) * _data['target_scale'] + _data['target_mean']
+    onnx_pred = np.asarray(onnx_pred).reshape(np.shape(test_pred))
+
+    return {
+        'onnx': payload,
+        'test': holdout_metrics(truth_mm(name, Y[train_end:]), test_pred),
+        'onnx_max_abs_diff': float(np.abs(onnx_pred - test_pred).max()),
+        'train_seconds': train_seconds,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Driver
+
+def prepare_arrays(data, scaler_params, horizon):
+    scaler = Scaler(scaler_params)
+    values = data['values']
+    seq = sliding_window_view(scaler.transform_target(values), WINDOW_SIZE)[:-1]
+    _, direct_Y = train_direct.direct_training_set(values, data['dates'], scaler, horizon)
+    return {
+        'X': scaler.transform_features(data['features']).astype(np.float32),
+        'y': data['targets'],
+        'seq_X': np.ascontiguousarray(seq[:, :, np.newaxis], dtype=np.float32),
+        'seq_y': scaler.transform_target(data['targets']).astype(np.float32),
+        'direct_Y': direct_Y,
+        'target_mean': float(scaler.target_mean),
+        'target_scale': float(scaler.target_scale),
+    }
+
+
+def search(executor, models, train_end):
+    """Mean validation RMSE of every candidate; returns {model: [candidate results]}"""
+    folds = cv_folds(train_end)
+    jobs = []
+    for name in models:
+        # Sequence models are slow to fit: score them on the last fold only
+        model_folds = folds[-1:] if MODEL_REGISTRY[name]['kind'] == 'sequence' else folds
+        for params in candidates(name):
+            for fold in model_folds:
+                jobs.append((name, params, fold))
+
+    futures = [executor.submit(_score_candidate, *job) for job in jobs]
+    results = {}
+    for (name, params, fold), future in zip(jobs, futures):
+        result = future.result()
+        entries = results.setdefault(name, [])
+        entry = next((e for e in entries if e['params'] == params), None)
+        if entry is None:
+            entry = {'params': params, 'folds': []}
+            entries.append(entry)
+        entry['folds'].append(dict(result, fold=list(fold)))
+
+    for entries in results.values():
+        for entry in entries:
+            scores = [f['rmse'] for f in entry['folds'] if 'rmse' in f]
+            entry['cv_rmse'] = float(np.mean(scores)) if len(scores) == len(entry['folds']) else None
+    return results
+
+
+def best_candidate(entries):
+    scored = [e for e in entries if e['cv_rmse'] is not None]
+    if not scored:
+        raise RuntimeError("Every candidate failed: " + entries[0]['folds'][0].get('error', 'unknown error'))
+    return min(scored, key=lambda e: e['cv_rmse'])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train the rainfall models and export them to ONNX")
+    parser.add_argument('--dataset', default=DATASET_PATH)
+    parser.add_argument('--output-dir', default=MODELS_DIR)
+    parser.add_argument('--models', default=','.join(DEFAULT_MODELS),
+                        help="Comma-separated subset of " + ', '.join(DEFAULT_MODELS))
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--test-fraction', type=float, default=TEST_FRACTION)
+    parser.add_argument('--horizon', type=int, default=train_direct.DIRECT_HORIZON,
+                        help="Days predicted per call by the direct model")
+    parser.add_argument('--refit-scaler', action='store_true',
+                        help="Recompute scaler_params.json (every model must then be retrained)")
+    parser.add_argument('--refresh-cache', action='store_true', help="Rebuild the cached feature matrix")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    models = [m.strip() for m in args.models.split(',') if m.strip()]
+    unknown = [m for m in models if m not in SEARCH_SPACES]
+    if unknown:
+        raise SystemExit(f"Unknown models: {', '.join(unknown)}")
+    missing = missing_requirements(models)
+    if missing:
+        raise SystemExit(f"Training {', '.join(models)} needs these packages: {', '.join(missing)}")
+
+    started = time.perf_counter()
+    data = load_training_data(args.dataset, refresh=args.refresh_cache)
+    train_end = int(len(data['features']) * (1 - args.test_fraction))
+
+    scaler_path = os.path.join(args.output_dir, 'scaler_params.json')
+    if args.refit_scaler or not os.path.exists(scaler_path):
+        if set(models) != set(DEFAULT_MODELS):
+            raise SystemExit("A new scaler invalidates every model; train all of them with --refit-scaler")
+        scaler_params = fit_scaler_params(data, train_end)
+    else:
+        with open(scaler_path, 'r') as f:
+            scaler_params = json.load(f)
+
+    arrays = prepare_arrays(data, scaler_params, args.horizon)
+    # One core per task, parallelism comes from the pool. Spawned workers
+    # read these at start-up, before numpy/TensorFlow are imported.
+    os.environ.setdefault('OMP_NUM_THREADS', '1')
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+    # spawn: TensorFlow does not survive fork
+    executor = ProcessPoolExecutor(max_workers=args.jobs, mp_context=get_context('spawn'),
+                                   initializer=_init_worker, initargs=(arrays,))
+    with executor:
+        search_start = time.perf_counter()
+        results = search(executor, models, train_end)
+        search_seconds = time.perf_counter() - search_start
+
+        best = {name: best_candidate(results[name]) for name in models}
+        futures = {name: executor.submit(_fit_and_export, name, best[name]['params'], train_end)
+                   for name in models}
+        fitted = {name: future.result() for name, future in futures.items()}
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    report = {
+        'generated': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'dataset': {'path': os.path.relpath(args.dataset), 'sha256': data['sha256'],
+                    'rows': int(len(data['values'])), 'train_rows': train_end,
+                    'test_rows': int(len(data['features']) - train_end)},
+        'features': FEATURE_NAMES,
+        'search': {'jobs': args.jobs, 'seconds': search_seconds,
+                   'candidates': sum(len(results[name]) for name in models)},
+        'models': {},
+    }
+    for name in models:
+        filename = MODEL_REGISTRY[name]['file']
+        model_bytes = fitted[name]['onnx']
+        if name in fold_scalers.FOLDABLE_MODELS:
+            model_bytes = fold_scalers.fold_bytes(name, model_bytes, scaler_params)
+        with open(os.path.join(args.output_dir, filename), 'wb') as f:
+            f.write(model_bytes)
+        report['models'][name] = {
+            'file': filename,
+            'params': best[name]['params'],
+            'cv_rmse': best[name]['cv_rmse'],
+            'test': fitted[name]['test'],
+            'onnx_max_abs_diff': fitted[name]['onnx_max_abs_diff'],
+            'train_seconds': fitted[name]['train_seconds'],
+            'candidates': results[name],
+        }
+
+    with open(scaler_path, 'w') as f:
+        json.dump(scaler_params, f, indent=2)
+
+    # Keep metrics of models that were not retrained this time
+    metrics_path = os.path.join(args.output_dir, 'model_metrics.json')
+    if os.path.exists(metrics_path):
+        with open(metrics_path, 'r') as f:
+            previous = json.load(f).get('models', {})
+        for name, entry in previous.items():
+            report['models'].setdefault(name, entry)
+    report['seconds'] = time.perf_counter() - started
+    with open(metrics_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    summary = {name: dict(report['models'][name]['test'], params=report['models'][name]['params'])
+               for name in models}
+    json.dump(summary, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
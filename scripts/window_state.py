@@ -0,0 +1,117 @@
+"""
+Constant-time rolling window state for the recursive horizon loop.
+
+Holds the last 7 values of N series in a ring buffer and keeps the
+statistics the tabular features need up to date on every push:
+- running sums for roll_mean_3 / roll_mean_7
+- sliding-window Welford mean/M2 for roll_std_7
+- a monotonic deque per series for roll_max_7
+
+Each push costs O(1) per series no matter how much history was supplied,
+because only the trailing window is ever stored.
+"""
+
+import numpy as np
+
+from features import WINDOW_SIZE, assemble_features
+
+SHORT_WINDOW = 3
+
+
+class WindowState:
+    """Rolling 7-value window for a batch of N series"""
+
+    def __init__(self, windows):
+        windows = np.asarray(windows, dtype=np.float64)
+        if windows.ndim != 2 or windows.shape[1] != WINDOW_SIZE:
+            raise ValueError(f"Expected initial windows of shape [N, {WINDOW_SIZE}], got {windows.shape}")
+
+        n_series = windows.shape[0]
+        self._rows = np.arange(n_series)
+        self._buffer = windows.copy()
+        # Slot holding the oldest value, i.e. where the next push is written
+        self._pos = 0
+        # Number of values pushed so far (initial window counts as 0..6)
+        self._t = WINDOW_SIZE
+
+        self._sum_short = windows[:, -SHORT_WINDOW:].sum(axis=1)
+        self._mean = windows.mean(axis=1)
+        self._m2 = ((windows - self._mean[:, np.newaxis]) ** 2).sum(axis=1)
+
+        # Monotonic (non-increasing) deque of (value, time) per series
+        self._dq_val = np.zeros((n_series, WINDOW_SIZE), dtype=np.float64)
+        self._dq_time = np.zeros((n_series, WINDOW_SIZE), dtype=np.int64)
+        self._dq_head = np.zeros(n_series, dtype=np.int64)
+        self._dq_len = np.zeros(n_series, dtype=np.int64)
+        for t in range(WINDOW_SIZE):
+            self._deque_push(windows[:, t], t)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _slot(self, lag):
+        """Buffer slot of the value `lag` steps back (lag=1 is the newest)"""
+        return (self._pos - lag) % WINDOW_SIZE
+
+    def _deque_push(self, values, t):
+        # Times are consecutive, so at most one front entry expires per push. It
+        # goes first: a full deque (a strictly falling window) has no free slot.
+        expired = (self._dq_len > 0) & (self._dq_time[self._rows, self._dq_head] <= t - WINDOW_SIZE)
+        self._dq_head = np.where(expired, (self._dq_head + 1) % WINDOW_SIZE, self._dq_head)
+        self._dq_len -= expired
+
+        # Drop smaller-or-equal values from the back; at most WINDOW_SIZE rounds
+        popping = self._dq_len > 0
+        for _ in range(WINDOW_SIZE):
+            if not popping.any():
+                break
+            back = (self._dq_head + self._dq_len - 1) % WINDOW_SIZE
+            popping &= (self._dq_len > 0) & (self._dq_val[self._rows, back] <= values)
+            self._dq_len -= popping
+
+        slot = (self._dq_head + self._dq_len) % WINDOW_SIZE
+        self._dq_val[self._rows, slot] = values
+        self._dq_time[self._rows, slot] = t
+        self._dq_len += 1
+
+    def push(self, values):
+        """Append one new value per series, dropping the oldest"""
+        values = np.asarray(values, dtype=np.float64)
+        oldest = self._buffer[:, self._pos]
+        leaving_short = self._buffer[:, self._slot(SHORT_WINDOW)]
+
+        self._sum_short += values - leaving_short
+
+        # Welford update for replacing `oldest` with `values` in a fixed-size window
+        old_mean = self._mean
+        self._mean = old_mean + (values - oldest) / WINDOW_SIZE
+        self._m2 += (values - oldest) * (values - self._mean + oldest - old_mean)
+
+        self._buffer[:, self._pos] = values
+        self._pos = (self._pos + 1) % WINDOW_SIZE
+        self._deque_push(values, self._t)
+        self._t += 1
+
+    def window(self):
+        """[N, 7] values ordered oldest to newest"""
+        order = (self._pos + np.arange(WINDOW_SIZE)) % WINDOW_SIZE
+        return self._buffer[:, order]
+
+    def rolling_max(self):
+        return self._dq_val[self._rows, self._dq_head]
+
+    def rolling_std(self):
+        """Sample std (ddof=1) of the 7-value window"""
+        return np.sqrt(np.maximum(self._m2, 0.0) / (WINDOW_SIZE - 1))
+
+    def tabular_features(self, target_dates, scaler=None):
+        """[N, 9] feature rows for the next step, same layout as features.window_features"""
+        return assemble_features([
+            self._buffer[:, self._slot(1)],
+            self._buffer[:, self._slot(3)],
+            self._buffer[:, self._pos],
+            self._sum_short / SHORT_WINDOW,
+            self._mean,
+            self.rolling_max(),
+            self.rolling_std(),
+        ], target_dates, scaler)
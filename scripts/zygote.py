@@ -0,0 +1,141 @@
+"""
+Pre-forking launcher for predict_infer.py workers.
+
+Spawning `predict_infer.py --serve` costs an interpreter start, the numpy/
+onnxruntime imports and one session per model before the first answer. The
+zygote pays that once: it imports everything, loads the models of --methods
+and runs each once (predict_infer.startup_report, printed on start), then
+listens on a Unix socket. Every connection is handed to a forked child that
+already has the warm state (copy-on-write) and speaks the --serve protocol,
+newline-delimited JSON with "id" echo, on that connection until it closes. Each
+worker keeps its own request metrics ({"command": "metrics"} on its connection).
+With --binary, connections speak the length-prefixed frames of framing.py
+(`predict_infer.py --serve --binary`) instead.
+
+Sessions are created with one intra-op thread so they own no thread pool,
+since threads do not survive fork(). Parallelism comes from the workers.
+
+Usage:
+    python scripts/zygote.py [--socket PATH] [--methods gbr,xgb,lstm,bilstm,hybrid] [--max-workers N] [--binary]
+"""
+
+import os
+
+# Must be set before onnx_models/numpy are imported (see module docstring)
+os.environ['PREDICT_ORT_THREADS'] = '1'
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+os.environ.setdefault('OPENBLAS_NUM_THREADS', '1')
+
+import argparse
+import json
+import signal
+import socket
+import sys
+import tempfile
+
+import framing
+import predict_infer
+
+DEFAULT_SOCKET = os.environ.get('PREDICT_ZYGOTE_SOCKET', os.path.join(tempfile.gettempdir(), 'predict-zygote.sock'))
+DEFAULT_METHODS = ('gbr', 'xgb', 'lstm', 'bilstm', 'hybrid')
+DEFAULT_MAX_WORKERS = 32
+
+
+def serve_connection(conn, binary=False):
+    """Child: predict_infer's --serve loop over one connection"""
+    conn.settimeout(None)
+    if binary:
+        with conn, conn.makefile('rb') as rfile, conn.makefile('wb') as wfile:
+            predict_infer.serve_binary(rfile, wfile)
+        return
+    with conn, conn.makefile('r', encoding='utf-8') as rfile, conn.makefile('w', encoding='utf-8') as wfile:
+        predict_infer.serve(rfile, wfile)
+
+
+def reap(children):
+    for pid in list(children):
+        try:
+            done, _ = os.waitpid(pid, os.WNOHANG)
+        except ChildProcessError:
+            done = pid
+        if done:
+            children.discard(pid)
+
+
+def run(socket_path=DEFAULT_SOCKET, methods=DEFAULT_METHODS, max_workers=DEFAULT_MAX_WORKERS, binary=False):
+    report = predict_infer.startup_report(methods)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(128)
+    # Wake up regularly to reap finished workers and notice shutdown
+    listener.settimeout(1.0)
+
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    sys.stdout.write(json.dumps({'socket': socket_path, 'pid': os.getpid(), 'startup': report}) + '\n')
+    sys.stdout.flush()
+
+    children = set()
+    try:
+        while not stopping:
+            reap(children)
+            try:
+                conn, _ = listener.accept()
+            except (socket.timeout, InterruptedError):
+                continue
+            if len(children) >= max_workers:
+                busy = {'error': 'Too many workers', 'id': None}
+                with conn:
+                    conn.sendall(framing.encode(busy) if binary else (json.dumps(busy) + '\n').encode('utf-8'))
+                continue
+
+            pid = os.fork()
+            if pid == 0:
+                status = 0
+                try:
+                    listener.close()
+                    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                    signal.signal(signal.SIGINT, signal.SIG_DFL)
+                    serve_connection(conn, binary)
+                except Exception:
+                    status = 1
+                finally:
+                    os._exit(status)
+            children.add(pid)
+            conn.close()
+    finally:
+        listener.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-forking predict_infer.py worker launcher")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET)
+    parser.add_argument('--methods', default=','.join(DEFAULT_METHODS), help="Methods to load before forking")
+    parser.add_argument('--max-workers', type=int, default=DEFAULT_MAX_WORKERS)
+    parser.add_argument('--binary', action='store_true', help="Serve framing.py binary frames instead of JSON lines")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    methods = [m.strip() for m in args.methods.split(',') if m.strip()]
+    run(args.socket, methods, args.max_workers, args.binary)
+
+
+if __name__ == "__main__":
+    main()
@@ -35,7 +35,11 @@ interface ScalerParams {
     };
 }
 
-// Hardcoded scaler parameters from training
+// Input name of models with the scaler folded into the graph
+// (scripts/fold_scalers.py): they take unscaled values and return clamped mm
+const FOLDED_INPUT = 'raw_input';
+
+// Hardcoded scaler parameters from training (only used for unfolded models)
 const SCALER_PARAMS: ScalerParams = {
     feature_scaler: {
         mean: [
@@ -271,11 +275,11 @@ async function runTabularInference(
         throw new Error(`Tabular model expects 9 features, got ${features.length}`);
     }
 
-    // Apply feature scaling
-    const scaledFeatures = scaleFeatures(features);
-    const inputTensor = new ort.Tensor('float32', new Float32Array(scaledFeatures), [1, 9]);
-
+    // Apply feature scaling unless the model does it itself
     const inputName = session.inputNames[0];
+    const modelFeatures = inputName === FOLDED_INPUT ? features : scaleFeatures(features);
+    const inputTensor = new ort.Tensor('float32', new Float32Array(modelFeatures), [1, 9]);
+
     const feeds: Record<string, ort.Tensor> = { [inputName]: inputTensor };
 
     const results = await session.run(feeds);
@@ -293,28 +297,32 @@ async function runTabularInference(
  */
 async function runSequenceInference(
     modelType: 'lstm' | 'bilstm',
-    features: number[]  // Already scaled
+    values: number[]  // Last 7 values in mm
 ): Promise<number> {
     const session = await loadModel(modelType);
 
-    if (features.length !== 7) {
-        throw new Error(`Sequence model expects 7 values, got ${features.length}`);
+    if (values.length !== 7) {
+        throw new Error(`Sequence model expects 7 values, got ${values.length}`);
     }
 
-    const inputTensor = new ort.Tensor('float32', new Float32Array(features), [1, 7, 1]);
-
     const inputName = session.inputNames[0];
+    const folded = inputName === FOLDED_INPUT;
+    const modelValues = folded ? values : values.map(v => scaleTarget(v));
+    const inputTensor = new ort.Tensor('float32', new Float32Array(modelValues), [1, 7, 1]);
+
     const feeds: Record<string, ort.Tensor> = { [inputName]: inputTensor };
 
     const results = await session.run(feeds);
 
     const outputName = session.outputNames[0];
     const output = results[outputName];
-    const scaledPrediction = (output.data as Float32Array)[0];
+    const prediction = (output.data as Float32Array)[0];
+    if (folded) {
+        return prediction;
+    }
 
     // Apply inverse transform to get original scale
-    const prediction = inverseScaleTarget(scaledPrediction);
-    return Math.max(0, prediction);
+    return Math.max(0, inverseScaleTarget(prediction));
 }
 
 /**
@@ -341,12 +349,12 @@ export async function runInference(
  */
 export async function runHybridInference(
     tabularFeatures: number[],   // 9 features for XGB
-    sequenceFeatures: number[],  // 7 scaled values for LSTM
+    sequenceValues: number[],    // Last 7 values in mm for LSTM
     xgbWeight: number = 0.6      // Weight for XGBoost (default 60%)
 ): Promise<number> {
     // Run sequentially to avoid "Session already started" error
     const xgbPred = await runTabularInference('xgb', tabularFeatures);
-    const lstmPred = await runSequenceInference('lstm', sequenceFeatures);
+    const lstmPred = await runSequenceInference('lstm', sequenceValues);
 
     // Weighted average
     const hybridPred = xgbWeight * xgbPred + (1 - xgbWeight) * lstmPred;
@@ -390,12 +398,10 @@ export async function forecast(
             const features = prepareTabularFeatures(workingValues, targetDate);
             prediction = await runTabularInference(modelType, features);
         } else if (modelType === 'lstm' || modelType === 'bilstm') {
-            const features = prepareLSTMFeatures(workingValues);
-            prediction = await runSequenceInference(modelType, features);
+            prediction = await runSequenceInference(modelType, workingValues.slice(-7));
         } else if (modelType === 'hybrid') {
             const tabularFeatures = prepareTabularFeatures(workingValues, targetDate);
-            const sequenceFeatures = prepareLSTMFeatures(workingValues);
-            prediction = await runHybridInference(tabularFeatures, sequenceFeatures);
+            prediction = await runHybridInference(tabularFeatures, workingValues.slice(-7));
         } else {
             throw new Error(`Unknown model type: ${modelType}`);
         }
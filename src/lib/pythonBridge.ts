@@ -1,37 +1,140 @@
 import { spawn } from 'child_process';
+import net from 'net';
 import path from 'path';
 
 interface PythonScriptOptions {
     scriptPath: string;
     args?: string[];
     pythonPath?: string; // Optional: specific python executable
+    socketPath?: string; // Optional: scripts/zygote.py socket to get a pre-forked worker from
+    binary?: boolean; // Optional: length-prefixed binary frames (--binary, zygote.py --binary) instead of JSON
+}
+
+interface WorkerConnection {
+    write(data: string | Buffer): void;
+    end(): void;
+}
+
+interface ArraySpec {
+    dtype: 'f4' | 'f8';
+    offset: number;
+    shape: number[];
+}
+
+const FRAME_PREFIX_BYTES = 8;
+const FRAME_ALIGNMENT = 8;
+
+/**
+ * Encode a payload as a scripts/framing.py frame: uint32 LE header and body
+ * lengths, the JSON header, then the body. Float32Array/Float64Array values
+ * are moved to the body as raw bytes (little-endian, as on every platform
+ * Node runs on) and replaced in the header by {"$array": {dtype, offset, shape}}.
+ */
+export function encodeFrame(payload: unknown): Buffer {
+    const chunks: Buffer[] = [];
+    let size = 0;
+    const header = Buffer.from(JSON.stringify(payload, (_key, value) => {
+        if (!(value instanceof Float32Array || value instanceof Float64Array)) return value;
+        const padding = (FRAME_ALIGNMENT - (size % FRAME_ALIGNMENT)) % FRAME_ALIGNMENT;
+        if (padding) chunks.push(Buffer.alloc(padding));
+        const spec: ArraySpec = {
+            dtype: value instanceof Float32Array ? 'f4' : 'f8',
+            offset: size + padding,
+            shape: [value.length],
+        };
+        chunks.push(Buffer.from(value.buffer, value.byteOffset, value.byteLength));
+        size += padding + value.byteLength;
+        return { $array: spec };
+    }), 'utf8');
+
+    const prefix = Buffer.alloc(FRAME_PREFIX_BYTES);
+    prefix.writeUInt32LE(header.length, 0);
+    prefix.writeUInt32LE(size, 4);
+    return Buffer.concat([prefix, header, ...chunks]);
+}
+
+/**
+ * Decode a frame's header, turning {"$array": ...} entries back into flat
+ * typed arrays over the body (copied only when the body is not aligned).
+ */
+export function decodeFrame<T>(header: Buffer, body: Buffer): T {
+    return JSON.parse(header.toString('utf8'), (_key, value) => {
+        const spec: ArraySpec | undefined = value && typeof value === 'object' ? value.$array : undefined;
+        if (!spec) return value;
+        const ArrayType = spec.dtype === 'f8' ? Float64Array : Float32Array;
+        const length = spec.shape.reduce((a, b) => a * b, 1);
+        const start = body.byteOffset + spec.offset;
+        if (start % ArrayType.BYTES_PER_ELEMENT === 0) {
+            return new ArrayType(body.buffer, start, length);
+        }
+        const bytes = new Uint8Array(body.subarray(spec.offset, spec.offset + length * ArrayType.BYTES_PER_ELEMENT));
+        return new ArrayType(bytes.buffer, 0, length);
+    }) as T;
+}
+
+/**
+ * Reassembles frames from stream chunks. Chunks are only concatenated once
+ * a whole frame has arrived.
+ */
+class FrameReader {
+    private chunks: Buffer[] = [];
+    private length = 0;
+
+    push(chunk: Buffer): Array<[Buffer, Buffer]> {
+        this.chunks.push(chunk);
+        this.length += chunk.length;
+        const frames: Array<[Buffer, Buffer]> = [];
+        while (this.length >= FRAME_PREFIX_BYTES) {
+            const prefix = Buffer.concat(this.chunks, FRAME_PREFIX_BYTES);
+            const headerLength = prefix.readUInt32LE(0);
+            const total = FRAME_PREFIX_BYTES + headerLength + prefix.readUInt32LE(4);
+            if (this.length < total) break;
+
+            const data = this.chunks.length === 1 ? this.chunks[0] : Buffer.concat(this.chunks);
+            frames.push([
+                data.subarray(FRAME_PREFIX_BYTES, FRAME_PREFIX_BYTES + headerLength),
+                data.subarray(FRAME_PREFIX_BYTES + headerLength, total),
+            ]);
+            const rest = data.subarray(total);
+            this.chunks = rest.length ? [rest] : [];
+            this.length = rest.length;
+        }
+        return frames;
+    }
 }
 
 /**
  * Executes a Python script and returns the result parsed from JSON stdout.
  * The script is expected to print valid JSON to stdout as its last output.
+ * With `binary` the script is run with --binary and input and output are
+ * single frames (see encodeFrame).
  */
 export async function runPythonScript<T>(options: PythonScriptOptions, inputData?: any): Promise<T> {
     return new Promise((resolve, reject) => {
-        const { scriptPath, args = [], pythonPath = 'python' } = options;
+        const { scriptPath, args = [], pythonPath = 'python', binary = false } = options;
 
         // Resolve absolute path to script
         const absoluteScriptPath = path.resolve(process.cwd(), scriptPath);
 
-        const processArgs = [absoluteScriptPath, ...args];
+        const processArgs = [absoluteScriptPath, ...(binary ? ['--binary'] : []), ...args];
         const pyProcess = spawn(pythonPath, processArgs);
 
         let stdoutData = '';
+        const stdoutChunks: Buffer[] = [];
         let stderrData = '';
 
         // Send input data via stdin if provided
         if (inputData) {
-            pyProcess.stdin.write(JSON.stringify(inputData));
+            pyProcess.stdin.write(binary ? encodeFrame(inputData) : JSON.stringify(inputData));
             pyProcess.stdin.end();
         }
 
-        pyProcess.stdout.on('data', (data) => {
-            stdoutData += data.toString();
+        pyProcess.stdout.on('data', (data: Buffer) => {
+            if (binary) {
+                stdoutChunks.push(data);
+            } else {
+                stdoutData += data.toString();
+            }
         });
 
         pyProcess.stderr.on('data', (data) => {
@@ -44,6 +147,18 @@ export async function runPythonScript<T>(options: PythonScriptOptions, inputData
                 return reject(new Error(`Python script exited with code ${code}. Error: ${stderrData}`));
             }
 
+            if (binary) {
+                const [frame] = new FrameReader().push(Buffer.concat(stdoutChunks));
+                if (!frame) {
+                    return reject(new Error('Python script did not write a complete frame'));
+                }
+                try {
+                    return resolve(decodeFrame<T>(...frame));
+                } catch (err) {
+                    return reject(new Error(`Failed to decode Python output: ${err instanceof Error ? err.message : String(err)}`));
+                }
+            }
+
             try {
                 // Find the last line that looks like JSON in case of debug prints
                 const lines = stdoutData.trim().split('\n');
@@ -61,3 +176,173 @@ export async function runPythonScript<T>(options: PythonScriptOptions, inputData
         });
     });
 }
+
+interface PendingRequest {
+    resolve: (value: any) => void;
+    reject: (reason: Error) => void;
+}
+
+/**
+ * Long-lived Python worker speaking newline-delimited JSON.
+ * The script is started once with `--serve` and reused for every request,
+ * so interpreter startup and model loading are paid only once. With
+ * `socketPath` (or PREDICT_ZYGOTE_SOCKET) the worker is instead forked,
+ * already warm, by a running scripts/zygote.py. With `binary` requests and
+ * responses are frames, so typed arrays in either direction skip JSON text.
+ */
+export class PythonWorker {
+    private pyProcess: WorkerConnection | null = null;
+    private pending: Map<number, PendingRequest> = new Map();
+    private buffer = '';
+    private frames = new FrameReader();
+    private nextId = 1;
+
+    constructor(private options: PythonScriptOptions) {}
+
+    private onData(data: Buffer) {
+        if (this.options.binary) {
+            for (const [header, body] of this.frames.push(data)) {
+                let message: any;
+                try {
+                    message = decodeFrame(header, body);
+                } catch {
+                    console.error('Failed to decode Python worker frame');
+                    continue;
+                }
+                this.handleMessage(message);
+            }
+            return;
+        }
+
+        this.buffer += data.toString();
+        let newline = this.buffer.indexOf('\n');
+        while (newline >= 0) {
+            const line = this.buffer.slice(0, newline).trim();
+            this.buffer = this.buffer.slice(newline + 1);
+            if (line) this.handleLine(line);
+            newline = this.buffer.indexOf('\n');
+        }
+    }
+
+    private connect(socketPath: string): WorkerConnection {
+        const socket = net.createConnection(socketPath);
+        const connection: WorkerConnection = {
+            write: (data) => socket.write(data),
+            end: () => socket.end(),
+        };
+
+        socket.on('data', (data) => this.onData(data));
+
+        socket.on('close', () => {
+            this.failAll(new Error('Python worker connection closed'));
+            if (this.pyProcess === connection) {
+                this.pyProcess = null;
+                this.buffer = '';
+                this.frames = new FrameReader();
+            }
+        });
+
+        socket.on('error', (err) => {
+            this.failAll(new Error(`Failed to reach Python zygote: ${err.message}`));
+            if (this.pyProcess === connection) this.pyProcess = null;
+        });
+
+        this.pyProcess = connection;
+        return connection;
+    }
+
+    private start(): WorkerConnection {
+        const socketPath = this.options.socketPath ?? process.env.PREDICT_ZYGOTE_SOCKET;
+        if (socketPath) {
+            return this.connect(socketPath);
+        }
+
+        const { scriptPath, args = [], pythonPath = 'python', binary = false } = this.options;
+        const absoluteScriptPath = path.resolve(process.cwd(), scriptPath);
+        const pyProcess = spawn(pythonPath, [absoluteScriptPath, '--serve', ...(binary ? ['--binary'] : []), ...args]);
+        const connection: WorkerConnection = {
+            write: (data) => pyProcess.stdin.write(data),
+            end: () => pyProcess.stdin.end(),
+        };
+
+        pyProcess.stdout.on('data', (data) => this.onData(data));
+
+        pyProcess.stderr.on('data', (data) => {
+            console.error('Python worker stderr:', data.toString());
+        });
+
+        pyProcess.on('close', (code) => {
+            this.failAll(new Error(`Python worker exited with code ${code}`));
+            if (this.pyProcess === connection) {
+                this.pyProcess = null;
+                this.buffer = '';
+                this.frames = new FrameReader();
+            }
+        });
+
+        pyProcess.on('error', (err) => {
+            this.failAll(new Error(`Failed to spawn Python worker: ${err.message}`));
+            if (this.pyProcess === connection) this.pyProcess = null;
+        });
+
+        this.pyProcess = connection;
+        return connection;
+    }
+
+    private handleLine(line: string) {
+        let message: any;
+        try {
+            message = JSON.parse(line);
+        } catch {
+            console.error('Failed to parse Python worker output:', line);
+            return;
+        }
+        this.handleMessage(message);
+    }
+
+    private handleMessage(message: any) {
+        const request = this.pending.get(message.id);
+        if (!request) return;
+        this.pending.delete(message.id);
+
+        if (message.error) {
+            request.reject(new Error(message.error));
+        } else {
+            delete message.id;
+            request.resolve(message);
+        }
+    }
+
+    private failAll(err: Error) {
+        for (const request of this.pending.values()) {
+            request.reject(err);
+        }
+        this.pending.clear();
+    }
+
+    /**
+     * Send one request to the worker, starting it on first use. In binary
+     * mode Float32Array/Float64Array inputs are sent as raw bytes and
+     * predictions come back as Float32Array (Float64Array with dtype: 'f8').
+     */
+    request<T>(inputData: Record<string, any>): Promise<T> {
+        const pyProcess = this.pyProcess ?? this.start();
+        const id = this.nextId++;
+        const payload = { ...inputData, id };
+
+        return new Promise<T>((resolve, reject) => {
+            this.pending.set(id, { resolve, reject });
+            pyProcess.write(this.options.binary ? encodeFrame(payload) : JSON.stringify(payload) + '\n');
+        });
+    }
+
+    /**
+     * Close stdin (or the zygote connection) so the worker drains outstanding requests and exits.
+     */
+    stop() {
+        if (this.pyProcess) {
+            this.pyProcess.end();
+            this.pyProcess = null;
+        }
+    }
+}
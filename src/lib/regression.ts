@@ -8,29 +8,30 @@ function mean(arr: number[]): number {
 }
 
 /**
- * Calculate R² (coefficient of determination)
+ * R², MAE and RMSE of predictions in a single pass over the data
+ * (Welford's running mean and sum of squares for R²'s total variance)
  */
-function calculateR2(actual: number[], predicted: number[]): number {
-    const actualMean = mean(actual);
-    const ssTotal = actual.reduce((sum, val) => sum + Math.pow(val - actualMean, 2), 0);
-    const ssResidual = actual.reduce((sum, val, i) => sum + Math.pow(val - predicted[i], 2), 0);
-    return 1 - (ssResidual / ssTotal);
-}
-
-/**
- * Calculate Mean Absolute Error
- */
-function calculateMAE(actual: number[], predicted: number[]): number {
-    const sum = actual.reduce((acc, val, i) => acc + Math.abs(val - predicted[i]), 0);
-    return sum / actual.length;
-}
+function calculateMetrics(actual: number[], predicted: number[]): Pick<RegressionResult, 'r2' | 'mae' | 'rmse'> {
+    let actualMean = 0;
+    let ssTotal = 0;
+    let ssResidual = 0;
+    let absError = 0;
+
+    for (let i = 0; i < actual.length; i++) {
+        const delta = actual[i] - actualMean;
+        actualMean += delta / (i + 1);
+        ssTotal += delta * (actual[i] - actualMean);
+
+        const error = actual[i] - predicted[i];
+        ssResidual += error * error;
+        absError += Math.abs(error);
+    }
 
-/**
- * Calculate Root Mean Square Error
- */
-function calculateRMSE(actual: number[], predicted: number[]): number {
-    const sum = actual.reduce((acc, val, i) => acc + Math.pow(val - predicted[i], 2), 0);
-    return Math.sqrt(sum / actual.length);
+    return {
+        r2: 1 - (ssResidual / ssTotal),
+        mae: absError / actual.length,
+        rmse: Math.sqrt(ssResidual / actual.length),
+    };
 }
 
 /**
@@ -65,9 +66,7 @@ export function linearRegression(data: DataPoint[]): RegressionResult {
         type: 'linear',
         formula: `y = ${a.toFixed(4)} + ${b.toFixed(4)}x`,
         coefficients: [a, b],
-        r2: calculateR2(yValues, predictions),
-        mae: calculateMAE(yValues, predictions),
-        rmse: calculateRMSE(yValues, predictions),
+        ...calculateMetrics(yValues, predictions),
         predictions
     };
 }
@@ -140,9 +139,7 @@ export function polynomialRegression(data: DataPoint[], degree: number = 2): Reg
         type: 'polynomial',
         formula,
         coefficients,
-        r2: calculateR2(yValues, predictions),
-        mae: calculateMAE(yValues, predictions),
-        rmse: calculateRMSE(yValues, predictions),
+        ...calculateMetrics(yValues, predictions),
         predictions
     };
 }
@@ -231,9 +228,7 @@ export function exponentialRegression(data: DataPoint[]): RegressionResult {
         type: 'exponential',
         formula: `y = ${a.toFixed(4)} × e^(${b.toFixed(4)}x)`,
         coefficients: [a, b],
-        r2: calculateR2(yValues, predictions),
-        mae: calculateMAE(yValues, predictions),
-        rmse: calculateRMSE(yValues, predictions),
+        ...calculateMetrics(yValues, predictions),
         predictions
     };
 }
@@ -280,9 +275,7 @@ export function powerRegression(data: DataPoint[]): RegressionResult {
         type: 'power',
         formula: `y = ${a.toFixed(4)}x^${b.toFixed(4)}`,
         coefficients: [a, b],
-        r2: calculateR2(yValues, predictions),
-        mae: calculateMAE(yValues, predictions),
-        rmse: calculateRMSE(yValues, predictions),
+        ...calculateMetrics(yValues, predictions),
         predictions
     };
 }
@@ -327,9 +320,7 @@ export function logarithmicRegression(data: DataPoint[]): RegressionResult {
         type: 'logarithmic',
         formula: `y = ${a.toFixed(4)} + ${b.toFixed(4)}ln(x)`,
         coefficients: [a, b],
-        r2: calculateR2(allYValues, predictions),
-        mae: calculateMAE(allYValues, predictions),
-        rmse: calculateRMSE(allYValues, predictions),
+        ...calculateMetrics(allYValues, predictions),
         predictions
     };
 }
@@ -361,9 +352,7 @@ export function movingAverageRegression(data: DataPoint[], windowSize: number =
         type: 'moving-average',
         formula: `Moving Average (n=${windowSize})`,
         coefficients: [windowSize],
-        r2: calculateR2(yValues, predictions),
-        mae: calculateMAE(yValues, predictions),
-        rmse: calculateRMSE(yValues, predictions),
+        ...calculateMetrics(yValues, predictions),
         predictions
     };
 }